@@ -0,0 +1,93 @@
+"""
+Per operation cost of the numeric value objects, against the previous
+implementation that re-wrapped every sum and quantized both sides of every
+comparison.
+
+    python -m benchmarks.decimal_operations
+"""
+
+import timeit
+from decimal import Decimal as BaseDecimal, ROUND_HALF_UP
+
+from flow_prediction.shared.value_objects import Decimal, Money
+
+
+class RewrappingDecimal(BaseDecimal):
+    """The previous Decimal: sums re-wrapped, constants quantized per call."""
+
+    default_precision = BaseDecimal("0.01")
+
+    def isQuantizedEqual(self, other, target_precision=None):
+        if target_precision is None:
+            target_precision = self.default_precision
+        quantized_self = self.quantize(target_precision, rounding=ROUND_HALF_UP)
+        if not isinstance(other, BaseDecimal):
+            other = RewrappingDecimal(other)
+        quantized_other = other.quantize(target_precision, rounding=ROUND_HALF_UP)
+        return quantized_self == quantized_other
+
+    def __add__(self, other):
+        return self.__class__(super().__add__(other))
+
+    def __radd__(self, other):
+        return self.__class__(super().__radd__(other))
+
+
+def measure(statement, number=200_000, **names):
+    # best of five, in nanoseconds per call
+    return (
+        min(timeit.repeat(statement, globals=names, number=number, repeat=5))
+        / number
+        * 1e9
+    )
+
+
+def main():
+    ratios = ["0.35", "0.25", "0.2", "0.1", "0.1"]
+    old = [RewrappingDecimal(ratio) for ratio in ratios]
+    new = [Decimal(ratio) for ratio in ratios]
+    appreciation = Money(BaseDecimal("1234.5678"))
+    rows = [
+        (
+            "a + b",
+            measure("a + b", a=old[0], b=old[1]),
+            measure("a + b", a=new[0], b=new[1]),
+        ),
+        (
+            "sum of a split's ratios",
+            measure("sum(ratios)", ratios=old, number=50_000),
+            measure("sum(ratios)", ratios=new, number=50_000),
+        ),
+        (
+            "split sums to 1",
+            measure(
+                "sum(ratios).isQuantizedEqual(RewrappingDecimal(1))",
+                ratios=old,
+                RewrappingDecimal=RewrappingDecimal,
+                number=50_000,
+            ),
+            measure(
+                "Decimal.isQuantizedEqual(sum(ratios), 1)",
+                ratios=new,
+                Decimal=Decimal,
+                number=50_000,
+            ),
+        ),
+        (
+            "appreciation skip check",
+            measure(
+                "RewrappingDecimal(m.amount).isQuantizedEqual(RewrappingDecimal(Money(0).amount))",
+                m=appreciation,
+                Money=Money,
+                RewrappingDecimal=RewrappingDecimal,
+            ),
+            measure("m.isQuantizedZero()", m=appreciation),
+        ),
+    ]
+    print(f"{'operation':<28}{'before ns':>12}{'after ns':>12}{'speedup':>10}")
+    for name, before, after in rows:
+        print(f"{name:<28}{before:>12.1f}{after:>12.1f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
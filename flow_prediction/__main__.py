@@ -0,0 +1,5 @@
+import sys
+
+from flow_prediction.cli import main
+
+sys.exit(main())
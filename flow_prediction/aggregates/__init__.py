@@ -1,5 +1,14 @@
 from .expense import Expense
 from .cashflow import Cashflow
 from .corpus import Corpus
+from .tax_regime import CapitalGainsTaxRegime, IncomeTaxRegime
+from .rebalancing_policy import RebalancingPolicy
 
-__all__ = ["Expense", "Cashflow", "Corpus"]
+__all__ = [
+    "Expense",
+    "Cashflow",
+    "Corpus",
+    "CapitalGainsTaxRegime",
+    "IncomeTaxRegime",
+    "RebalancingPolicy",
+]
@@ -1,9 +1,12 @@
-from typing import List, TypedDict
+from typing import TYPE_CHECKING, List, NotRequired, TypedDict, Union
 
 from flow_prediction.shared.value_objects import InflationAdjustableValue, Money, Id
 from .allocation import Allocation
 from ..base import Aggregate
 
+if TYPE_CHECKING:
+    from ..tax_regime import IncomeTaxRegime
+
 
 class CashflowInitData(TypedDict):
     id: Id
@@ -13,6 +16,8 @@ class CashflowInitData(TypedDict):
     endYear: int
     allocations: List[Allocation]
     expandedDescription: str
+    # taxed as income of the regime's taxpayer, allocated after tax
+    taxRegime: NotRequired[Union["IncomeTaxRegime", None]]
 
 
 class Cashflow(Aggregate):
@@ -40,7 +45,14 @@ class Cashflow(Aggregate):
         self.endYear = data["endYear"]
         self._allocations = data["allocations"]
         self.expandedDescription = data["expandedDescription"]
+        self.taxRegime = data.get("taxRegime")
         self.validate()
+        if self.taxRegime is not None:
+            self.taxRegime.addCashflow(self)
+
+    @property
+    def allocations(self) -> List[Allocation]:
+        return self._allocations
 
     @property
     def hasValidAllocations(self):
@@ -72,5 +84,12 @@ class Cashflow(Aggregate):
             return Money(0)
         return self.recurringValue.getAmount(year)
 
+    def getNetAmount(self, year: int):
+        """The amount left to allocate once income tax is paid."""
+        amount = self.getAmount(year)
+        if self.taxRegime is None:
+            return amount
+        return amount * self.taxRegime.getNetFraction(year)
+
 
 # __all__ = ["Cashflow", "Allocation"]
@@ -27,7 +27,7 @@ class Allocation:
     def validate(self):
         # split should sum to 1
         allocationSum = sum([split["ratio"] for split in self.split])
-        if not allocationSum.isQuantizedEqual(Decimal(1)):
+        if not Decimal.isQuantizedEqual(allocationSum, 1):
             sumBetween = ",".join([split["corpusId"] for split in self.split])
             raise ValueError(
                 f"Allocation split between {sumBetween} should sum to 1, current: "
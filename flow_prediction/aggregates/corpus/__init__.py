@@ -1,12 +1,17 @@
 # from decimal import Decimal
-from typing import Union
+from typing import TYPE_CHECKING, Union
 
 from flow_prediction.shared.value_objects import (
     Id,
     Decimal,
+    ExchangeRate,
     Money,
 )
 from ..base import Aggregate
+from ..tax_regime import CostBasisLots
+
+if TYPE_CHECKING:
+    from ..tax_regime import CapitalGainsTaxRegime
 
 
 class Corpus(Aggregate):
@@ -15,6 +20,19 @@ class Corpus(Aggregate):
       - a name (id)
       - a current balance
       - an annual growth rate
+      - a currency, through the exchange rate of corpora that are not held in
+        the plan's base currency
+
+    The balance is always the corpus's value in the base currency, so that
+    deposits, deductions and successions never convert. A foreign corpus
+    instead appreciates by its growth rate and by the move of its exchange
+    rate over the year.
+
+    Under a capital gains tax regime the corpus also tracks its cost basis:
+    deposits add to it, appreciation doesn't, and spending withdraws enough
+    to also pay the tax on the gain realized. When the regime tracks lots,
+    the cost basis is kept per purchase lot (lots), the initial balance
+    being a lot bought the year before the corpus starts.
     """
 
     def __init__(
@@ -25,6 +43,9 @@ class Corpus(Aggregate):
         startYear: int,
         endYear: int,
         successCorpusId: Union[Id, None],
+        exchangeRate: Union[ExchangeRate, None] = None,
+        taxRegime: Union["CapitalGainsTaxRegime", None] = None,
+        costBasis: Union[Money, None] = None,
     ):
         super().__init__(id)
         self.growthRate = growthRate  # e.g. 0.03 => 3% yearly
@@ -32,23 +53,74 @@ class Corpus(Aggregate):
         self.startYear = startYear
         self.endYear = endYear
         self.successorCorpusId = successCorpusId
+        self.exchangeRate = exchangeRate
+        self.taxRegime = taxRegime
+        # only tracked under a tax regime, no embedded gain unless given
+        self.costBasis: Union[Money, None] = None
+        self.lots: Union[CostBasisLots, None] = None
+        if taxRegime is not None:
+            self.costBasis = initialValue if costBasis is None else costBasis
+            if taxRegime.tracksLots:
+                self.lots = CostBasisLots()
+                self.lots.add(
+                    startYear - 1,
+                    self.costBasis.amount,
+                    initialValue.amount,
+                    Decimal(0),
+                )
 
     def conductAnnualAppreciation(self, year: int):
         appreciatedAmount = self._getAnnualAppreciation(year)
-        if appreciatedAmount.isQuantizedEqual(Money(0)):
+        if appreciatedAmount.isQuantizedZero():
             return
         # print(
         #     f"Conducting annual appreciation for corpus {self.id} in year {year} with amount {float(appreciatedAmount.amount)}"
         # )
         self._balance += appreciatedAmount
 
-    def deposit(self, amount: Money, year: int):
+    def conductCompoundAppreciation(self, years: int, year: int):
+        """
+        Appreciation of several consecutive years, through the given one,
+        without any flow in between, as a single power instead of year by
+        year.
+        """
+        if years <= 0:
+            return
+        self._balance *= (1 + self.growthRate) ** years
+        if self.exchangeRate is not None:
+            self._balance *= self.exchangeRate.getRatio(year, years)
+
+    def deposit(
+        self,
+        amount: Money,
+        year: int,
+        costBasis: Union[Money, None] = None,
+        lots: Union[CostBasisLots, None] = None,
+    ):
+        """
+        costBasis and lots are what amount cost, when it isn't bought now,
+        e.g. the holdings of a corpus succeeded.
+        """
         if not self.isActive(year):
             raise ValueError(
                 f"Corpus {self.id} is not active in year {year}, hence cannot deposit, only grow"
             )
         print(f"Depositing {amount.format()} to {self.id} in year {year}")
+        if self.lots is not None:
+            if lots is not None:
+                self.lots.merge(lots, amount.amount, self._balance.amount)
+            else:
+                self.lots.add(
+                    year,
+                    (amount if costBasis is None else costBasis).amount,
+                    amount.amount,
+                    self._balance.amount,
+                )
         self._balance += amount
+        if self.lots is not None:
+            self.costBasis = Money(self.lots.getPrincipal())
+        elif self.costBasis is not None:
+            self.costBasis += amount if costBasis is None else costBasis
 
     def transferAllTo(self, target, year):
         if not isinstance(target, Corpus):
@@ -56,9 +128,20 @@ class Corpus(Aggregate):
         # print(
         #     f"Transferring the entire corpus value {float(self._balance.amount)} from {self.id} to {target.id}"
         # )
+        # a succession carries the cost basis along, it realizes no gain
         balance = self.getBalance()
+        costBasis = self.costBasis
+        lots = self.lots
         self.withdraw(balance, year)
-        target.deposit(balance, year)
+        if self.costBasis is not None:
+            self.costBasis = Money(0)
+        if self.lots is not None:
+            self.lots = CostBasisLots()
+        target.deposit(balance, year, costBasis, lots)
+
+    @property
+    def isForeign(self) -> bool:
+        return self.exchangeRate is not None
 
     def isActive(self, year: int) -> bool:
         return self.startYear <= year <= self.endYear
@@ -66,6 +149,67 @@ class Corpus(Aggregate):
     def getBalance(self):
         return self._balance
 
+    def getCostBasis(self) -> Union[Money, CostBasisLots, None]:
+        """A snapshot of the cost basis, for restoreBalance."""
+        return self.lots.copy() if self.lots is not None else self.costBasis
+
+    def restoreBalance(
+        self,
+        balance: Money,
+        costBasis: Union[Money, CostBasisLots, None] = None,
+    ):
+        """Resumes from a balance snapshotted off another run of this corpus."""
+        self._balance = balance
+        if isinstance(costBasis, CostBasisLots):
+            if self.lots is not None:
+                self.lots = costBasis.copy()
+                self.costBasis = Money(self.lots.getPrincipal())
+        elif self.costBasis is not None and costBasis is not None:
+            self.costBasis = costBasis
+
+    def getGainFraction(self) -> Decimal:
+        """The share of the balance that is a gain over the cost basis."""
+        if self.costBasis is None or self._balance.amount <= 0:
+            return Decimal(0)
+        return max(1 - self.costBasis.amount / self._balance.amount, Decimal(0))
+
+    def getSpendableBalance(self, year: int) -> Money:
+        """What withdrawing the whole balance leaves after capital gains tax."""
+        if self.taxRegime is None:
+            return self._balance
+        if self.lots is not None:
+            return Money(
+                self.lots.getSpendable(self._balance.amount, self.taxRegime, year)
+            )
+        gain = self._balance.amount * self.getGainFraction()
+        return self._balance - Money(self.taxRegime.getTax(gain, year))
+
+    def spend(self, amount: Money, year: int) -> Money:
+        """
+        Withdraws what it takes to pay amount once the gain it realizes is
+        taxed, and returns that tax.
+        """
+        if self.taxRegime is None:
+            self.withdraw(amount, year)
+            return Money(0)
+        if self.lots is not None:
+            gross = self.lots.spend(
+                self._balance.amount, amount.amount, self.taxRegime, year
+            )
+            self.costBasis = Money(self.lots.getPrincipal())
+            self.withdraw(Money(gross), year)
+            return Money(gross) - amount
+        gainFraction = self.getGainFraction()
+        gross = self.taxRegime.grossUp(amount.amount, gainFraction, year)
+        self.taxRegime.realize(gross * gainFraction, year)
+        balance = self._balance.amount
+        if balance > 0:
+            self.costBasis = self.costBasis * (
+                max(balance - gross, Decimal(0)) / balance
+            )
+        self.withdraw(Money(gross), year)
+        return Money(gross) - amount
+
     def getInflationAdjustedBalance(
         self, currentYear, baseYear: int, baseInflation: Decimal
     ):
@@ -99,4 +243,8 @@ class Corpus(Aggregate):
     def _getAnnualAppreciation(self, year):
         # if not self.isActive(year):
         #     return Money(0)
-        return self._balance * self.growthRate
+        if self.exchangeRate is None:
+            return self._balance * self.growthRate
+        return self._balance * (
+            (1 + self.growthRate) * self.exchangeRate.getRatio(year) - 1
+        )
@@ -4,6 +4,11 @@ from flow_prediction.shared.value_objects import Id, InflationAdjustableValue
 from flow_prediction.shared.value_objects.money import Money
 from ..base import Aggregate
 from ..corpus import Corpus
+from ..withdrawal_strategy import (
+    CorporaRefill,
+    SequentialWithdrawal,
+    WithdrawalStrategy,
+)
 
 
 class FundingCorpus:
@@ -38,7 +43,8 @@ class Expense(Aggregate):
       - lumpsum => only hits in start_year exactly.
       - can have its own growthRate rate (like living expenses,
         which grow yearly).
-      - tries to withdraw from corpora in a given priority order.
+      - tries to withdraw from corpora in a given priority order, or as
+        its withdrawal strategy says.
     """
 
     def __init__(
@@ -52,6 +58,7 @@ class Expense(Aggregate):
         fundingCorpora: Union[List[FundingCorpus], None],
         corpora: List[Corpus],
         # TODO: account for corpus priority
+        withdrawalStrategy: Union[WithdrawalStrategy, None] = None,
     ):
         super().__init__(id)
         self.startYear = startYear
@@ -73,6 +80,11 @@ class Expense(Aggregate):
                 )
             )
         )
+        self.withdrawalStrategy = (
+            withdrawalStrategy
+            if withdrawalStrategy is not None
+            else SequentialWithdrawal()
+        )
         self.validate()
 
     def validate(self):
@@ -104,6 +116,12 @@ class Expense(Aggregate):
                 return corpus
         raise ValueError(f"Funding Corpus {id} not found for {self}")
 
+    def getCorporaRefills(self, corpora: List[Corpus], year) -> List[CorporaRefill]:
+        """Moves between funding corpora its strategy makes before the year's deductions."""
+        if not self.isActive(year):
+            return []
+        return self.withdrawalStrategy.getRefills(self, corpora, year)
+
     def getCorporaDeductions(
         self, corpora: List[Corpus], year
     ) -> Tuple[List[CorporaDeduction], Union[Corpus, None]]:
@@ -112,34 +130,30 @@ class Expense(Aggregate):
         print(f"Calculating deductions for {self.id} in {year}")
         violatedCorpus: Union[Corpus, None] = None
         deductions = []
-        initialAmountToBeDeducted = self.getInitialAmountNeeded(year)
-        for fundingCorpus in self.fundingCorpora[:-1]:
-            if fundingCorpus.isAllowedToFund(year, "initial"):
-                corpus = self._getCorpus(corpora, fundingCorpus.id)
-                corpusDeduction = min(
-                    corpus.getBalance(),
-                    initialAmountToBeDeducted,
-                )
-                deductions.append({"corpus": corpus, "deduction": corpusDeduction})
-                initialAmountToBeDeducted -= corpusDeduction
-        recurringAmountToBeDeducted = self.getRecurringAmountNeeded(year)
-        for fundingCorpus in self.fundingCorpora[:-1]:
-            if fundingCorpus.isAllowedToFund(year, "recurring"):
-                corpus = self._getCorpus(corpora, fundingCorpus.id)
-                corpusDeduction = min(
-                    corpus.getBalance(),
-                    recurringAmountToBeDeducted,
-                )
-                deductions.append({"corpus": corpus, "deduction": corpusDeduction})
-                recurringAmountToBeDeducted -= corpusDeduction
-
         finalCorpus = self._getCorpus(corpora, self.fundingCorpora[-1].id)
-        amountToBeDeducted = initialAmountToBeDeducted + recurringAmountToBeDeducted
+        amountToBeDeducted = Money(0)
+        initialAmount, recurringAmount = self.withdrawalStrategy.getAmounts(
+            self, corpora, year
+        )
+        for expenseType, amount in (
+            ("initial", initialAmount),
+            ("recurring", recurringAmount),
+        ):
+            funders = [
+                self._getCorpus(corpora, fundingCorpus.id)
+                for fundingCorpus in self.fundingCorpora[:-1]
+                if fundingCorpus.isAllowedToFund(year, expenseType)
+            ]
+            drawn, amount = self.withdrawalStrategy.draw(
+                self, funders, finalCorpus, amount, year
+            )
+            deductions.extend(drawn)
+            amountToBeDeducted += amount
         print(
             f"Amount to be finally deducted: {amountToBeDeducted.format()} for {self.id} in {year}"
         )
         print(deductions)
-        if amountToBeDeducted > finalCorpus.getBalance():
+        if amountToBeDeducted > finalCorpus.getSpendableBalance(year):
             raise ValueError(
                 f"Corpus {finalCorpus.id} doesn't have {amountToBeDeducted} to fund {self.id} in {year}, deductions so far: {deductions}"
             )
@@ -37,6 +37,9 @@ class FakeCorpus:
     def getBalance(self) -> Money:
         return Money(self._balance)
 
+    def getSpendableBalance(self, year: int) -> Money:
+        return self.getBalance()
+
     def __eq__(self, other):
         return (
             isinstance(other, FakeCorpus)
@@ -0,0 +1,135 @@
+from typing import Dict, List, Tuple, TypedDict
+
+from flow_prediction.shared.value_objects import Decimal, Id, Money
+from ..base import Aggregate
+from ..corpus import Corpus
+
+REBALANCING_FREQUENCIES = ("annual", "threshold", "calendar")
+
+
+class CorporaRebalance(TypedDict):
+    corpus: Corpus
+    # bought into the corpus when positive, sold out of it when negative
+    amount: Money
+
+
+class RebalancingPolicy(Aggregate):
+    """
+    Brings linked corpora back to target weights (by corpus id) at the end
+    of a year, after its expenses, by moving money between them:
+      - annual => every year between startYear and endYear.
+      - threshold => checked every year, only when some corpus has drifted
+        more than threshold (e.g. 0.05, five points) from its weight.
+      - calendar => every everyYears years from startYear.
+    Only the corpora active in the year take part, their weights scaled to
+    add up to 1. Sales out of a taxed corpus pay their capital gains tax on
+    top, leaving it that much under its weight.
+    """
+
+    def __init__(
+        self,
+        id: Id,
+        startYear: int,
+        endYear: int,
+        targetWeights: Dict[str, Decimal],
+        frequency: str = "annual",
+        threshold: Decimal = Decimal("0.05"),
+        everyYears: int = 1,
+    ):
+        super().__init__(id)
+        self.startYear = startYear
+        self.endYear = endYear
+        self.targetWeights = targetWeights
+        self.frequency = frequency
+        self.threshold = threshold
+        self.everyYears = everyYears
+        self.validate()
+
+    def validate(self):
+        if self.frequency not in REBALANCING_FREQUENCIES:
+            raise ValueError(
+                f"Rebalancing frequency {self.frequency} of {self.id} should be one of {', '.join(REBALANCING_FREQUENCIES)}"
+            )
+        if len(self.targetWeights) < 2:
+            raise ValueError(f"Rebalancing {self.id} needs at least two corpora")
+        if any(weight < 0 for weight in self.targetWeights.values()) or not (
+            sum(self.targetWeights.values()) > 0
+        ):
+            raise ValueError(
+                f"Target weights of {self.id} should not be negative, nor all 0"
+            )
+        if not 0 < self.threshold < 1:
+            raise ValueError(
+                f"Rebalancing threshold {self.threshold} of {self.id} should be between 0 and 1"
+            )
+        if self.everyYears < 1:
+            raise ValueError(
+                f"Rebalancing {self.id} every {self.everyYears} years, should be at least 1"
+            )
+
+    def isActive(self, year: int) -> bool:
+        return self.startYear <= year <= self.endYear
+
+    def isDue(self, year: int) -> bool:
+        """Whether year may rebalance, for threshold if drifted enough."""
+        if not self.isActive(year):
+            return False
+        if self.frequency == "calendar":
+            return (year - self.startYear) % self.everyYears == 0
+        return True
+
+    def getSignature(self) -> tuple:
+        # what tells apart the rebalancing of two policies
+        return (
+            self.id.value,
+            tuple(sorted(self.targetWeights.items())),
+            self.frequency,
+            self.threshold if self.frequency == "threshold" else None,
+        )
+
+    def getWeights(
+        self, corpora: List[Corpus], year: int
+    ) -> List[Tuple[Corpus, Decimal]]:
+        """The corpora taking part in year, in plan order, with their weights."""
+        missing = set(self.targetWeights) - {corpus.id.value for corpus in corpora}
+        if missing:
+            raise ValueError(
+                f"Corpora {', '.join(sorted(missing))} of rebalancing {self.id} not found"
+            )
+        linked = [
+            corpus
+            for corpus in corpora
+            if corpus.id.value in self.targetWeights and corpus.isActive(year)
+        ]
+        total = sum(
+            (self.targetWeights[corpus.id.value] for corpus in linked), Decimal(0)
+        )
+        if total <= 0:
+            return []
+        return [
+            (corpus, self.targetWeights[corpus.id.value] / total) for corpus in linked
+        ]
+
+    def getRebalances(self, corpora: List[Corpus], year: int) -> List[CorporaRebalance]:
+        if not self.isDue(year):
+            return []
+        weights = self.getWeights(corpora, year)
+        total = sum((corpus.getBalance() for corpus, _ in weights), Money(0))
+        if len(weights) < 2 or total <= Money(0):
+            return []
+        if self.frequency == "threshold" and all(
+            abs(corpus.getBalance().amount / total.amount - weight) <= self.threshold
+            for corpus, weight in weights
+        ):
+            return []
+        return [
+            {"corpus": corpus, "amount": total * weight - corpus.getBalance()}
+            for corpus, weight in weights
+        ]
+
+
+__all__ = [
+    "CorporaRebalance",
+    "RebalancingPolicy",
+    "REBALANCING_FREQUENCIES",
+]
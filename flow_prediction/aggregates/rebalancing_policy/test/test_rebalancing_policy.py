@@ -0,0 +1,77 @@
+import pytest
+
+from flow_prediction.shared.value_objects import Decimal, Id, Money
+from ...corpus import Corpus
+from .. import RebalancingPolicy
+
+
+def newCorpora(*balances, endYears=()):
+    return [
+        Corpus(
+            Id(f"c{k}"),
+            Decimal(0),
+            Money(balance),
+            2025,
+            endYears[k] if k < len(endYears) else 2100,
+            None,
+            None,
+        )
+        for k, balance in enumerate(balances)
+    ]
+
+
+def moves(policy, corpora, year=2025):
+    return {
+        rebalance["corpus"].id.value: float(rebalance["amount"])
+        for rebalance in policy.getRebalances(corpora, year)
+    }
+
+
+def newPolicy(**options):
+    return RebalancingPolicy(
+        Id("sixty-forty"),
+        2025,
+        2050,
+        {"c0": Decimal("0.6"), "c1": Decimal("0.4")},
+        **options,
+    )
+
+
+def test_annual_moves_to_target_weights():
+    corpora = newCorpora(800, 200)
+    assert moves(newPolicy(), corpora) == {
+        "c0": pytest.approx(-200),
+        "c1": pytest.approx(200),
+    }
+
+
+def test_threshold_waits_for_enough_drift():
+    policy = newPolicy(frequency="threshold", threshold=Decimal("0.1"))
+    assert moves(policy, newCorpora(650, 350)) == {}
+    assert moves(policy, newCorpora(750, 250)) == {
+        "c0": pytest.approx(-150),
+        "c1": pytest.approx(150),
+    }
+
+
+def test_calendar_rebalances_every_few_years():
+    policy = newPolicy(frequency="calendar", everyYears=3)
+    assert [year for year in range(2025, 2032) if policy.isDue(year)] == [
+        2025,
+        2028,
+        2031,
+    ]
+
+
+def test_ended_corpora_leave_the_weights_to_the_others():
+    policy = RebalancingPolicy(
+        Id("three"),
+        2025,
+        2050,
+        {"c0": Decimal(1), "c1": Decimal(1), "c2": Decimal(2)},
+    )
+    corpora = newCorpora(100, 0, 300, endYears=(2100, 2025))
+    assert moves(policy, corpora, 2026) == {
+        "c0": pytest.approx(33.3333333),
+        "c2": pytest.approx(-33.3333333),
+    }
@@ -0,0 +1,376 @@
+from array import array
+from bisect import bisect_right
+from typing import Dict, List, Tuple, TypedDict, Union
+
+from flow_prediction.shared.value_objects import Id, Decimal, Money
+from ..base import Aggregate
+
+
+class TaxSlab(TypedDict):
+    # the rate applies to taxable income above this
+    fromIncome: Decimal
+    rate: Decimal
+
+
+class IncomeTaxRegime(Aggregate):
+    """
+    Slab taxation of the income of one taxpayer, e.g. India's new regime:
+    the cashflows taxed under it are added up every year, the standard
+    deduction comes off, every slab's rate applies to the income within it,
+    no tax is due up to rebateLimit (with marginal relief just above it) and
+    cess is added on top.
+
+    Slabs, standard deduction and rebate limit are as of referenceTime and
+    grow by indexation a year, 0 keeping them fixed. They are precomputed per
+    year as cumulative tax tables, so a year's tax is one bisection.
+    """
+
+    def __init__(
+        self,
+        id: Id,
+        slabs: List[TaxSlab],
+        standardDeduction: Decimal,
+        rebateLimit: Decimal,
+        cess: Decimal,
+        referenceTime: int,
+        indexation: Decimal = Decimal(0),
+    ):
+        super().__init__(id)
+        self.slabs = sorted(slabs, key=lambda slab: slab["fromIncome"])
+        self.standardDeduction = standardDeduction
+        self.rebateLimit = rebateLimit
+        self.cess = cess
+        self.referenceTime = referenceTime
+        self.indexation = indexation
+        self._cashflows = []
+        self._tables: Dict[int, Tuple[List[Decimal], List[Decimal], Decimal]] = {}
+        self._netFractions: Dict[int, Decimal] = {}
+        self.validate()
+
+    def validate(self):
+        if not self.slabs or self.slabs[0]["fromIncome"] != 0:
+            raise ValueError(f"Slabs of tax regime {self.id} should start at 0")
+
+    def addCashflow(self, cashflow):
+        self._cashflows.append(cashflow)
+        self._netFractions.clear()
+
+    def _getTable(self, year: int):
+        # slab thresholds, tax due at each threshold, and the index factor
+        table = self._tables.get(year)
+        if table is None:
+            index = (1 + self.indexation) ** (year - self.referenceTime)
+            thresholds = [slab["fromIncome"] * index for slab in self.slabs]
+            cumulative = [Decimal(0)]
+            for k in range(1, len(self.slabs)):
+                cumulative.append(
+                    cumulative[-1]
+                    + self.slabs[k - 1]["rate"] * (thresholds[k] - thresholds[k - 1])
+                )
+            table = self._tables[year] = (thresholds, cumulative, index)
+        return table
+
+    def getTax(self, income: Money, year: int) -> Money:
+        thresholds, cumulative, index = self._getTable(year)
+        taxable = max(income.amount - self.standardDeduction * index, Decimal(0))
+        rebateLimit = self.rebateLimit * index
+        if taxable <= rebateLimit:
+            return Money(0)
+        k = bisect_right(thresholds, taxable) - 1
+        tax = cumulative[k] + self.slabs[k]["rate"] * (taxable - thresholds[k])
+        # marginal relief: never more tax than the income above the limit
+        tax = min(tax, taxable - rebateLimit)
+        return Money(tax * (1 + self.cess))
+
+    def getNetFraction(self, year: int) -> Decimal:
+        """What is left of every taxed cashflow's amount in the year."""
+        fraction = self._netFractions.get(year)
+        if fraction is None:
+            income = sum(cashflow.getAmount(year) for cashflow in self._cashflows)
+            fraction = (
+                Decimal(1)
+                if not income
+                else 1 - self.getTax(income, year).amount / income.amount
+            )
+            self._netFractions[year] = fraction
+        return fraction
+
+
+LOT_METHODS = ("average", "fifo")
+
+
+class CapitalGainsTaxRegime(Aggregate):
+    """
+    Tax on the gains realized by withdrawals from the corpora under it, e.g.
+    India's equity capital gains: rate on the long term gains of a year above
+    its exemption, shortTermRate on the gains of what was held for less than
+    holdingYears, cess on top. The exemption is shared by all these corpora
+    (one taxpayer).
+
+    Without a shortTermRate and with the "average" lotMethod, the gain of a
+    withdrawal is its share of the corpus's gain over its cost basis
+    (average cost), gainFraction = 1 - costBasis / balance. Otherwise the
+    corpora keep their purchase lots (CostBasisLots), and withdrawals
+    consume them oldest first ("fifo") or all in proportion ("average").
+    """
+
+    def __init__(
+        self,
+        id: Id,
+        rate: Decimal,
+        exemption: Decimal,
+        cess: Decimal,
+        shortTermRate: Union[Decimal, None] = None,
+        holdingYears: int = 1,
+        lotMethod: str = "average",
+    ):
+        super().__init__(id)
+        self.rate = rate
+        self.exemption = exemption
+        self.cess = cess
+        self.shortTermRate = shortTermRate
+        self.holdingYears = holdingYears
+        self.lotMethod = lotMethod
+        self.effectiveRate = rate * (1 + cess)
+        self.shortTermEffectiveRate = (
+            self.effectiveRate if shortTermRate is None else shortTermRate * (1 + cess)
+        )
+        # lots only matter when their age or their order changes the tax
+        self.tracksLots = shortTermRate is not None or lotMethod == "fifo"
+        self._exemptionUsed: Dict[int, Decimal] = {}
+        self.validate()
+
+    def validate(self):
+        for rate in (self.effectiveRate, self.shortTermEffectiveRate):
+            if not 0 <= rate < 1:
+                raise ValueError(
+                    f"Tax rate {rate} of tax regime {self.id} should be between 0 and 1"
+                )
+        if self.lotMethod not in LOT_METHODS:
+            raise ValueError(
+                f"Lot method {self.lotMethod} of tax regime {self.id} should be one of {', '.join(LOT_METHODS)}"
+            )
+        if self.holdingYears < 0:
+            raise ValueError(
+                f"Holding years {self.holdingYears} of tax regime {self.id} should not be negative"
+            )
+
+    def isShortTerm(self, boughtYear: int, year: int) -> bool:
+        return self.shortTermRate is not None and year - boughtYear < self.holdingYears
+
+    def getExemptionLeft(self, year: int) -> Decimal:
+        return self.exemption - self._exemptionUsed.get(year, Decimal(0))
+
+    def getTax(self, gain: Decimal, year: int) -> Decimal:
+        return self.effectiveRate * max(gain - self.getExemptionLeft(year), Decimal(0))
+
+    def grossUp(self, net: Decimal, gainFraction: Decimal, year: int) -> Decimal:
+        """The withdrawal that leaves net once its gain is taxed."""
+        exemptionLeft = self.getExemptionLeft(year)
+        if net * gainFraction <= exemptionLeft:
+            return net
+        return (net - self.effectiveRate * exemptionLeft) / (
+            1 - self.effectiveRate * gainFraction
+        )
+
+    def realize(self, gain: Decimal, year: int):
+        """Books a long term gain against the year's exemption."""
+        used = self._exemptionUsed.get(year, Decimal(0))
+        self._exemptionUsed[year] = used + min(
+            max(gain, Decimal(0)), self.exemption - used
+        )
+
+
+class CostBasisLots:
+    """
+    The purchase lots of a corpus under a CapitalGainsTaxRegime that tracks
+    them, as parallel arrays: the year a lot was bought, its principal (cost
+    basis) and its units. A lot is worth its share of the corpus's units, so
+    appreciation never touches the lots, only deposits and withdrawals do.
+    Deposits of the same year go to one lot, lots before first are used up.
+
+    A lot's gain is never below 0, losses don't offset gains.
+    """
+
+    def __init__(self):
+        self.years = array("i")
+        self.principals: List[Decimal] = []
+        self.units: List[Decimal] = []
+        self.first = 0
+
+    def copy(self) -> "CostBasisLots":
+        lots = CostBasisLots()
+        lots.years = array("i", self.years[self.first :])
+        lots.principals = self.principals[self.first :]
+        lots.units = self.units[self.first :]
+        return lots
+
+    def getPrincipal(self) -> Decimal:
+        return sum(self.principals[self.first :], Decimal(0))
+
+    def _getUnitValue(self, balance: Decimal) -> Decimal:
+        units = sum(self.units[self.first :], Decimal(0))
+        if balance <= 0 or units <= 0:
+            # nothing left of the lots, start over
+            self.first = len(self.years)
+            return Decimal(1)
+        return balance / units
+
+    def add(self, year: int, principal: Decimal, value: Decimal, balance: Decimal):
+        """A lot worth value bought in year, balance being the corpus's before it."""
+        if not value:
+            return
+        units = value / self._getUnitValue(balance)
+        if len(self.years) > self.first and self.years[-1] == year:
+            self.principals[-1] += principal
+            self.units[-1] += units
+        else:
+            self.years.append(year)
+            self.principals.append(principal)
+            self.units.append(units)
+
+    def merge(self, lots: "CostBasisLots", value: Decimal, balance: Decimal):
+        """Takes over lots worth value in all, keeping the years they were bought."""
+        sourceUnits = sum(lots.units[lots.first :], Decimal(0))
+        if value <= 0 or sourceUnits <= 0:
+            return
+        unitValue = self._getUnitValue(balance)
+        held = list(
+            zip(
+                self.years[self.first :],
+                self.principals[self.first :],
+                self.units[self.first :],
+            )
+        )
+        held.extend(
+            (year, principal, units * value / sourceUnits / unitValue)
+            for year, principal, units in zip(
+                lots.years[lots.first :],
+                lots.principals[lots.first :],
+                lots.units[lots.first :],
+            )
+        )
+        # oldest first, for fifo
+        held.sort(key=lambda lot: lot[0])
+        self.years = array("i", (lot[0] for lot in held))
+        self.principals = [lot[1] for lot in held]
+        self.units = [lot[2] for lot in held]
+        self.first = 0
+
+    def _getGains(self, balance: Decimal, regime: CapitalGainsTaxRegime, year: int):
+        # value, gain and whether it's short term, of every lot left
+        unitValue = self._getUnitValue(balance)
+        gains = []
+        for k in range(self.first, len(self.years)):
+            value = self.units[k] * unitValue
+            gains.append(
+                (
+                    value,
+                    max(value - self.principals[k], Decimal(0)),
+                    regime.isShortTerm(self.years[k], year),
+                )
+            )
+        return gains
+
+    def getSpendable(
+        self, balance: Decimal, regime: CapitalGainsTaxRegime, year: int
+    ) -> Decimal:
+        """What withdrawing the whole balance leaves after tax."""
+        gains = self._getGains(balance, regime, year)
+        shortTermGain = sum((gain for _, gain, short in gains if short), Decimal(0))
+        longTermGain = sum((gain for _, gain, short in gains if not short), Decimal(0))
+        return (
+            balance
+            - regime.shortTermEffectiveRate * shortTermGain
+            - regime.effectiveRate
+            * max(longTermGain - regime.getExemptionLeft(year), Decimal(0))
+        )
+
+    def spend(
+        self, balance: Decimal, net: Decimal, regime: CapitalGainsTaxRegime, year: int
+    ) -> Decimal:
+        """
+        Consumes the lots for a withdrawal that leaves net after tax, and
+        returns the withdrawal. Beyond the lots there is no gain to tax.
+        """
+        gains = self._getGains(balance, regime, year)
+        if regime.lotMethod == "fifo":
+            gross, longTermGain = self._spendOldestFirst(gains, net, regime, year)
+        else:
+            gross, longTermGain = self._spendInProportion(gains, net, regime, year)
+        regime.realize(longTermGain, year)
+        return gross
+
+    def _spendOldestFirst(self, gains, net, regime, year):
+        shortTermRate = regime.shortTermEffectiveRate
+        longTermRate = regime.effectiveRate
+        exemptionLeft = regime.getExemptionLeft(year)
+        gross = Decimal(0)
+        longTermGain = Decimal(0)
+        for k, (value, gain, short) in enumerate(gains, self.first):
+            if net <= 0:
+                break
+            if short:
+                lotNet = value - shortTermRate * gain
+            else:
+                lotNet = value - longTermRate * max(gain - exemptionLeft, Decimal(0))
+            if lotNet <= net:
+                # all of it
+                gross += value
+                net -= lotNet
+                if not short:
+                    longTermGain += gain
+                    exemptionLeft = max(exemptionLeft - gain, Decimal(0))
+                self.principals[k] = Decimal(0)
+                self.units[k] = Decimal(0)
+                self.first = k + 1
+                continue
+            gainFraction = gain / value
+            if short:
+                taken = net / (1 - shortTermRate * gainFraction)
+            else:
+                # untaxed up to the exemption left, then grossed up
+                untaxed = exemptionLeft / gainFraction if gainFraction > 0 else value
+                taken = min(net, untaxed) + max(net - untaxed, Decimal(0)) / (
+                    1 - longTermRate * gainFraction
+                )
+                longTermGain += taken * gainFraction
+            left = 1 - taken / value
+            self.principals[k] *= left
+            self.units[k] *= left
+            gross += taken
+            net = Decimal(0)
+        return gross + net, longTermGain
+
+    def _spendInProportion(self, gains, net, regime, year):
+        value = sum((value for value, _, _ in gains), Decimal(0))
+        if value <= 0:
+            return net, Decimal(0)
+        shortTermShare = (
+            sum((gain for _, gain, short in gains if short), Decimal(0)) / value
+        )
+        longTermShare = (
+            sum((gain for _, gain, short in gains if not short), Decimal(0)) / value
+        )
+        exemptionLeft = regime.getExemptionLeft(year)
+        gross = net / (1 - regime.shortTermEffectiveRate * shortTermShare)
+        if gross * longTermShare > exemptionLeft:
+            gross = (net - regime.effectiveRate * exemptionLeft) / (
+                1
+                - regime.shortTermEffectiveRate * shortTermShare
+                - regime.effectiveRate * longTermShare
+            )
+        left = max(1 - gross / value, Decimal(0))
+        for k in range(self.first, len(self.years)):
+            self.principals[k] *= left
+            self.units[k] *= left
+        return gross, min(gross, value) * longTermShare
+
+
+__all__ = [
+    "TaxSlab",
+    "IncomeTaxRegime",
+    "CapitalGainsTaxRegime",
+    "CostBasisLots",
+    "LOT_METHODS",
+]
@@ -0,0 +1,96 @@
+import pytest
+
+from flow_prediction.app.use_cases.simulation import CashflowSimulationUseCase
+from flow_prediction.shared.value_objects import Decimal, Id, Money
+from ...corpus import Corpus
+from .. import CapitalGainsTaxRegime, IncomeTaxRegime
+
+
+def newRegime(**overrides):
+    plan = {
+        "expenses": [],
+        "cashflows": [],
+        "corpora": [],
+        "simulation": {"startYear": 2025, "endYear": 2025},
+        "currency": "INR",
+        "fallbackCorpusId": "none",
+        "baseInflation": 0.05,
+        "taxRegimes": {
+            "salary": {"preset": "india-new-regime-2025", **overrides},
+            "equity": {"preset": "india-equity-ltcg-2024"},
+        },
+    }
+    return CashflowSimulationUseCase(plan).buildTaxRegimes()
+
+
+@pytest.mark.parametrize(
+    "income, tax",
+    [
+        (1275000, 0),
+        # 63,750 on the slabs, relieved down to the 25,000 above the rebate
+        (1300000, 26000),
+        (2575000, 343200),
+    ],
+)
+def test_india_new_regime_slabs(income, tax):
+    regime: IncomeTaxRegime = newRegime()["salary"]
+    assert float(regime.getTax(Money(income), 2025)) == pytest.approx(tax)
+
+
+def test_slabs_grow_with_indexation():
+    regime: IncomeTaxRegime = newRegime(indexation=0.1)["salary"]
+    # 12.75L grown by 10% stays within the rebate a year later
+    assert float(regime.getTax(Money(1275000 * 1.1), 2026)) == 0
+    assert float(regime.getTax(Money(1275000 * 1.1), 2025)) > 0
+
+
+def test_spending_a_corpus_pays_tax_on_its_gain():
+    regime = CapitalGainsTaxRegime(
+        Id("equity"), Decimal("0.1"), Decimal(100), Decimal(0)
+    )
+    corpus = Corpus(
+        Id("stock"), Decimal(0), Money(1000), 2025, 2100, None, None, regime, Money(500)
+    )
+    # half of every withdrawal is gain, the first 100 of it untaxed
+    assert float(corpus.getSpendableBalance(2025)) == pytest.approx(960)
+    tax = corpus.spend(Money(500), 2025)
+    # gross g: g - 0.1 * (g / 2 - 100) = 500
+    gross = 490 / 0.95
+    assert float(tax) == pytest.approx(gross - 500)
+    assert float(corpus.getBalance()) == pytest.approx(1000 - gross)
+    assert float(corpus.costBasis) == pytest.approx(500 * (1 - gross / 1000))
+    assert float(regime.getExemptionLeft(2025)) == 0
+    assert float(regime.getExemptionLeft(2026)) == 100
+
+
+def test_lots_are_spent_oldest_first():
+    regime = CapitalGainsTaxRegime(
+        Id("equity"),
+        Decimal("0.1"),
+        Decimal(0),
+        Decimal(0),
+        shortTermRate=Decimal("0.2"),
+        holdingYears=2,
+        lotMethod="fifo",
+    )
+    corpus = Corpus(
+        Id("stock"),
+        Decimal("0.1"),
+        Money(1000),
+        2025,
+        2100,
+        None,
+        None,
+        regime,
+        Money(500),
+    )
+    corpus.conductAnnualAppreciation(2025)
+    corpus.deposit(Money(1000), 2025)
+    corpus.conductAnnualAppreciation(2026)
+    # the initial lot, 1210 with 710 of long term gain, goes first, then
+    # 361 more out of the 2025 lot, 1100 with 100 of short term gain
+    tax = corpus.spend(Money(1500), 2026)
+    taken = 361 / (1 - 0.2 / 11)
+    assert float(tax) == pytest.approx(71 + taken - 361)
+    assert float(corpus.getBalance()) == pytest.approx(2310 - 1210 - taken)
+    assert float(corpus.costBasis) == pytest.approx(1000 * (1 - taken / 1100))
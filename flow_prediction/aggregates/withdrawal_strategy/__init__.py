@@ -0,0 +1,306 @@
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Dict, List, Tuple, Type, TypedDict, Union
+
+from flow_prediction.shared.value_objects import Decimal, Money
+from ..corpus import Corpus
+
+if TYPE_CHECKING:
+    from ..expense import Expense
+
+
+class CorporaRefill(TypedDict):
+    source: Corpus
+    target: Corpus
+    amount: Money
+
+
+class WithdrawalStrategy:
+    """
+    How an expense draws its amounts from its funding corpora, sequential
+    unless a subclass says otherwise: each funder in turn gives what it has,
+    up to what is left of the amount.
+
+    draw is called once for the initial and once for the recurring amount of
+    a year, with the funders allowed for it (the final one excluded), and
+    returns their deductions and what is left for the final funder. Like
+    Expense.getCorporaDeductions, every funder is judged on its spendable
+    balance before the expense.
+    """
+
+    kind = "sequential"
+
+    def getSignature(self) -> tuple:
+        # what tells apart the flows of two strategies
+        return (self.kind,)
+
+    def getState(self):
+        return None
+
+    def restoreState(self, state):
+        pass
+
+    def getAmounts(
+        self, expense: "Expense", corpora: List[Corpus], year: int
+    ) -> Tuple[Money, Money]:
+        return (
+            expense.getInitialAmountNeeded(year),
+            expense.getRecurringAmountNeeded(year),
+        )
+
+    def getRefills(
+        self, expense: "Expense", corpora: List[Corpus], year: int
+    ) -> List[CorporaRefill]:
+        return []
+
+    def draw(
+        self,
+        expense: "Expense",
+        funders: List[Corpus],
+        finalCorpus: Corpus,
+        amount: Money,
+        year: int,
+    ) -> Tuple[list, Money]:
+        deductions = []
+        for corpus in funders:
+            deduction = min(corpus.getSpendableBalance(year), amount)
+            deductions.append({"corpus": corpus, "deduction": deduction})
+            amount -= deduction
+        return deductions, amount
+
+
+class SequentialWithdrawal(WithdrawalStrategy):
+    pass
+
+
+class WeightedWithdrawal(WithdrawalStrategy, ABC):
+    """
+    Splits an amount over the funders and the final funder by weight, none
+    giving more than it has; what they can't give comes sequentially from
+    the funders with some left, the rest from the final funder.
+    """
+
+    @abstractmethod
+    def getWeights(
+        self, expense: "Expense", corpora: List[Corpus], year: int
+    ) -> List[Decimal]:
+        pass
+
+    def draw(self, expense, funders, finalCorpus, amount, year):
+        corpora = funders + [finalCorpus]
+        weights = self.getWeights(expense, corpora, year)
+        total = sum(weights, Decimal(0))
+        if total <= 0:
+            return [], amount
+        available = [
+            max(corpus.getSpendableBalance(year), Money(0)) for corpus in corpora
+        ]
+        taken = [
+            min(amount * (weight / total), left)
+            for weight, left in zip(weights, available)
+        ]
+        leftover = amount - sum(taken, Money(0))
+        for k in range(len(funders)):
+            extra = min(available[k] - taken[k], leftover)
+            taken[k] += extra
+            leftover -= extra
+        deductions = [
+            {"corpus": corpus, "deduction": deduction}
+            for corpus, deduction in zip(funders, taken)
+        ]
+        return deductions, taken[-1] + leftover
+
+
+class ProportionalWithdrawal(WeightedWithdrawal):
+    """Draws from every funder in proportion to its spendable balance."""
+
+    kind = "proportional"
+
+    def getWeights(self, expense, corpora, year):
+        return [
+            max(corpus.getSpendableBalance(year).amount, Decimal(0))
+            for corpus in corpora
+        ]
+
+
+class GlidePathWithdrawal(WeightedWithdrawal):
+    """
+    Draws from the funders by weights (by funding corpus id) moving
+    linearly from startWeights in the expense's first year to endWeights in
+    its last, e.g. from mostly equity to mostly debt.
+    """
+
+    kind = "glidePath"
+
+    def __init__(
+        self, startWeights: Dict[str, Decimal], endWeights: Dict[str, Decimal]
+    ):
+        self.startWeights = startWeights
+        self.endWeights = endWeights
+        self.validate()
+
+    def validate(self):
+        if set(self.startWeights) != set(self.endWeights):
+            raise ValueError(
+                "Glide path start and end weights are of different corpora"
+            )
+        if any(
+            weight < 0
+            for weight in (*self.startWeights.values(), *self.endWeights.values())
+        ):
+            raise ValueError("Glide path weights should not be negative")
+
+    def getSignature(self):
+        return (
+            self.kind,
+            tuple(sorted(self.startWeights.items())),
+            tuple(sorted(self.endWeights.items())),
+        )
+
+    def getWeights(self, expense, corpora, year):
+        span = expense.endYear - expense.startYear
+        progress = Decimal(year - expense.startYear) / span if span > 0 else Decimal(0)
+        return [
+            self.startWeights.get(corpus.id.value, Decimal(0))
+            + (
+                self.endWeights.get(corpus.id.value, Decimal(0))
+                - self.startWeights.get(corpus.id.value, Decimal(0))
+            )
+            * progress
+            for corpus in corpora
+        ]
+
+
+class GuardrailsWithdrawal(WithdrawalStrategy):
+    """
+    Guyton-Klinger guardrails on the recurring amount: the first year sets
+    the initial withdrawal rate, the amount over the balance of the corpora
+    funding it. When a later year's rate is more than guardrail (relatively)
+    above it, spending is cut by adjustment, when it is as far below, raised
+    by as much, and the change carries over to the years after. Drawn
+    sequentially.
+    """
+
+    kind = "guardrails"
+
+    def __init__(
+        self,
+        guardrail: Decimal = Decimal("0.2"),
+        adjustment: Decimal = Decimal("0.1"),
+    ):
+        self.guardrail = guardrail
+        self.adjustment = adjustment
+        self.initialRate: Union[Decimal, None] = None
+        self.multiplier = Decimal(1)
+        self.validate()
+
+    def validate(self):
+        if not 0 < self.guardrail < 1 or not 0 < self.adjustment < 1:
+            raise ValueError(
+                f"Guardrail {self.guardrail} and adjustment {self.adjustment} should be between 0 and 1"
+            )
+
+    def getSignature(self):
+        return (self.kind, self.guardrail, self.adjustment)
+
+    def getState(self):
+        return (self.initialRate, self.multiplier)
+
+    def restoreState(self, state):
+        self.initialRate, self.multiplier = state
+
+    def getAmounts(self, expense, corpora, year):
+        initialAmount, recurringAmount = super().getAmounts(expense, corpora, year)
+        funders = {
+            fundingCorpus.id.value
+            for fundingCorpus in expense.fundingCorpora[:-1]
+            if fundingCorpus.isAllowedToFund(year, "recurring")
+        }
+        funders.add(expense.fundingCorpora[-1].id.value)
+        balance = sum(
+            (
+                corpus.getBalance().amount
+                for corpus in corpora
+                if corpus.id.value in funders
+            ),
+            Decimal(0),
+        )
+        if balance > 0 and recurringAmount.amount > 0:
+            rate = recurringAmount.amount * self.multiplier / balance
+            if self.initialRate is None:
+                self.initialRate = rate
+            elif rate > self.initialRate * (1 + self.guardrail):
+                self.multiplier *= 1 - self.adjustment
+            elif rate < self.initialRate * (1 - self.guardrail):
+                self.multiplier *= 1 + self.adjustment
+        return initialAmount, recurringAmount * self.multiplier
+
+
+class BucketWithdrawal(WithdrawalStrategy):
+    """
+    Keeps the first active corpus funding the recurring amount (the bucket,
+    e.g. cash) topped up to refillYears of that amount, refilling it once a
+    year from the other active funders in order, the final one last, then
+    draws sequentially.
+    """
+
+    kind = "bucket"
+
+    def __init__(self, refillYears: Decimal = Decimal(2)):
+        self.refillYears = refillYears
+        self.validate()
+
+    def validate(self):
+        if self.refillYears <= 0:
+            raise ValueError(f"Refill years {self.refillYears} should be positive")
+
+    def getSignature(self):
+        return (self.kind, self.refillYears)
+
+    def getRefills(self, expense, corpora, year):
+        buckets = [
+            expense._getCorpus(corpora, fundingCorpus.id)
+            for fundingCorpus in expense.fundingCorpora[:-1]
+            if fundingCorpus.isAllowedToFund(year, "recurring")
+        ]
+        buckets.append(expense._getCorpus(corpora, expense.fundingCorpora[-1].id))
+        # a corpus that has ended or not yet started takes no refill
+        buckets = [corpus for corpus in buckets if corpus.isActive(year)]
+        if len(buckets) < 2:
+            return []
+        bucket = buckets[0]
+        need = expense.getRecurringAmountNeeded(
+            year
+        ) * self.refillYears - bucket.getSpendableBalance(year)
+        refills = []
+        for source in buckets[1:]:
+            if need <= Money(0):
+                break
+            amount = min(source.getSpendableBalance(year), need)
+            if amount > Money(0):
+                refills.append({"source": source, "target": bucket, "amount": amount})
+                need -= amount
+        return refills
+
+
+WITHDRAWAL_STRATEGIES: Dict[str, Type[WithdrawalStrategy]] = {
+    strategy.kind: strategy
+    for strategy in (
+        SequentialWithdrawal,
+        ProportionalWithdrawal,
+        GlidePathWithdrawal,
+        GuardrailsWithdrawal,
+        BucketWithdrawal,
+    )
+}
+
+__all__ = [
+    "CorporaRefill",
+    "WithdrawalStrategy",
+    "SequentialWithdrawal",
+    "WeightedWithdrawal",
+    "ProportionalWithdrawal",
+    "GlidePathWithdrawal",
+    "GuardrailsWithdrawal",
+    "BucketWithdrawal",
+    "WITHDRAWAL_STRATEGIES",
+]
@@ -0,0 +1,104 @@
+import pytest
+
+from flow_prediction.shared.value_objects import (
+    Decimal,
+    Id,
+    InflationAdjustableValue,
+    Money,
+)
+from ...corpus import Corpus
+from ...expense import Expense, FundingCorpus
+from .. import (
+    BucketWithdrawal,
+    GlidePathWithdrawal,
+    GuardrailsWithdrawal,
+    ProportionalWithdrawal,
+    WeightedWithdrawal,
+)
+
+
+def newCorpora(*balances):
+    return [
+        Corpus(Id(f"c{k}"), Decimal(0), Money(balance), 2025, 2100, None, None)
+        for k, balance in enumerate(balances)
+    ]
+
+
+def newExpense(corpora, strategy, recurring=100, endYear=2035):
+    return Expense(
+        Id("rent"),
+        2025,
+        endYear,
+        True,
+        InflationAdjustableValue(Money(0), 2025, Decimal(0)),
+        InflationAdjustableValue(Money(recurring), 2025, Decimal(0)),
+        [FundingCorpus(corpus.id, None, False) for corpus in corpora],
+        corpora,
+        withdrawalStrategy=strategy,
+    )
+
+
+def deducted(expense, corpora, year=2025):
+    deductions, _ = expense.getCorporaDeductions(corpora, year)
+    amounts = {}
+    for deduction in deductions:
+        corpus = deduction["corpus"].id.value
+        amounts[corpus] = amounts.get(corpus, 0) + float(deduction["deduction"])
+    return amounts
+
+
+def test_proportional_draws_by_balance():
+    corpora = newCorpora(300, 100)
+    assert deducted(newExpense(corpora, ProportionalWithdrawal()), corpora) == {
+        "c0": pytest.approx(75),
+        "c1": pytest.approx(25),
+    }
+
+
+def test_glide_path_moves_between_weights():
+    corpora = newCorpora(1000, 1000)
+    strategy = GlidePathWithdrawal(
+        {"c0": Decimal(1), "c1": Decimal(0)}, {"c0": Decimal(0), "c1": Decimal(1)}
+    )
+    expense = newExpense(corpora, strategy)
+    assert deducted(expense, corpora, 2025)["c1"] == pytest.approx(0)
+    assert deducted(expense, corpora, 2030)["c1"] == pytest.approx(50)
+    assert deducted(expense, corpora, 2035)["c1"] == pytest.approx(100)
+
+
+def test_short_funders_fall_back_sequentially():
+    # the first corpus can't give its half, the second one makes up for it
+    corpora = newCorpora(20, 1000, 1000)
+    weights = {"c0": Decimal(1), "c1": Decimal(0), "c2": Decimal(1)}
+    expense = newExpense(corpora, GlidePathWithdrawal(weights, weights), 1000)
+    assert deducted(expense, corpora) == {
+        "c0": pytest.approx(20),
+        "c1": pytest.approx(480),
+        "c2": pytest.approx(500),
+    }
+
+
+def test_guardrails_cut_spending_after_a_fall():
+    corpora = newCorpora(2500)
+    expense = newExpense(corpora, GuardrailsWithdrawal())
+    assert deducted(expense, corpora, 2025) == {"c0": pytest.approx(100)}
+    # the rate goes from 4% to 5%, 25% above
+    corpora[0].restoreBalance(Money(2000))
+    assert deducted(expense, corpora, 2026) == {"c0": pytest.approx(90)}
+
+
+def test_bucket_is_refilled_from_the_other_funders():
+    corpora = newCorpora(50, 100, 1000)
+    expense = newExpense(corpora, BucketWithdrawal(Decimal(2)))
+    refills = expense.getCorporaRefills(corpora, 2025)
+    assert [
+        (refill["source"].id.value, float(refill["amount"])) for refill in refills
+    ] == [("c1", 100), ("c2", 50)]
+
+
+def test_weighted_strategies_without_weights_cannot_be_built():
+    class Unweighted(WeightedWithdrawal):
+        kind = "unweighted"
+
+    with pytest.raises(TypeError, match="getWeights"):
+        Unweighted()
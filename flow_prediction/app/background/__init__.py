@@ -0,0 +1,84 @@
+import threading
+from typing import Union
+
+from flow_prediction.app.use_cases.simulation import CashflowSimulationUseCase
+from flow_prediction.services.simulation import SimulationResponse
+
+
+class BackgroundSimulation:
+    """
+    Streams a CashflowSimulationUseCase on a daemon thread, so that a UI can
+    keep rendering and poll the years simulated so far.
+
+    cancel() stops the run before its next year, e.g. when the plan has been
+    edited mid run; a cancelled run never stores its result and its progress
+    should be discarded. The use case must own its plan data: the UI should
+    not edit it while the run is going.
+    """
+
+    def __init__(self, useCase: CashflowSimulationUseCase):
+        self._useCase = useCase
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+        self._simulation = []
+        self._warnings = []
+        self._error: Union[Exception, None] = None
+        self._thread = threading.Thread(
+            target=self._run, name="background-simulation", daemon=True
+        )
+
+    def start(self) -> "BackgroundSimulation":
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def done(self) -> bool:
+        """Whether the run has finished, failed or stopped after a cancel."""
+        return self._done.is_set()
+
+    def wait(self, timeout: Union[float, None] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def _run(self):
+        try:
+            for progress in self._useCase.stream():
+                if self._cancelled.is_set():
+                    break
+                with self._lock:
+                    self._simulation.append(progress["result"])
+                    self._warnings.extend(progress["warnings"])
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done.set()
+
+    def getProgress(self) -> SimulationResponse:
+        """The years simulated so far, safe to read while the run goes on."""
+        with self._lock:
+            return {
+                "simulation": list(self._simulation),
+                "warnings": list(self._warnings),
+            }
+
+    def getResult(self) -> SimulationResponse:
+        """The complete result, raising whatever made the run fail."""
+        if not self.done:
+            raise RuntimeError("Simulation is still running")
+        if self._error is not None:
+            raise self._error
+        if self.cancelled:
+            raise RuntimeError("Simulation was cancelled")
+        return self.getProgress()
+
+
+__all__ = [
+    "BackgroundSimulation",
+]
@@ -0,0 +1,28 @@
+import contextlib
+import io
+
+from flow_prediction.app.use_cases.simulation import CashflowSimulationUseCase
+from flow_prediction.app.use_cases.simulation.samples import bachelor_for_life
+from .. import BackgroundSimulation
+
+
+def test_streams_the_same_result_as_execute():
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = CashflowSimulationUseCase(bachelor_for_life).execute()
+        run = BackgroundSimulation(CashflowSimulationUseCase(bachelor_for_life))
+        assert run.start().wait(timeout=60)
+    assert run.getResult() == expected
+
+
+def test_cancelled_run_stops_early():
+    class SlowUseCase(CashflowSimulationUseCase):
+        def stream(self):
+            for progress in super().stream():
+                yield progress
+                run.cancel()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        run = BackgroundSimulation(SlowUseCase(bachelor_for_life))
+        assert run.start().wait(timeout=60)
+    assert run.cancelled
+    assert len(run.getProgress()["simulation"]) == 1
@@ -0,0 +1,102 @@
+from typing import Any, List, Literal, Tuple, TypedDict, Union
+
+from flow_prediction.app.use_cases.simulation import (
+    CashflowSimulationUseCaseInitData,
+    getPlanHash,
+)
+
+Path = List[Union[str, int]]
+
+
+class PlanPatch(TypedDict, total=False):
+    # set: replace (or add) the value at path, [] replaces the whole plan
+    # append: append value to the list at path
+    # remove: delete the key or index at path
+    op: Literal["set", "append", "remove"]
+    path: Path
+    value: Any
+
+
+def _patched(node, path: Path, op: str, value):
+    if not path:
+        if op == "set":
+            return value
+        if op == "append":
+            if not isinstance(node, list):
+                raise TypeError(f"Cannot append to {type(node).__name__}")
+            return [*node, value]
+        raise TypeError("Cannot remove the whole plan")
+    key, rest = path[0], path[1:]
+    # only the containers along the path are copied, the rest is shared
+    patched = list(node) if isinstance(node, list) else dict(node)
+    if rest or op == "append":
+        patched[key] = _patched(node[key], rest, op, value)
+    elif op == "set":
+        patched[key] = value
+    else:
+        del patched[key]
+    return patched
+
+
+def applyPatch(
+    plan: CashflowSimulationUseCaseInitData, patch: PlanPatch
+) -> CashflowSimulationUseCaseInitData:
+    """
+    A new plan with the patch applied; plan itself is left untouched and
+    shares every part the patch does not go through.
+    """
+    try:
+        return _patched(plan, patch["path"], patch["op"], patch.get("value"))
+    except (KeyError, IndexError, TypeError) as e:
+        raise ValueError(f"Cannot apply {patch}: {e}") from e
+
+
+class PlanState:
+    """
+    The current version of a plan, changed only through patches.
+
+    Plan versions are never edited in place, so they can be handed to
+    background runs, kept as baselines or shared between sessions without
+    copying, and a version's hash is computed once.
+    """
+
+    def __init__(self, plan: CashflowSimulationUseCaseInitData, maxHistory=50):
+        self.plan = plan
+        self.maxHistory = maxHistory
+        self._history: List[Tuple[CashflowSimulationUseCaseInitData, tuple]] = []
+        self._hash = None
+
+    def apply(self, *patches: PlanPatch):
+        """Applies the patches as one edit, all of them or none."""
+        plan = self.plan
+        for patch in patches:
+            plan = applyPatch(plan, patch)
+        self._history.append((self.plan, patches))
+        del self._history[: -self.maxHistory]
+        self.plan = plan
+        self._hash = None
+
+    def undo(self) -> bool:
+        if not self._history:
+            return False
+        self.plan, _ = self._history.pop()
+        self._hash = None
+        return True
+
+    @property
+    def patches(self) -> List[PlanPatch]:
+        """The patches of the edits that can still be undone, oldest first."""
+        return [patch for _, patches in self._history for patch in patches]
+
+    @property
+    def hash(self) -> str:
+        if self._hash is None:
+            self._hash = getPlanHash(self.plan)
+        return self._hash
+
+
+__all__ = [
+    "PlanPatch",
+    "PlanState",
+    "applyPatch",
+]
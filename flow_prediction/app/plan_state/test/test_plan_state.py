@@ -0,0 +1,34 @@
+import copy
+
+import pytest
+
+from flow_prediction.app.use_cases.simulation.samples import bachelor_for_life
+from .. import PlanState, applyPatch
+
+
+def test_patch_shares_untouched_parts():
+    original = copy.deepcopy(bachelor_for_life)
+    plan = applyPatch(
+        bachelor_for_life,
+        {"op": "set", "path": ["expenses", 0, "enabled"], "value": False},
+    )
+    assert bachelor_for_life == original
+    assert plan["expenses"][0]["enabled"] is False
+    assert plan["expenses"][1] is bachelor_for_life["expenses"][1]
+    assert plan["corpora"] is bachelor_for_life["corpora"]
+
+
+def test_edits_apply_atomically_and_undo():
+    state = PlanState(bachelor_for_life)
+    expenseCount = len(bachelor_for_life["expenses"])
+    state.apply({"op": "remove", "path": ["expenses", 0]})
+    assert len(state.plan["expenses"]) == expenseCount - 1
+    with pytest.raises(ValueError):
+        state.apply(
+            {"op": "append", "path": ["expenses"], "value": {}},
+            {"op": "set", "path": ["missing", "key"], "value": 1},
+        )
+    assert len(state.plan["expenses"]) == expenseCount - 1
+    assert state.undo()
+    assert state.plan is bachelor_for_life
+    assert not state.undo()
@@ -0,0 +1,58 @@
+from typing import Dict, Union
+
+from ..simulation import CashflowSimulationUseCase, CashflowSimulationUseCaseInitData
+from .. import UseCase
+
+
+class HistoricalBacktestUseCase(UseCase):
+    """
+    Replays the plan over every rolling window of the historical returns in
+    a CSV (see readHistoricalReturns), each corpus with a returnSeries
+    earning that series' returns, see RollingWindowBacktestService.
+    corpusSeries (corpus id to series) replaces the plan's returnSeries.
+    """
+
+    def __init__(
+        self,
+        data: CashflowSimulationUseCaseInitData,
+        returnsPath: str,
+        periodsPerYear: int = 1,
+        corpusSeries: Union[Dict[str, str], None] = None,
+    ):
+        self.data = data
+        self.returnsPath = returnsPath
+        self.periodsPerYear = periodsPerYear
+        self.corpusSeries = (
+            corpusSeries
+            if corpusSeries is not None
+            else {
+                corpus["id"]: corpus["returnSeries"]
+                for corpus in data["corpora"]
+                if "returnSeries" in corpus
+            }
+        )
+
+    def execute(self):
+        # numpy is only needed once a back-test actually runs
+        from flow_prediction.infrastructure.historical_returns import (
+            readHistoricalReturns,
+        )
+        from flow_prediction.services.simulation.backtest import (
+            RollingWindowBacktestService,
+        )
+
+        if not self.corpusSeries:
+            raise ValueError(
+                "No corpus has a returnSeries, a back-test would replay growth rates only"
+            )
+        return RollingWindowBacktestService(
+            CashflowSimulationUseCase(self.data).buildServiceData(),
+            readHistoricalReturns(self.returnsPath),
+            self.corpusSeries,
+            self.periodsPerYear,
+        ).run()
+
+
+__all__ = [
+    "HistoricalBacktestUseCase",
+]
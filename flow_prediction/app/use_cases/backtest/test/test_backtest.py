@@ -0,0 +1,57 @@
+import pytest
+
+from .. import HistoricalBacktestUseCase
+
+# living costs drawn from equity alone, replaying stock returns
+plan = {
+    "expenses": [
+        {
+            "id": "living",
+            "startYear": 2025,
+            "endYear": 2029,
+            "enabled": True,
+            "growthRate": 0,
+            "initialValue": {"amount": 0, "referenceTime": 2025},
+            "recurringValue": {"amount": 20000, "referenceTime": 2025},
+            "fundingCorpora": [{"id": "equity"}],
+        }
+    ],
+    "cashflows": [],
+    "corpora": [
+        {
+            "id": "equity",
+            "growthRate": 0.1,
+            "startYear": 2025,
+            "endYear": 2100,
+            "initialAmount": 100000,
+            "returnSeries": "stocks",
+        }
+    ],
+    "simulation": {"startYear": 2025, "endYear": 2029},
+    "currency": "INR",
+    "fallbackCorpusId": "equity",
+    "baseInflation": 0.05,
+}
+
+
+def test_an_early_crash_is_the_worst_window(tmp_path):
+    path = tmp_path / "returns.csv"
+    path.write_text(
+        "year,stocks\n"
+        + "".join(
+            f"{year},{-0.4 if year == 2003 else 0.1}\n" for year in range(2000, 2010)
+        )
+    )
+    result = HistoricalBacktestUseCase(plan, str(path)).execute()
+    assert [window["startYear"] for window in result["windows"]] == list(
+        range(2000, 2006)
+    )
+    # the same crash hurts most in the plan's first year
+    worst = result["worstWindow"]
+    assert worst["startYear"] == 2003
+    assert worst["returns"][0] == [-0.4]
+    assert worst["shortfallYears"] == [2028, 2029]
+    assert [rate["successRate"] for rate in result["successRates"]] == pytest.approx(
+        [1, 1, 1, 2 / 3, 1 / 2]
+    )
+    assert result["successRate"] == 0.5
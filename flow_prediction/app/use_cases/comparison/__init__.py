@@ -0,0 +1,33 @@
+from flow_prediction.services.simulation.comparison import (
+    ScenarioComparison,
+    ScenarioComparisonService,
+)
+from ..simulation import CashflowSimulationUseCase, CashflowSimulationUseCaseInitData
+from .. import UseCase
+
+
+class ScenarioComparisonUseCase(UseCase):
+    """
+    Compares a base plan with a variant of it, e.g. the plan before and after
+    disabling an expense, see ScenarioComparison.
+    """
+
+    def __init__(
+        self,
+        base: CashflowSimulationUseCaseInitData,
+        variant: CashflowSimulationUseCaseInitData,
+    ):
+        self.base = base
+        self.variant = variant
+
+    def execute(self) -> ScenarioComparison:
+        return ScenarioComparisonService(
+            CashflowSimulationUseCase(self.base).buildServiceData(),
+            CashflowSimulationUseCase(self.variant).buildServiceData(),
+        ).compare()
+
+
+__all__ = [
+    "ScenarioComparison",
+    "ScenarioComparisonUseCase",
+]
@@ -0,0 +1,45 @@
+import contextlib
+import copy
+import io
+
+import pytest
+
+from flow_prediction.app.use_cases.simulation import CashflowSimulationUseCase
+from flow_prediction.app.use_cases.simulation.samples import bachelor_for_life
+from .. import ScenarioComparisonUseCase
+
+
+def compare(base, variant):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return ScenarioComparisonUseCase(base, variant).execute()
+
+
+def test_variant_resumes_from_shared_prefix():
+    variant = copy.deepcopy(bachelor_for_life)
+    expense = max(variant["expenses"], key=lambda expense: expense["startYear"])
+    expense["enabled"] = False
+    comparison = compare(bachelor_for_life, variant)
+
+    assert comparison["divergentYear"] == expense["startYear"]
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = CashflowSimulationUseCase(variant).execute()
+    assert comparison["variant"]["warnings"] == expected["warnings"]
+    for actualYear, expectedYear in zip(
+        comparison["variant"]["simulation"], expected["simulation"], strict=True
+    ):
+        for actual, expectedCorpus in zip(
+            actualYear["corpora"], expectedYear["corpora"], strict=True
+        ):
+            assert actual["value"]["amount"] == pytest.approx(
+                expectedCorpus["value"]["amount"], rel=1e-12
+            )
+    divergentIndex = comparison["years"].index(expense["startYear"])
+    assert not any(map(any, comparison["amountDeltas"][:divergentIndex]))
+    assert any(comparison["amountDeltas"][divergentIndex])
+
+
+def test_identical_plans_do_not_diverge():
+    comparison = compare(bachelor_for_life, copy.deepcopy(bachelor_for_life))
+    assert comparison["divergentYear"] is None
+    assert comparison["addedWarnings"] == comparison["removedWarnings"] == []
+    assert not any(map(any, comparison["amountDeltas"]))
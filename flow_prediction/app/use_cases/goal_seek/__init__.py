@@ -0,0 +1,67 @@
+import copy
+from typing import List
+
+from ..simulation import CashflowSimulationUseCase, CashflowSimulationUseCaseInitData
+from .. import UseCase
+
+
+def applySplitSchedule(
+    data: CashflowSimulationUseCaseInitData, schedule: list
+) -> CashflowSimulationUseCaseInitData:
+    """A copy of the plan with the allocation splits of a goal seek schedule."""
+    data = copy.deepcopy(data)
+    for entry in schedule:
+        cashflow = next(
+            cashflow
+            for cashflow in data["cashflows"]
+            if cashflow["id"] == entry["cashflowId"]
+        )
+        allocation = next(
+            allocation
+            for allocation in cashflow["allocations"]
+            if allocation["startYear"] == entry["startYear"]
+            and allocation["endYear"] == entry["endYear"]
+        )
+        allocation["split"] = [
+            {"corpusId": split["corpusId"], "ratio": split["ratio"]}
+            for split in entry["split"]
+        ]
+    return data
+
+
+class AllocationGoalSeekUseCase(UseCase):
+    """
+    Finds allocation splits for the targeted cashflows (and years) that avoid
+    every corpus overshoot and maximize terminal wealth, see
+    AllocationGoalSeekService.optimize for the options.
+    """
+
+    def __init__(
+        self,
+        data: CashflowSimulationUseCaseInitData,
+        targets: List[dict],
+        periodsPerYear: int = 1,
+        **options,
+    ):
+        self.data = data
+        self.targets = targets
+        self.periodsPerYear = periodsPerYear
+        self.options = options
+
+    def execute(self):
+        # numpy is only needed once a goal seek actually runs
+        from flow_prediction.services.simulation.goal_seek import (
+            AllocationGoalSeekService,
+        )
+
+        return AllocationGoalSeekService(
+            CashflowSimulationUseCase(self.data).buildServiceData(),
+            self.targets,
+            self.periodsPerYear,
+        ).optimize(**self.options)
+
+
+__all__ = [
+    "AllocationGoalSeekUseCase",
+    "applySplitSchedule",
+]
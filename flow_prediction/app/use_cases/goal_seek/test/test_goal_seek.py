@@ -0,0 +1,84 @@
+import contextlib
+import io
+
+import pytest
+
+from flow_prediction.app.use_cases.simulation import CashflowSimulationUseCase
+from .. import AllocationGoalSeekUseCase, applySplitSchedule
+
+# rent is only funded from the fixed deposit, which needs 80% of the salary
+plan = {
+    "expenses": [
+        {
+            "id": "rent",
+            "startYear": 2025,
+            "endYear": 2034,
+            "enabled": True,
+            "growthRate": 0,
+            "initialValue": {"amount": 0, "referenceTime": 2025},
+            "recurringValue": {"amount": 80000, "referenceTime": 2025},
+            "fundingCorpora": [{"id": "fixed-deposit"}],
+        }
+    ],
+    "cashflows": [
+        {
+            "id": "salary",
+            "enabled": True,
+            "startYear": 2025,
+            "endYear": 2034,
+            "expandedDescription": "",
+            "recurringValue": {
+                "amount": 100000,
+                "referenceTime": 2025,
+                "growthRate": 0,
+            },
+            "allocations": [
+                {
+                    "startYear": 2025,
+                    "endYear": 2034,
+                    "split": [
+                        {"corpusId": "fixed-deposit", "ratio": 0.5},
+                        {"corpusId": "equity", "ratio": 0.5},
+                    ],
+                }
+            ],
+        }
+    ],
+    "corpora": [
+        {
+            "id": "fixed-deposit",
+            "growthRate": 0.03,
+            "startYear": 2025,
+            "endYear": 2100,
+            "initialAmount": 0,
+        },
+        {
+            "id": "equity",
+            "growthRate": 0.12,
+            "startYear": 2025,
+            "endYear": 2100,
+            "initialAmount": 0,
+        },
+    ],
+    "simulation": {"startYear": 2025, "endYear": 2040},
+    "currency": "INR",
+    "fallbackCorpusId": "fixed-deposit",
+    "baseInflation": 0.05,
+}
+
+
+def test_finds_the_least_split_that_funds_the_expense():
+    result = AllocationGoalSeekUseCase(
+        plan, [{"cashflowId": "salary"}], seed=7
+    ).execute()
+    assert result["overshotYears"] == 0
+    (entry,) = result["schedule"]
+    ratios = {split["corpusId"]: split["ratio"] for split in entry["split"]}
+    assert 0.78 < ratios["fixed-deposit"] < 0.82
+    assert sum(ratios.values()) == pytest.approx(1)
+
+    # the schedule simulates without an overshoot in the Decimal engine too
+    with contextlib.redirect_stdout(io.StringIO()):
+        CashflowSimulationUseCase(
+            applySplitSchedule(plan, result["schedule"])
+        ).execute()
@@ -0,0 +1,64 @@
+from typing import Dict, Sequence, Union
+
+from ..simulation import CashflowSimulationUseCase, CashflowSimulationUseCaseInitData
+from .. import UseCase
+
+
+class MonteCarloUseCase(UseCase):
+    """
+    Simulates the plan over paths of random returns, each corpus with a
+    volatility spreading its returns around its growthRate, see
+    MonteCarloSimulationService. volatilities (corpus id to volatility)
+    replaces the plan's.
+    """
+
+    def __init__(
+        self,
+        data: CashflowSimulationUseCaseInitData,
+        paths: int,
+        seed: Union[int, None] = None,
+        chunkSize: int = 1000,
+        workers: int = 1,
+        periodsPerYear: int = 1,
+        percentiles: Sequence[float] = (5, 50, 95),
+        volatilities: Union[Dict[str, float], None] = None,
+    ):
+        self.data = data
+        self.paths = paths
+        self.seed = seed
+        self.chunkSize = chunkSize
+        self.workers = workers
+        self.periodsPerYear = periodsPerYear
+        self.percentiles = percentiles
+        self.volatilities = (
+            volatilities
+            if volatilities is not None
+            else {
+                corpus["id"]: corpus["volatility"]
+                for corpus in data["corpora"]
+                if "volatility" in corpus
+            }
+        )
+
+    def execute(self):
+        # numpy is only needed once a Monte Carlo run actually starts
+        from flow_prediction.services.simulation.monte_carlo import (
+            MonteCarloSimulationService,
+        )
+
+        return MonteCarloSimulationService(
+            CashflowSimulationUseCase(self.data).buildServiceData(),
+            self.volatilities,
+            self.periodsPerYear,
+        ).run(
+            self.paths,
+            seed=self.seed,
+            chunkSize=self.chunkSize,
+            workers=self.workers,
+            percentiles=self.percentiles,
+        )
+
+
+__all__ = [
+    "MonteCarloUseCase",
+]
@@ -0,0 +1,71 @@
+import pytest
+
+from .. import MonteCarloUseCase
+
+# living costs drawn from equity alone, its returns spread by volatility
+plan = {
+    "expenses": [
+        {
+            "id": "living",
+            "startYear": 2025,
+            "endYear": 2034,
+            "enabled": True,
+            "growthRate": 0,
+            "initialValue": {"amount": 0, "referenceTime": 2025},
+            "recurringValue": {"amount": 12000, "referenceTime": 2025},
+            "fundingCorpora": [{"id": "equity"}],
+        }
+    ],
+    "cashflows": [],
+    "corpora": [
+        {
+            "id": "equity",
+            "growthRate": 0.05,
+            "startYear": 2025,
+            "endYear": 2100,
+            "initialAmount": 100000,
+            "volatility": 0.3,
+        }
+    ],
+    "simulation": {"startYear": 2025, "endYear": 2034},
+    "currency": "INR",
+    "fallbackCorpusId": "equity",
+    "baseInflation": 0.05,
+}
+
+
+def test_runs_are_reproducible_across_workers():
+    serial = MonteCarloUseCase(plan, 2500, seed=7, chunkSize=400).execute()
+    parallel = MonteCarloUseCase(plan, 2500, seed=7, chunkSize=400, workers=3)
+    assert parallel.execute() == serial
+    assert serial["seed"] == 7
+    rates = [year["successRate"] for year in serial["simulation"]]
+    assert rates == sorted(rates, reverse=True)
+    assert 0 < serial["successRate"] < 1
+
+
+def test_without_volatility_every_path_is_the_plan():
+    result = MonteCarloUseCase(plan, 10, seed=1, volatilities={}).execute()
+    assert result["successRate"] == 1
+    # 100000 growing 5% a year, less 12000 a year
+    balance = 100000 * 1.05 - 12000
+    first = result["simulation"][0]
+    assert first["corpora"][0]["value"]["amount"] == pytest.approx(balance, rel=0.02)
+    percentiles = first["totalPercentiles"]
+    assert percentiles["p5"] == percentiles["p50"] == percentiles["p95"]
+
+
+def test_percentiles_are_fields_of_the_annual_results():
+    result = MonteCarloUseCase(plan, 1000, seed=3, percentiles=(10, 90)).execute()
+    for annualResult in result["simulation"]:
+        equity = annualResult["corpora"][0]
+        assert list(equity["percentiles"]) == ["p10", "p50", "p90"]
+        assert equity["value"] == equity["percentiles"]["p50"]
+        bands = [value["amount"] for value in equity["percentiles"].values()]
+        assert bands == sorted(bands)
+
+
+@pytest.mark.parametrize("percentiles", [(150,), (-5, 50)])
+def test_percentiles_outside_0_to_100_are_rejected(percentiles):
+    with pytest.raises(ValueError, match="between 0 and 100"):
+        MonteCarloUseCase(plan, 10, seed=1, percentiles=percentiles).execute()
@@ -1,127 +1,415 @@
-from flow_prediction.aggregates import Expense, Corpus, Cashflow
+import hashlib
+import json
+from typing import Dict, Iterator, List, Tuple, TypedDict
+
+from flow_prediction.aggregates import (
+    CapitalGainsTaxRegime,
+    Expense,
+    Corpus,
+    Cashflow,
+    IncomeTaxRegime,
+    RebalancingPolicy,
+)
 from flow_prediction.aggregates.expense import FundingCorpus
-from flow_prediction.services.simulation import CashflowSimulationService
+from flow_prediction.aggregates.withdrawal_strategy import (
+    WITHDRAWAL_STRATEGIES,
+    BucketWithdrawal,
+    GlidePathWithdrawal,
+    GuardrailsWithdrawal,
+)
+from flow_prediction.services.simulation import (
+    CashflowSimulationService,
+    SimulationAnnualResult,
+)
+from flow_prediction.services.simulation.init_data import (
+    CashflowSimulationServiceInitData,
+)
 from flow_prediction.shared.value_objects import (
+    ExchangeRate,
     InflationAdjustableValue,
     Money,
     Decimal,
     Id,
 )
 from .init_data import CashflowSimulationUseCaseInitData
+from .tax_presets import TAX_REGIME_PRESETS
 from .. import UseCase
 
+ENGINES = ["decimal", "float"]
+
+
+def getPlanHash(data: CashflowSimulationUseCaseInitData) -> str:
+    """Content hash of a plan, independent of key order."""
+    return hashlib.sha256(
+        json.dumps(data, sort_keys=True, separators=(",", ":")).encode()
+    ).hexdigest()
+
+
+class SimulationProgress(TypedDict):
+    year: int
+    result: SimulationAnnualResult
+    warnings: List[str]
+
 
 class CashflowSimulationUseCase(UseCase):
-    def __init__(self, data: CashflowSimulationUseCaseInitData):
+    def __init__(
+        self,
+        data: CashflowSimulationUseCaseInitData,
+        resultStore=None,
+        periodsPerYear: int = 1,
+        recordAnnualResults: bool = True,
+        engine: str = "decimal",
+        shadowCheck: bool = False,
+    ):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine}, expected one of {ENGINES}")
+        if shadowCheck and (engine != "float" or periodsPerYear != 1):
+            raise ValueError(
+                "Shadow checks compare the annual float engine with the Decimal engine"
+            )
         self.data = data
+        # optional SqliteSimulationResultStore serving repeated runs from disk
+        self.resultStore = resultStore
+        # 1 simulates year by year in Decimal, e.g. 12 simulates monthly
+        self.periodsPerYear = periodsPerYear
+        # False only reports the final year, e.g. for screening many plans
+        self.recordAnnualResults = recordAnnualResults
+        # "float" trades exactness to the paisa for speed, e.g. for sweeps,
+        # reporting an error bound; runs with periodsPerYear != 1 always are
+        self.engine = engine
+        # also simulate in Decimal and report the largest divergence from it
+        self.shadowCheck = shadowCheck
+
+    def _getResultKey(self) -> Tuple[str, str]:
+        """(plan hash, variant) of the result in the store."""
+        variant = []
+        if self.periodsPerYear != 1:
+            variant.append(f"periods={self.periodsPerYear}")
+        elif self.engine != "decimal":
+            variant.append(f"engine={self.engine}")
+        # a shadow checked result carries its divergence, plain ones don't
+        if self.shadowCheck:
+            variant.append("shadowCheck")
+        return getPlanHash(self.data), "/".join(variant)
 
     def execute(self):
-        corpora = list(
-            map(
-                lambda d: Corpus(
-                    Id(d["id"]),
-                    Decimal(d["growthRate"]),
-                    Money(d["initialAmount"]),
-                    d["startYear"],
-                    d["endYear"],
-                    (Id(d["successorCorpusId"]) if "successorCorpusId" in d else None),
-                ),
-                self.data["corpora"],
+        if self.resultStore is None:
+            return self._simulate()
+        planHash, variant = self._getResultKey()
+        result = self.resultStore.get(planHash, variant)
+        if result is None:
+            result = self._simulate()
+            if self.recordAnnualResults:
+                self.resultStore.put(planHash, result, variant)
+        elif not self.recordAnnualResults:
+            result = {**result, "simulation": result["simulation"][-1:]}
+        return result
+
+    def stream(self) -> Iterator[SimulationProgress]:
+        """
+        Every year's result and warnings as soon as it is simulated, so that a
+        caller can show progress and stop early by no longer iterating. The
+        result is only stored once the last year has been simulated; a stored
+        result is replayed, with all its warnings on its last year. Annual
+        results are always recorded.
+        """
+        result = None
+        if self.resultStore is not None:
+            result = self.resultStore.get(*self._getResultKey())
+        if result is None and self.periodsPerYear == 1 and self.engine == "decimal":
+            service = CashflowSimulationService(self.buildServiceData())
+            result = {"simulation": [], "warnings": []}
+            for year in range(
+                self.data["simulation"]["startYear"],
+                self.data["simulation"]["endYear"] + 1,
+            ):
+                annualResult, warnings = service.simulateYear(year)
+                warnings = list(map(lambda x: str(x), warnings))
+                result["simulation"].append(annualResult)
+                result["warnings"].extend(warnings)
+                yield {"year": year, "result": annualResult, "warnings": warnings}
+            if self.resultStore is not None:
+                planHash, variant = self._getResultKey()
+                self.resultStore.put(planHash, result, variant)
+            return
+        if result is None:
+            result = CashflowSimulationUseCase(
+                self.data,
+                self.resultStore,
+                self.periodsPerYear,
+                engine=self.engine,
+                shadowCheck=self.shadowCheck,
+            ).execute()
+        for annualResult in result["simulation"]:
+            isLast = annualResult is result["simulation"][-1]
+            yield {
+                "year": annualResult["year"],
+                "result": annualResult,
+                "warnings": result["warnings"] if isLast else [],
+            }
+
+    def _simulate(self):
+        if self.periodsPerYear != 1 or self.engine == "float":
+            from flow_prediction.services.simulation.vectorized import (
+                PeriodicSimulationService,
+                getMaxDivergence,
             )
+
+            result = PeriodicSimulationService(
+                self.buildServiceData(), self.periodsPerYear
+            ).simulate(self.recordAnnualResults)
+            if self.shadowCheck:
+                result["accuracy"]["maxDivergence"] = getMaxDivergence(
+                    result,
+                    CashflowSimulationService(self.buildServiceData()).simulate(
+                        self.recordAnnualResults
+                    ),
+                )
+            return result
+        return CashflowSimulationService(self.buildServiceData()).simulate(
+            self.recordAnnualResults
         )
-        return CashflowSimulationService(
-            {
-                "expenses": list(
-                    map(
-                        lambda d: Expense(
-                            Id(d["id"]),
-                            d["startYear"],
-                            d["endYear"],
-                            d["enabled"],
-                            InflationAdjustableValue(
-                                amount=Money(d["initialValue"]["amount"]),
-                                growthRate=Decimal(d["growthRate"]),
-                                referenceTime=d["initialValue"]["referenceTime"],
-                            ),
-                            InflationAdjustableValue(
-                                amount=Money(d["recurringValue"]["amount"]),
-                                growthRate=Decimal(d["growthRate"]),
-                                referenceTime=d["recurringValue"]["referenceTime"],
-                            ),
-                            fundingCorpora=(
-                                list(
-                                    map(
-                                        lambda fc: FundingCorpus(
-                                            Id(fc["id"]),
-                                            fc.get("startYear", None),
-                                            fc.get("forInitialOnly", False),
-                                        ),
-                                        d["fundingCorpora"],
-                                    )
-                                )
-                                if "fundingCorpora" in d
-                                else None
-                            ),
-                            corpora=corpora,
-                        ),
-                        self.data["expenses"],
+
+    def buildExchangeRates(self) -> Dict[str, ExchangeRate]:
+        return {
+            currency.upper(): ExchangeRate(
+                currency,
+                Decimal(d["rate"]),
+                d["referenceTime"],
+                Decimal(d["growthRate"]),
+                Decimal(d.get("volatility", 0)),
+                {int(year): Decimal(rate) for year, rate in d.get("rates", {}).items()},
+            )
+            for currency, d in self.data.get("exchangeRates", {}).items()
+        }
+
+    def buildTaxRegimes(self):
+        taxRegimes = {}
+        for id, d in self.data.get("taxRegimes", {}).items():
+            if "preset" in d:
+                if d["preset"] not in TAX_REGIME_PRESETS:
+                    raise ValueError(f"Unknown tax regime preset {d['preset']}")
+                d = {**TAX_REGIME_PRESETS[d["preset"]], **d}
+            if d.get("kind") == "income":
+                taxRegimes[id] = IncomeTaxRegime(
+                    Id(id),
+                    [
+                        {
+                            "fromIncome": Decimal(slab["fromIncome"]),
+                            "rate": Decimal(slab["rate"]),
+                        }
+                        for slab in d["slabs"]
+                    ],
+                    Decimal(d.get("standardDeduction", 0)),
+                    Decimal(d.get("rebateLimit", 0)),
+                    Decimal(d.get("cess", 0)),
+                    d["referenceTime"],
+                    Decimal(d.get("indexation", 0)),
+                )
+            elif d.get("kind") == "capitalGains":
+                taxRegimes[id] = CapitalGainsTaxRegime(
+                    Id(id),
+                    Decimal(d["rate"]),
+                    Decimal(d.get("exemption", 0)),
+                    Decimal(d.get("cess", 0)),
+                    (
+                        Decimal(d["shortTermRate"])
+                        if d.get("shortTermRate") is not None
+                        else None
+                    ),
+                    d.get("holdingYears", 1),
+                    d.get("lotMethod", "average"),
+                )
+            else:
+                raise ValueError(
+                    f"Tax regime {id} should be of kind income or capitalGains"
+                )
+        return taxRegimes
+
+    def buildServiceData(self) -> CashflowSimulationServiceInitData:
+        """Aggregates for the simulation services, built fresh on every call."""
+        exchangeRates = self.buildExchangeRates()
+        taxRegimes = self.buildTaxRegimes()
+        startYear = self.data["simulation"]["startYear"]
+
+        def getTaxRegime(d, kind):
+            if "taxRegime" not in d:
+                return None
+            taxRegime = taxRegimes.get(d["taxRegime"])
+            if not isinstance(taxRegime, kind):
+                raise ValueError(
+                    f"{d['id']} needs a tax regime of kind {kind.__name__}, {d['taxRegime']} isn't one"
+                )
+            return taxRegime
+
+        def buildCorpus(d):
+            exchangeRate = None
+            currency = d.get("currency", self.data["currency"]).upper()
+            if currency != self.data["currency"].upper():
+                if currency not in exchangeRates:
+                    raise ValueError(
+                        f"No exchange rate of {currency} for corpus {d['id']}"
                     )
+                exchangeRate = exchangeRates[currency]
+            return Corpus(
+                Id(d["id"]),
+                Decimal(d["growthRate"]),
+                # balances are held in the plan's currency, valued at the
+                # rate of the year before the first simulated one
+                (
+                    Money(d["initialAmount"])
+                    if exchangeRate is None
+                    else exchangeRate.convert(d["initialAmount"], startYear - 1)
                 ),
-                "corpora": corpora,
-                "cashflows": list(
-                    map(
-                        lambda d: Cashflow(
-                            data={
-                                "enabled": d["enabled"],
-                                "id": Id(d["id"]),
-                                "startYear": d["startYear"],
-                                "endYear": d["endYear"],
-                                "expandedDescription": d["expandedDescription"],
-                                "recurringValue": InflationAdjustableValue(
-                                    Money(d["recurringValue"]["amount"]),
-                                    d["recurringValue"]["referenceTime"],
-                                    Decimal(d["recurringValue"]["growthRate"]),
-                                ),
-                                "allocations": list(
-                                    map(
-                                        lambda d2: Cashflow.Allocation(
-                                            {
-                                                "startYear": d2["startYear"],
-                                                "endYear": d2["endYear"],
-                                                "split": list(
-                                                    map(
-                                                        lambda d3: (
-                                                            {
-                                                                "corpusId": Id(
-                                                                    d3["corpusId"]
-                                                                ),
-                                                                "ratio": Decimal(
-                                                                    d3["ratio"]
-                                                                ),
-                                                            }
-                                                        ),
-                                                        d2["split"],
-                                                    )
-                                                ),
-                                            }
-                                        ),
-                                        d["allocations"],
-                                    )
-                                ),
-                            }
-                        ),
-                        self.data["cashflows"],
+                d["startYear"],
+                d["endYear"],
+                (Id(d["successorCorpusId"]) if "successorCorpusId" in d else None),
+                exchangeRate,
+                getTaxRegime(d, CapitalGainsTaxRegime),
+                Money(d["costBasis"]) if "costBasis" in d else None,
+            )
+
+        def buildWithdrawalStrategy(d):
+            if "withdrawalStrategy" not in d:
+                return None
+            strategy = d["withdrawalStrategy"]
+            kind = strategy.get("kind", "sequential")
+            if kind not in WITHDRAWAL_STRATEGIES:
+                raise ValueError(
+                    f"Unknown withdrawal strategy {kind} of expense {d['id']}, should be one of {', '.join(WITHDRAWAL_STRATEGIES)}"
+                )
+            if kind == "glidePath":
+                return GlidePathWithdrawal(
+                    *(
+                        {
+                            id: Decimal(weight)
+                            for id, weight in strategy[weights].items()
+                        }
+                        for weights in ("startWeights", "endWeights")
                     )
-                ),
-                "simulation": {
-                    "startYear": self.data["simulation"]["startYear"],
-                    "endYear": self.data["simulation"]["endYear"],
-                },
-                "currency": self.data["currency"],
-                "fallbackCorpusId": Id(self.data["fallbackCorpusId"]),
-                "baseInflation": Decimal(self.data["baseInflation"]),
-            }
-        ).simulate()
+                )
+            if kind == "guardrails":
+                return GuardrailsWithdrawal(
+                    Decimal(strategy.get("guardrail", "0.2")),
+                    Decimal(strategy.get("adjustment", "0.1")),
+                )
+            if kind == "bucket":
+                return BucketWithdrawal(Decimal(strategy.get("refillYears", 2)))
+            return WITHDRAWAL_STRATEGIES[kind]()
+
+        corpora = list(map(buildCorpus, self.data["corpora"]))
+        rebalancingPolicies = [
+            RebalancingPolicy(
+                Id(d["id"]),
+                d["startYear"],
+                d["endYear"],
+                {id: Decimal(weight) for id, weight in d["targetWeights"].items()},
+                d.get("frequency", "annual"),
+                Decimal(d.get("threshold", "0.05")),
+                d.get("everyYears", 1),
+            )
+            for d in self.data.get("rebalancingPolicies", [])
+        ]
+        return {
+            "expenses": list(
+                map(
+                    lambda d: Expense(
+                        Id(d["id"]),
+                        d["startYear"],
+                        d["endYear"],
+                        d["enabled"],
+                        InflationAdjustableValue(
+                            amount=Money(d["initialValue"]["amount"]),
+                            growthRate=Decimal(d["growthRate"]),
+                            referenceTime=d["initialValue"]["referenceTime"],
+                        ),
+                        InflationAdjustableValue(
+                            amount=Money(d["recurringValue"]["amount"]),
+                            growthRate=Decimal(d["growthRate"]),
+                            referenceTime=d["recurringValue"]["referenceTime"],
+                        ),
+                        fundingCorpora=(
+                            list(
+                                map(
+                                    lambda fc: FundingCorpus(
+                                        Id(fc["id"]),
+                                        fc.get("startYear", None),
+                                        fc.get("forInitialOnly", False),
+                                    ),
+                                    d["fundingCorpora"],
+                                )
+                            )
+                            if "fundingCorpora" in d
+                            else None
+                        ),
+                        corpora=corpora,
+                        withdrawalStrategy=buildWithdrawalStrategy(d),
+                    ),
+                    self.data["expenses"],
+                )
+            ),
+            "corpora": corpora,
+            "cashflows": list(
+                map(
+                    lambda d: Cashflow(
+                        data={
+                            "enabled": d["enabled"],
+                            "id": Id(d["id"]),
+                            "startYear": d["startYear"],
+                            "endYear": d["endYear"],
+                            "expandedDescription": d["expandedDescription"],
+                            "taxRegime": getTaxRegime(d, IncomeTaxRegime),
+                            "recurringValue": InflationAdjustableValue(
+                                Money(d["recurringValue"]["amount"]),
+                                d["recurringValue"]["referenceTime"],
+                                Decimal(d["recurringValue"]["growthRate"]),
+                            ),
+                            "allocations": list(
+                                map(
+                                    lambda d2: Cashflow.Allocation(
+                                        {
+                                            "startYear": d2["startYear"],
+                                            "endYear": d2["endYear"],
+                                            "split": list(
+                                                map(
+                                                    lambda d3: (
+                                                        {
+                                                            "corpusId": Id(
+                                                                d3["corpusId"]
+                                                            ),
+                                                            "ratio": Decimal(
+                                                                d3["ratio"]
+                                                            ),
+                                                        }
+                                                    ),
+                                                    d2["split"],
+                                                )
+                                            ),
+                                        }
+                                    ),
+                                    d["allocations"],
+                                )
+                            ),
+                        }
+                    ),
+                    self.data["cashflows"],
+                )
+            ),
+            "simulation": {
+                "startYear": self.data["simulation"]["startYear"],
+                "endYear": self.data["simulation"]["endYear"],
+            },
+            "currency": self.data["currency"],
+            "fallbackCorpusId": Id(self.data["fallbackCorpusId"]),
+            "baseInflation": Decimal(self.data["baseInflation"]),
+            "rebalancingPolicies": rebalancingPolicies,
+        }
 
 
-__all__ = ["CashflowSimulationUseCase", "CashflowSimulationUseCaseInitData"]
+__all__ = [
+    "ENGINES",
+    "CashflowSimulationUseCase",
+    "SimulationProgress",
+    "CashflowSimulationUseCaseInitData",
+    "getPlanHash",
+]
@@ -1,4 +1,4 @@
-from typing import TypedDict, List, Union
+from typing import Dict, NotRequired, TypedDict, List, Union
 
 
 class AmountReference(TypedDict):
@@ -11,6 +11,20 @@ class FundingCorpus(TypedDict):
     startYear: int
 
 
+class WithdrawalStrategy(TypedDict, total=False):
+    # "sequential" (the default), "proportional", "glidePath", "guardrails"
+    # or "bucket"
+    kind: str
+    # glidePath, by funding corpus id, over the expense's years
+    startWeights: Dict[str, float]
+    endWeights: Dict[str, float]
+    # guardrails
+    guardrail: float
+    adjustment: float
+    # bucket
+    refillYears: float
+
+
 class Expense(TypedDict):
     id: str
     startYear: int
@@ -21,6 +35,8 @@ class Expense(TypedDict):
     recurringValue: AmountReference
     fundingCorpora: List[FundingCorpus]
     group: str
+    # how the amount is drawn from the funding corpora, in order when not given
+    withdrawalStrategy: NotRequired[WithdrawalStrategy]
 
 
 class Corpus(TypedDict):
@@ -30,6 +46,18 @@ class Corpus(TypedDict):
     endYear: int
     initialAmount: int
     successorCorpusId: Union[str, None]
+    # the plan's currency when not given, initialAmount is in this currency
+    currency: NotRequired[str]
+    # a capitalGains regime of the plan, withdrawals then pay tax on gains
+    taxRegime: NotRequired[str]
+    # what the initialAmount cost, in the plan's currency; initialAmount
+    # (no gain yet) when not given
+    costBasis: NotRequired[float]
+    # a series of historical returns this corpus earns in back-tests, its
+    # growthRate when not given
+    returnSeries: NotRequired[str]
+    # annual volatility of its returns in Monte Carlo runs, 0 when not given
+    volatility: NotRequired[float]
 
 
 class CashflowRecurringValue(TypedDict):
@@ -57,6 +85,62 @@ class Cashflow(TypedDict):
     endYear: int
     allocations: List[Allocation]
     expandedDescription: str
+    # an income regime of the plan, the amount is then allocated after tax
+    taxRegime: NotRequired[str]
+
+
+class ExchangeRate(TypedDict):
+    # units of the plan's currency per unit of this one, at referenceTime
+    rate: float
+    referenceTime: int
+    growthRate: float
+    # annual standard deviation of the log rate, for stochastic paths
+    volatility: NotRequired[float]
+    # explicit rates of some years, e.g. {"2026": 86.2}
+    rates: NotRequired[Dict[str, float]]
+
+
+class TaxSlab(TypedDict):
+    fromIncome: float
+    rate: float
+
+
+class TaxRegime(TypedDict, total=False):
+    # "income" (slabs, for cashflows) or "capitalGains" (for corpora)
+    kind: str
+    # one of TAX_REGIME_PRESETS, the other keys override it
+    preset: str
+    cess: float
+    # income
+    slabs: List[TaxSlab]
+    standardDeduction: float
+    rebateLimit: float
+    referenceTime: int
+    indexation: float
+    # capitalGains
+    rate: float
+    exemption: float
+    # gains on what was held for less than holdingYears, all gains are long
+    # term without it
+    shortTermRate: float
+    holdingYears: int
+    # "average" (default) or "fifo", how withdrawals consume purchase lots
+    lotMethod: str
+
+
+class RebalancingPolicy(TypedDict):
+    id: str
+    startYear: int
+    endYear: int
+    # by corpus id, scaled to add up to 1 over the corpora active in a year
+    targetWeights: Dict[str, float]
+    # "annual" (the default), "threshold" or "calendar"
+    frequency: NotRequired[str]
+    # threshold, the drift of a weight that triggers rebalancing, 0.05 when
+    # not given
+    threshold: NotRequired[float]
+    # calendar, years between rebalancings from startYear, 1 when not given
+    everyYears: NotRequired[int]
 
 
 class Simulation(TypedDict):
@@ -72,3 +156,9 @@ class CashflowSimulationUseCaseInitData(TypedDict):
     currency: str
     fallbackCorpusId: str
     baseInflation: float
+    # per currency of a corpus that is not in the plan's currency
+    exchangeRates: NotRequired[Dict[str, ExchangeRate]]
+    # by id, one taxpayer each, e.g. {"salary": {"preset": "india-new-regime-2025"}}
+    taxRegimes: NotRequired[Dict[str, TaxRegime]]
+    # corpora brought back to target weights at the end of a year
+    rebalancingPolicies: NotRequired[List[RebalancingPolicy]]
@@ -1,8 +1,21 @@
+import importlib
+
 # from flow_prediction.app.use_cases.simulation.samples.amol_sample_data import (
 #     amol_sample_data,
 # )
-from .bachelor_for_life import bachelor_for_life
 
 __all__ = [
     "bachelor_for_life",
 ]
+
+
+def __getattr__(name):
+    # samples are rendered from Jinja templates on import, so only load (and
+    # render) one when it is actually used
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    sample = getattr(importlib.import_module(f".{name}", __name__), name)
+    # importing the submodule bound its module object to this name, the
+    # sample itself is what should be found from now on
+    globals()[name] = sample
+    return sample
@@ -0,0 +1,45 @@
+from typing import Dict
+
+from .init_data import TaxRegime
+
+# regimes a plan can start from with {"preset": name}, any other key of the
+# plan's regime overrides the preset's
+TAX_REGIME_PRESETS: Dict[str, TaxRegime] = {
+    # India's new regime from FY 2025-26: section 87A rebate up to 12L of
+    # taxable income, surcharge not modelled
+    "india-new-regime-2025": {
+        "kind": "income",
+        "slabs": [
+            {"fromIncome": 0, "rate": 0.0},
+            {"fromIncome": 400000, "rate": 0.05},
+            {"fromIncome": 800000, "rate": 0.10},
+            {"fromIncome": 1200000, "rate": 0.15},
+            {"fromIncome": 1600000, "rate": 0.20},
+            {"fromIncome": 2000000, "rate": 0.25},
+            {"fromIncome": 2400000, "rate": 0.30},
+        ],
+        "standardDeduction": 75000,
+        "rebateLimit": 1200000,
+        "cess": 0.04,
+        "referenceTime": 2025,
+        "indexation": 0.0,
+    },
+    # LTCG on listed equity and equity funds from July 2024
+    "india-equity-ltcg-2024": {
+        "kind": "capitalGains",
+        "rate": 0.125,
+        "exemption": 125000,
+        "cess": 0.04,
+    },
+    # the same with STCG, 20% on units held for less than a year, consumed
+    # first in first out like fund units are
+    "india-equity-2024": {
+        "kind": "capitalGains",
+        "rate": 0.125,
+        "exemption": 125000,
+        "cess": 0.04,
+        "shortTermRate": 0.20,
+        "holdingYears": 1,
+        "lotMethod": "fifo",
+    },
+}
@@ -0,0 +1,373 @@
+"""
+flow-prediction: simulate plans on disk without the Streamlit app.
+
+  flow-prediction plans/ --format ndjson
+  flow-prediction retire-2050.json retire-2055.json --summary --format csv
+  cat plans.ndjson | flow-prediction --jobs 8 --format parquet --output results/
+  flow-prediction sweep/ --engine float --shadow-sample 0.05 --summary --format csv
+"""
+
+import argparse
+import contextlib
+import csv
+import importlib.util
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, NotRequired, Tuple, TypedDict, Union
+
+from flow_prediction.app.use_cases.simulation import (
+    ENGINES,
+    CashflowSimulationUseCase,
+    CashflowSimulationUseCaseInitData,
+    getPlanHash,
+)
+from flow_prediction.services.simulation import EngineAccuracy
+
+FORMATS = ["json", "ndjson", "csv", "parquet"]
+
+
+class CorpusTerminalBalance(TypedDict):
+    amount: float
+    inflationAdjusted: float
+
+
+class PlanSummary(TypedDict):
+    year: int
+    corpora: dict
+    total: CorpusTerminalBalance
+    warnings: List[str]
+    accuracy: NotRequired[EngineAccuracy]
+
+
+class PlanResult(TypedDict, total=False):
+    id: str
+    simulation: list
+    summary: PlanSummary
+    warnings: List[str]
+    error: str
+
+
+def readPlans(paths: List[str]) -> Iterator[Tuple[str, str]]:
+    """
+    Plan ids with their JSON, from JSON files, directories of JSON files, or
+    NDJSON on stdin (no paths, or "-"). The JSON is parsed by runPlan, so a
+    malformed plan fails on its own rather than the whole batch.
+    """
+    if len(paths) == 0:
+        paths = ["-"]
+    for path in paths:
+        if path == "-":
+            for lineNumber, line in enumerate(sys.stdin, start=1):
+                if line.strip():
+                    yield f"stdin-{lineNumber}", line
+        elif os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(".json"):
+                    yield from readPlans([os.path.join(path, name)])
+        else:
+            with open(path) as planFile:
+                yield os.path.splitext(os.path.basename(path))[0], planFile.read()
+
+
+def isShadowSampled(plan, rate: float) -> bool:
+    """
+    Whether a plan is in a sample of the given rate. Decided by the plan's
+    hash, so a sweep checks the same plans on every run and with any --jobs.
+    """
+    return int(getPlanHash(plan)[:8], 16) < rate * 16**8
+
+
+def summarize(response) -> PlanSummary:
+    lastYear = response["simulation"][-1]
+    corpora = {
+        corpus["id"]: {
+            "amount": corpus["value"]["amount"],
+            "inflationAdjusted": corpus["value"]["inflationAdjusted"],
+        }
+        for corpus in lastYear["corpora"]
+    }
+    accuracy = {"accuracy": response["accuracy"]} if "accuracy" in response else {}
+    return {
+        "year": lastYear["year"],
+        "corpora": corpora,
+        "total": {
+            "amount": sum(corpus["amount"] for corpus in corpora.values()),
+            "inflationAdjusted": sum(
+                corpus["inflationAdjusted"] for corpus in corpora.values()
+            ),
+        },
+        "warnings": response["warnings"],
+        **accuracy,
+    }
+
+
+def runPlan(
+    planId: str,
+    planJson: str,
+    summary: bool,
+    storePath: Union[str, None],
+    periodsPerYear: int = 1,
+    engine: str = "decimal",
+    shadowSample: float = 0.0,
+) -> PlanResult:
+    resultStore = None
+    if storePath is not None:
+        from flow_prediction.infrastructure.result_store import (
+            SqliteSimulationResultStore,
+        )
+
+        resultStore = SqliteSimulationResultStore(storePath)
+    try:
+        plan: CashflowSimulationUseCaseInitData = json.loads(planJson)
+        if not isinstance(plan, dict):
+            raise TypeError(
+                f"A plan should be a JSON object, not {type(plan).__name__}"
+            )
+        # the engine narrates every deposit on stdout, which is our output
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            response = CashflowSimulationUseCase(
+                plan,
+                resultStore=resultStore,
+                periodsPerYear=periodsPerYear,
+                engine=engine,
+                shadowCheck=shadowSample > 0 and isShadowSampled(plan, shadowSample),
+                # a summary only needs the final balances
+                recordAnnualResults=not summary,
+            ).execute()
+    except (ValueError, KeyError, TypeError, ArithmeticError) as e:
+        return {"id": planId, "error": f"{e.__class__.__name__}: {e}"}
+    finally:
+        if resultStore is not None:
+            resultStore.close()
+    if summary:
+        return {"id": planId, "summary": summarize(response)}
+    return {"id": planId, **response}
+
+
+def _runPlan(args) -> PlanResult:
+    return runPlan(*args)
+
+
+def runPlans(
+    plans,
+    jobs: int,
+    summary: bool,
+    storePath: Union[str, None],
+    periodsPerYear: int = 1,
+    engine: str = "decimal",
+    shadowSample: float = 0.0,
+):
+    """Results in input order, computed on a process pool when jobs > 1."""
+    tasks = (
+        (planId, planJson, summary, storePath, periodsPerYear, engine, shadowSample)
+        for planId, planJson in plans
+    )
+    if jobs == 1:
+        yield from map(_runPlan, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(_runPlan, tasks)
+
+
+def writeJson(results, output):
+    output.write("[\n")
+    for i, result in enumerate(results):
+        if i > 0:
+            output.write(",\n")
+        json.dump(result, output)
+    output.write("\n]\n")
+
+
+def writeNdjson(results, output):
+    for result in results:
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+
+
+def writeCsv(results, output, summary: bool):
+    writer = csv.writer(output)
+    if summary:
+        writer.writerow(
+            [
+                "plan_id",
+                "year",
+                "total",
+                "total_inflation_adjusted",
+                "warnings",
+                "first_warning",
+                "error",
+                "max_error_bound",
+                "max_divergence",
+            ]
+        )
+    else:
+        writer.writerow(
+            ["plan_id", "year", "corpus_id", "amount", "inflation_adjusted"]
+        )
+    for result in results:
+        if "error" in result:
+            if summary:
+                writer.writerow(
+                    [result["id"], "", "", "", "", "", result["error"], "", ""]
+                )
+            else:
+                print(f"{result['id']}: {result['error']}", file=sys.stderr)
+            continue
+        if summary:
+            planSummary = result["summary"]
+            accuracy = planSummary.get("accuracy", {})
+            maxDivergence = accuracy.get("maxDivergence")
+            writer.writerow(
+                [
+                    result["id"],
+                    planSummary["year"],
+                    planSummary["total"]["amount"],
+                    planSummary["total"]["inflationAdjusted"],
+                    len(planSummary["warnings"]),
+                    next(iter(planSummary["warnings"]), ""),
+                    "",
+                    accuracy.get("maxErrorBound", ""),
+                    "" if maxDivergence is None else maxDivergence,
+                ]
+            )
+            continue
+        for annualResult in result["simulation"]:
+            for corpus in annualResult["corpora"]:
+                writer.writerow(
+                    [
+                        result["id"],
+                        annualResult["year"],
+                        corpus["id"],
+                        corpus["value"]["amount"],
+                        corpus["value"]["inflationAdjusted"],
+                    ]
+                )
+
+
+def writeParquet(results, path: str):
+    from flow_prediction.infrastructure.arrow_export import SimulationResultWriter
+
+    with SimulationResultWriter(path, format="parquet") as writer:
+        for result in results:
+            if "error" in result:
+                print(f"{result['id']}: {result['error']}", file=sys.stderr)
+                continue
+            writer.write(result["id"], result)
+
+
+def parseArguments(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="flow-prediction",
+        description="Simulate cash flow plans stored as JSON.",
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        help="plan JSON files or directories of them, '-' or nothing for NDJSON on stdin",
+    )
+    parser.add_argument("--format", choices=FORMATS, default="json")
+    parser.add_argument(
+        "--output",
+        "-o",
+        help="output file (directory for parquet), stdout by default",
+    )
+    parser.add_argument(
+        "--summary",
+        action="store_true",
+        help="only report terminal balances and warnings of every plan",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes",
+    )
+    parser.add_argument(
+        "--periods-per-year",
+        type=int,
+        default=1,
+        help="simulation periods per year, e.g. 12 for a monthly simulation",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="decimal",
+        help="float is several times faster and reports a bound on its error in rupees",
+    )
+    parser.add_argument(
+        "--shadow-sample",
+        type=float,
+        default=0.0,
+        metavar="RATE",
+        help="fraction of plans the float engine also simulates in Decimal, "
+        "to report their actual divergence",
+    )
+    parser.add_argument(
+        "--store",
+        help="SQLite result store to serve repeated plans from",
+    )
+    arguments = parser.parse_args(argv)
+    if arguments.jobs < 1:
+        parser.error("--jobs should be at least 1")
+    if arguments.periods_per_year < 1:
+        parser.error("--periods-per-year should be at least 1")
+    if not 0 <= arguments.shadow_sample <= 1:
+        parser.error("--shadow-sample should be between 0 and 1")
+    if arguments.shadow_sample > 0 and (
+        arguments.engine != "float" or arguments.periods_per_year != 1
+    ):
+        parser.error("--shadow-sample needs --engine float and one period per year")
+    if arguments.format == "parquet":
+        if arguments.output is None:
+            parser.error("parquet results need an --output directory")
+        if arguments.summary:
+            parser.error("--summary is not available for parquet output")
+        if importlib.util.find_spec("pyarrow") is None:
+            parser.error(
+                "parquet output needs pyarrow, install the arrow extra: pip install 'cash-flow-planner[arrow]'"
+            )
+    return arguments
+
+
+def main(argv=None) -> int:
+    arguments = parseArguments(argv)
+    failed = []
+
+    def track(results):
+        for result in results:
+            if "error" in result:
+                failed.append(result["id"])
+            yield result
+
+    results = track(
+        runPlans(
+            readPlans(arguments.paths),
+            arguments.jobs,
+            arguments.summary,
+            arguments.store,
+            arguments.periods_per_year,
+            arguments.engine,
+            arguments.shadow_sample,
+        )
+    )
+    if arguments.format == "parquet":
+        writeParquet(results, arguments.output)
+    else:
+        with (
+            open(arguments.output, "w", newline="")
+            if arguments.output is not None
+            else contextlib.nullcontext(sys.stdout)
+        ) as output:
+            if arguments.format == "json":
+                writeJson(results, output)
+            elif arguments.format == "ndjson":
+                writeNdjson(results, output)
+            else:
+                writeCsv(results, output, arguments.summary)
+    if failed:
+        print(f"{len(failed)} plan(s) failed: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,132 @@
+import csv
+import io
+import json
+
+import pytest
+
+from .. import main
+
+# living costs drawn from savings, fed by a salary
+plan = {
+    "expenses": [
+        {
+            "id": "living",
+            "startYear": 2025,
+            "endYear": 2027,
+            "enabled": True,
+            "growthRate": 0,
+            "initialValue": {"amount": 0, "referenceTime": 2025},
+            "recurringValue": {"amount": 1000, "referenceTime": 2025},
+            "fundingCorpora": [{"id": "savings"}],
+        }
+    ],
+    "cashflows": [
+        {
+            "id": "salary",
+            "startYear": 2025,
+            "endYear": 2027,
+            "enabled": True,
+            "expandedDescription": "",
+            "recurringValue": {
+                "amount": 2000,
+                "referenceTime": 2025,
+                "growthRate": 0,
+            },
+            "allocations": [
+                {
+                    "startYear": 2025,
+                    "endYear": 2027,
+                    "split": [{"corpusId": "savings", "ratio": 1}],
+                }
+            ],
+        }
+    ],
+    "corpora": [
+        {
+            "id": "savings",
+            "growthRate": 0,
+            "startYear": 2025,
+            "endYear": 2100,
+            "initialAmount": 10000,
+        }
+    ],
+    "simulation": {"startYear": 2025, "endYear": 2027},
+    "currency": "INR",
+    "fallbackCorpusId": "savings",
+    "baseInflation": 0,
+}
+
+
+@pytest.fixture
+def plans(tmp_path):
+    directory = tmp_path / "plans"
+    directory.mkdir()
+    (directory / "good.json").write_text(json.dumps(plan))
+    (directory / "bad.json").write_text("{not json")
+    return directory
+
+
+def readCsv(text):
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+def test_csv_has_a_row_per_year_and_corpus(plans, capsys):
+    main([str(plans / "good.json"), "--format", "csv", "--jobs", "1"])
+    rows = readCsv(capsys.readouterr().out)
+    assert [(row["plan_id"], row["year"], row["corpus_id"]) for row in rows] == [
+        ("good", "2025", "savings"),
+        ("good", "2026", "savings"),
+        ("good", "2027", "savings"),
+    ]
+    assert [float(row["amount"]) for row in rows] == [11000, 12000, 13000]
+
+
+def test_a_malformed_plan_fails_alone(plans, capsys):
+    exitCode = main([str(plans), "--summary", "--format", "csv", "--jobs", "1"])
+    captured = capsys.readouterr()
+    assert exitCode == 1
+    bad, good = readCsv(captured.out)
+    assert bad["plan_id"] == "bad" and bad["error"].startswith("JSONDecodeError")
+    assert (good["year"], float(good["total"]), good["error"]) == ("2027", 13000, "")
+    assert "1 plan(s) failed: bad" in captured.err
+
+
+def test_ndjson_on_stdin(monkeypatch, capsys):
+    monkeypatch.setattr("sys.stdin", io.StringIO(json.dumps(plan) + "\n\n" + "[]\n"))
+    assert main(["--format", "ndjson", "--summary", "--jobs", "1"]) == 1
+    first, second = map(json.loads, capsys.readouterr().out.splitlines())
+    assert first["id"] == "stdin-1"
+    assert first["summary"]["total"]["amount"] == 13000
+    assert second["id"] == "stdin-3" and "error" in second
+
+
+def test_parquet_output(plans, tmp_path, capsys):
+    pytest.importorskip("pyarrow")
+    from flow_prediction.infrastructure.arrow_export import loadSimulationResults
+
+    output = tmp_path / "results"
+    exitCode = main(
+        [str(plans), "--format", "parquet", "--output", str(output), "--jobs", "1"]
+    )
+    assert exitCode == 1
+    assert "bad: JSONDecodeError" in capsys.readouterr().err
+    rows = loadSimulationResults(str(output)).to_pylist()
+    assert [(row["scenario_id"], row["year"], row["nominal"]) for row in rows] == [
+        ("good", 2025, 11000),
+        ("good", 2026, 12000),
+        ("good", 2027, 13000),
+    ]
+    assert rows[0]["allocated_by_cashflow"] == [("salary", 2000)]
+
+
+def test_a_plan_with_a_malformed_number_fails_alone(tmp_path, capsys):
+    malformed = json.loads(json.dumps(plan))
+    malformed["corpora"][0]["growthRate"] = "abc"
+    for name, content in (("a", plan), ("b", malformed), ("c", plan)):
+        (tmp_path / f"{name}.json").write_text(json.dumps(content))
+    exitCode = main([str(tmp_path), "--summary", "--format", "csv", "--jobs", "1"])
+    assert exitCode == 1
+    rows = readCsv(capsys.readouterr().out)
+    assert [row["plan_id"] for row in rows] == ["a", "b", "c"]
+    assert rows[1]["error"].startswith("InvalidOperation")
+    assert [float(rows[k]["total"]) for k in (0, 2)] == [13000, 13000]
@@ -0,0 +1,144 @@
+import os
+from typing import Literal
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError as error:
+    raise ImportError(
+        "Exporting to Parquet or Arrow needs pyarrow, install the arrow extra: pip install 'cash-flow-planner[arrow]'"
+    ) from error
+
+from flow_prediction.services.simulation import SimulationResponse
+
+ExportFormat = Literal["parquet", "arrow"]
+
+SCHEMA = pa.schema(
+    [
+        ("scenario_id", pa.string()),
+        ("year", pa.int32()),
+        ("corpus_id", pa.string()),
+        ("nominal", pa.float64()),
+        ("inflation_adjusted", pa.float64()),
+        # total of all cashflow allocations into the corpus in that year
+        ("allocated", pa.float64()),
+        ("allocated_by_cashflow", pa.map_(pa.string(), pa.float64())),
+    ]
+)
+
+EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def toRecordBatch(scenarioId: str, response: SimulationResponse) -> pa.RecordBatch:
+    """One row per (year, corpus) of a single simulation."""
+    columns = {name: [] for name in SCHEMA.names}
+    for annualResult in response["simulation"]:
+        allocations = {}
+        for allocation in annualResult["cashflowAllocations"]:
+            for corpus in allocation["corpora"]:
+                byCashflow = allocations.setdefault(corpus["id"], {})
+                byCashflow[allocation["id"]] = (
+                    byCashflow.get(allocation["id"], 0.0) + corpus["value"]
+                )
+        for corpus in annualResult["corpora"]:
+            byCashflow = allocations.get(corpus["id"], {})
+            columns["scenario_id"].append(scenarioId)
+            columns["year"].append(annualResult["year"])
+            columns["corpus_id"].append(corpus["id"])
+            columns["nominal"].append(corpus["value"]["amount"])
+            columns["inflation_adjusted"].append(corpus["value"]["inflationAdjusted"])
+            columns["allocated"].append(sum(byCashflow.values()))
+            columns["allocated_by_cashflow"].append(list(byCashflow.items()))
+    return pa.RecordBatch.from_pydict(columns, schema=SCHEMA)
+
+
+class SimulationResultWriter:
+    """
+    Streams simulation results of many scenarios into a directory of Parquet
+    or Arrow IPC files.
+
+    Every scenario becomes one row group (record batch) written as soon as it
+    is handed over, so memory stays flat however many scenarios a batch has.
+    A new part file is started every scenariosPerFile scenarios.
+
+    with SimulationResultWriter("out/") as writer:
+        for scenarioId, response in results:
+            writer.write(scenarioId, response)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        format: ExportFormat = "parquet",
+        scenariosPerFile: int = 1000,
+    ):
+        if format not in EXTENSIONS:
+            raise ValueError(
+                f"Unknown export format {format}, expected one of {list(EXTENSIONS)}"
+            )
+        if scenariosPerFile < 1:
+            raise ValueError("scenariosPerFile should be at least 1")
+        self.path = path
+        self.format = format
+        self.scenariosPerFile = scenariosPerFile
+        self._writer = None
+        self._parts = 0
+        self._scenariosInPart = 0
+        os.makedirs(path, exist_ok=True)
+
+    def _openPart(self):
+        partPath = os.path.join(
+            self.path, f"part-{self._parts:05d}{EXTENSIONS[self.format]}"
+        )
+        self._parts += 1
+        self._scenariosInPart = 0
+        if self.format == "parquet":
+            self._writer = pq.ParquetWriter(partPath, SCHEMA, compression="zstd")
+        else:
+            self._writer = pa.ipc.new_file(partPath, SCHEMA)
+
+    def write(self, scenarioId: str, response: SimulationResponse):
+        if self._writer is None or self._scenariosInPart >= self.scenariosPerFile:
+            self.close()
+            self._openPart()
+        batch = toRecordBatch(scenarioId, response)
+        if self.format == "parquet":
+            self._writer.write_batch(batch, row_group_size=max(batch.num_rows, 1))
+        else:
+            self._writer.write_batch(batch)
+        self._scenariosInPart += 1
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def loadSimulationResults(path: str) -> pa.Table:
+    """
+    Load a directory written by SimulationResultWriter (or a single part
+    file). Files are memory-mapped, Arrow IPC parts without copying.
+    """
+    if os.path.isdir(path):
+        parts = sorted(
+            os.path.join(path, name)
+            for name in os.listdir(path)
+            if os.path.splitext(name)[1] in EXTENSIONS.values()
+        )
+    else:
+        parts = [path]
+    tables = []
+    for part in parts:
+        if part.endswith(EXTENSIONS["parquet"]):
+            tables.append(pq.read_table(part, memory_map=True))
+        else:
+            tables.append(pa.ipc.open_file(pa.memory_map(part)).read_all())
+    if len(tables) == 0:
+        return SCHEMA.empty_table()
+    return pa.concat_tables(tables)
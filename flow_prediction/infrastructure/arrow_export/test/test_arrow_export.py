@@ -0,0 +1,65 @@
+import importlib
+import sys
+
+import pytest
+
+from .. import SimulationResultWriter, loadSimulationResults
+
+
+def makeResponse(corpusIds, amount):
+    return {
+        "simulation": [
+            {
+                "corpora": [
+                    {
+                        "id": corpusId,
+                        "value": {"amount": amount + i, "inflationAdjusted": amount},
+                        "year": 2025 + i,
+                    }
+                    for corpusId in corpusIds
+                ],
+                "year": 2025 + i,
+                "cashflowAllocations": [
+                    {
+                        "id": "salary",
+                        "corpora": [{"id": corpusIds[0], "value": 0.5}],
+                    },
+                    {"id": "bonus", "corpora": [{"id": corpusIds[0], "value": 0.25}]},
+                ],
+            }
+            for i in range(2)
+        ],
+        "warnings": [],
+    }
+
+
+@pytest.mark.parametrize("format", ["parquet", "arrow"])
+def test_scenarios_with_different_corpora_round_trip(tmp_path, format):
+    with SimulationResultWriter(str(tmp_path), format, scenariosPerFile=2) as writer:
+        writer.write("a", makeResponse(["savings", "equity"], 100.0))
+        writer.write("b", makeResponse(["gold"], 200.0))
+        writer.write("c", makeResponse(["savings"], 300.0))
+    assert len(list(tmp_path.iterdir())) == 2
+    rows = loadSimulationResults(str(tmp_path)).to_pylist()
+    assert [(row["scenario_id"], row["year"], row["corpus_id"]) for row in rows] == [
+        ("a", 2025, "savings"),
+        ("a", 2025, "equity"),
+        ("a", 2026, "savings"),
+        ("a", 2026, "equity"),
+        ("b", 2025, "gold"),
+        ("b", 2026, "gold"),
+        ("c", 2025, "savings"),
+        ("c", 2026, "savings"),
+    ]
+    gold = rows[5]
+    assert (gold["nominal"], gold["inflation_adjusted"]) == (201.0, 200.0)
+    assert gold["allocated"] == 0.75
+    assert gold["allocated_by_cashflow"] == [("salary", 0.5), ("bonus", 0.25)]
+    assert rows[1]["allocated_by_cashflow"] == []
+
+
+def test_missing_pyarrow_names_the_extra(monkeypatch):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    monkeypatch.delitem(sys.modules, SimulationResultWriter.__module__)
+    with pytest.raises(ImportError, match=r"cash-flow-planner\[arrow\]"):
+        importlib.import_module(SimulationResultWriter.__module__)
@@ -0,0 +1,48 @@
+import csv
+from typing import Union
+
+from flow_prediction.services.simulation.backtest import HistoricalReturns
+
+
+def _parseReturn(cell: str) -> Union[float, None]:
+    cell = cell.strip()
+    if cell == "":
+        return None
+    if cell.endswith("%"):
+        return float(cell[:-1]) / 100
+    return float(cell)
+
+
+def readHistoricalReturns(path: str) -> HistoricalReturns:
+    """
+    Annual returns from a CSV with a year column and one column per series,
+    e.g. year,nifty50,sp500,gilt. Returns are fractions (0.12) or
+    percentages (12%), an empty cell is a year the series has no return
+    for. Rows may come in any order, a year only once.
+    """
+    with open(path, newline="") as returnsFile:
+        rows = list(csv.reader(returnsFile))
+    if not rows or rows[0][0].strip().lower() != "year" or len(rows[0]) < 2:
+        raise ValueError(
+            f"{path} should start with a header of year and the series names"
+        )
+    names = [name.strip() for name in rows[0][1:]]
+    returns = {}
+    for lineNumber, row in enumerate(rows[1:], start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        try:
+            year = int(row[0])
+            values = [_parseReturn(cell) for cell in row[1:]]
+        except ValueError as e:
+            raise ValueError(f"{path}:{lineNumber}: {e}") from e
+        if year in returns:
+            raise ValueError(f"{path}:{lineNumber}: year {year} is repeated")
+        returns[year] = values + [None] * (len(names) - len(values))
+    years = sorted(returns)
+    return {
+        "years": years,
+        "series": {
+            name: [returns[year][k] for year in years] for k, name in enumerate(names)
+        },
+    }
@@ -0,0 +1,19 @@
+import pytest
+
+from .. import readHistoricalReturns
+
+
+def test_reads_series_by_year(tmp_path):
+    path = tmp_path / "returns.csv"
+    path.write_text("Year,nifty50,gilt\n2001,12%,0.07\n2000,-0.15,\n")
+    history = readHistoricalReturns(str(path))
+    assert history["years"] == [2000, 2001]
+    assert history["series"]["nifty50"] == [-0.15, pytest.approx(0.12)]
+    assert history["series"]["gilt"] == [None, 0.07]
+
+
+def test_repeated_years_are_rejected(tmp_path):
+    path = tmp_path / "returns.csv"
+    path.write_text("year,nifty50\n2000,0.1\n2000,0.2\n")
+    with pytest.raises(ValueError, match="repeated"):
+        readHistoricalReturns(str(path))
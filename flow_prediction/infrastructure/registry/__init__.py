@@ -0,0 +1,176 @@
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, TypeVar, Union
+
+T = TypeVar("T")
+
+
+def estimateSize(value: Any) -> int:
+    """
+    Approximate bytes held by a tree of dicts, lists and scalars, e.g. a
+    plan or a SimulationResponse. Shared parts are counted once.
+    """
+    seen = set()
+    size = 0
+    stack = [value]
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        size += sys.getsizeof(node)
+        if isinstance(node, dict):
+            stack.extend(node.keys())
+            stack.extend(node.values())
+        elif isinstance(node, (list, tuple, set, frozenset)):
+            stack.extend(node)
+    return size
+
+
+class _Entry:
+    __slots__ = ("value", "error", "ready", "references", "size")
+
+    def __init__(self):
+        self.value = None
+        self.error: Union[BaseException, None] = None
+        self.ready = threading.Event()
+        self.references = 0
+        self.size = 0
+
+
+class Lease(Generic[T]):
+    """
+    A reference to a registry entry, which stays in memory while leased.
+    Released explicitly or, at the latest, when the lease is garbage
+    collected, e.g. with the session that held it.
+    """
+
+    def __init__(self, registry: "ContentRegistry", key: str, value: T):
+        self.key = key
+        self.value = value
+        self._finalizer = weakref.finalize(self, registry._release, key)
+
+    def release(self):
+        # runs at most once, also when the lease is collected later
+        self._finalizer()
+
+
+class ContentRegistry(Generic[T]):
+    """
+    Process wide, thread safe values keyed by content hash, e.g. plans and
+    simulation runs shared by every session of the app server.
+
+    - lease(key, compute) computes a missing value once: concurrent leases of
+      the same key wait for that computation instead of starting their own,
+      and all of them see its error if it fails
+    - leased values are never evicted; once no lease is left, a value is kept
+      for reuse if keepIdle(value) allows, else it is dropped right away
+    - idle values are evicted least recently used first while the registry
+      holds more than maxBytes, as measured by sizeOf when they became idle
+    - dispose(value) is called for every value dropped or evicted
+    """
+
+    def __init__(
+        self,
+        maxBytes: int = 256 * 1024 * 1024,
+        sizeOf: Callable[[T], int] = estimateSize,
+        keepIdle: Callable[[T], bool] = lambda value: True,
+        dispose: Callable[[T], None] = lambda value: None,
+    ):
+        self.maxBytes = maxBytes
+        self._sizeOf = sizeOf
+        self._keepIdle = keepIdle
+        self._dispose = dispose
+        self._lock = threading.Lock()
+        # least recently leased first
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def lease(self, key: str, compute: Callable[[], T]) -> Lease[T]:
+        with self._lock:
+            entry = self._entries.get(key)
+            owner = entry is None
+            if owner:
+                entry = self._entries[key] = _Entry()
+                self._stats["misses"] += 1
+            else:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+            entry.references += 1
+
+        if owner:
+            try:
+                entry.value = compute()
+            except BaseException as e:
+                entry.error = e
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+            finally:
+                entry.ready.set()
+        else:
+            entry.ready.wait()
+        if entry.error is not None:
+            raise entry.error
+        return Lease(self, key, entry.value)
+
+    def get(self, key: str) -> Union[T, None]:
+        """The value if it is available now, without leasing it."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or not entry.ready.is_set() or entry.error is not None:
+            return None
+        return entry.value
+
+    def _release(self, key: str):
+        disposed = []
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.error is not None:
+                return
+            entry.references -= 1
+            if entry.references > 0:
+                return
+            if not self._keepIdle(entry.value):
+                del self._entries[key]
+                self._bytes -= entry.size
+                disposed.append(entry.value)
+            else:
+                size = self._sizeOf(entry.value)
+                self._bytes += size - entry.size
+                entry.size = size
+                disposed.extend(self._evict())
+        for value in disposed:
+            self._dispose(value)
+
+    def _evict(self):
+        evicted = []
+        for key in list(self._entries):
+            if self._bytes <= self.maxBytes:
+                break
+            entry = self._entries[key]
+            if entry.references > 0:
+                continue
+            del self._entries[key]
+            self._bytes -= entry.size
+            self._stats["evictions"] += 1
+            evicted.append(entry.value)
+        return evicted
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def getStats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "bytes": self._bytes}
+
+
+__all__ = [
+    "ContentRegistry",
+    "Lease",
+    "estimateSize",
+]
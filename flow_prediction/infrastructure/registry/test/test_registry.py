@@ -0,0 +1,49 @@
+import threading
+import time
+
+import pytest
+
+from .. import ContentRegistry
+
+
+def test_concurrent_leases_share_one_computation():
+    registry = ContentRegistry()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return {"result": [1.0, 2.0]}
+
+    leases = []
+    threads = [
+        threading.Thread(target=lambda: leases.append(registry.lease("a", compute)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert all(lease.value is leases[0].value for lease in leases)
+
+
+def test_only_idle_entries_are_evicted():
+    registry = ContentRegistry(maxBytes=1000, sizeOf=lambda value: 600)
+    first = registry.lease("first", lambda: "first")
+    second = registry.lease("second", lambda: "second")
+    first.release()
+    first.release()
+    assert registry.get("first") == "first"
+    # both idle now, over budget: the least recently leased goes
+    second.release()
+    assert registry.get("first") is None
+    assert registry.get("second") == "second"
+    assert registry.getStats()["evictions"] == 1
+
+
+def test_failed_computation_is_not_kept():
+    registry = ContentRegistry()
+    with pytest.raises(ValueError):
+        registry.lease("a", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    assert registry.lease("a", lambda: 1).value == 1
@@ -0,0 +1,282 @@
+import sqlite3
+import threading
+from typing import List, Tuple, Union
+
+from flow_prediction.services.simulation import ENGINE_VERSION, SimulationResponse
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    plan_hash TEXT NOT NULL,
+    -- how the plan was simulated, e.g. "engine=float", '' for the default
+    variant TEXT NOT NULL DEFAULT '',
+    engine_version TEXT NOT NULL,
+    start_year INTEGER NOT NULL,
+    end_year INTEGER NOT NULL,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (plan_hash, variant, engine_version)
+);
+
+CREATE TABLE IF NOT EXISTS corpus_balances (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    year INTEGER NOT NULL,
+    corpus_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    inflation_adjusted REAL NOT NULL,
+    PRIMARY KEY (run_id, year, corpus_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS corpus_balances_by_corpus
+    ON corpus_balances (corpus_id, year, amount);
+
+CREATE TABLE IF NOT EXISTS allocations (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    year INTEGER NOT NULL,
+    cashflow_position INTEGER NOT NULL,
+    cashflow_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    corpus_id TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (run_id, year, cashflow_position, position)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS allocations_by_corpus
+    ON allocations (run_id, year, corpus_id);
+
+CREATE TABLE IF NOT EXISTS warnings (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    PRIMARY KEY (run_id, position)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS accuracy (
+    run_id INTEGER PRIMARY KEY REFERENCES runs (run_id) ON DELETE CASCADE,
+    engine TEXT NOT NULL,
+    max_error_bound REAL,
+    max_divergence REAL
+);
+"""
+
+
+class SqliteSimulationResultStore:
+    """
+    Persists simulation results on disk so that a plan simulated once is
+    served from the store in later sessions.
+
+    Runs are keyed by (plan hash, variant, engine version): results of an
+    older engine are never served for a newer one, and a variant (how the
+    plan was simulated, e.g. "engine=float") is never served for another. Balances, allocations and warnings live
+    in normalized tables, so questions across plans can be answered in SQL,
+    e.g. findPlansWithNegativeBalance.
+    """
+
+    def __init__(self, path: str, engineVersion: str = ENGINE_VERSION):
+        self.path = path
+        self.engineVersion = engineVersion
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("PRAGMA foreign_keys=ON")
+        columns = {
+            row[1] for row in self._connection.execute("PRAGMA table_info(runs)")
+        }
+        if columns and "variant" not in columns:
+            # stores from before variants kept them in plan_hash; being a
+            # cache, they start over
+            self._connection.executescript(
+                "DROP TABLE IF EXISTS accuracy; DROP TABLE IF EXISTS warnings; "
+                "DROP TABLE IF EXISTS allocations; "
+                "DROP TABLE IF EXISTS corpus_balances; DROP TABLE runs;"
+            )
+        self._connection.executescript(SCHEMA)
+
+    def _getRunId(self, planHash: str, variant: str) -> Union[int, None]:
+        row = self._connection.execute(
+            "SELECT run_id FROM runs "
+            "WHERE plan_hash = ? AND variant = ? AND engine_version = ?",
+            (planHash, variant, self.engineVersion),
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def has(self, planHash: str, variant: str = "") -> bool:
+        with self._lock:
+            return self._getRunId(planHash, variant) is not None
+
+    def get(self, planHash: str, variant: str = "") -> Union[SimulationResponse, None]:
+        with self._lock:
+            run = self._connection.execute(
+                "SELECT run_id, start_year, end_year FROM runs "
+                "WHERE plan_hash = ? AND variant = ? AND engine_version = ?",
+                (planHash, variant, self.engineVersion),
+            ).fetchone()
+            if run is None:
+                return None
+            runId, startYear, endYear = run
+            simulation = {
+                year: {"corpora": [], "year": year, "cashflowAllocations": []}
+                for year in range(startYear, endYear + 1)
+            }
+            for year, corpusId, amount, inflationAdjusted in self._connection.execute(
+                "SELECT year, corpus_id, amount, inflation_adjusted FROM corpus_balances "
+                "WHERE run_id = ? ORDER BY year, position",
+                (runId,),
+            ):
+                simulation[year]["corpora"].append(
+                    {
+                        "id": corpusId,
+                        "value": {
+                            "amount": amount,
+                            "inflationAdjusted": inflationAdjusted,
+                        },
+                        "year": year,
+                    }
+                )
+            lastCashflow = None
+            for (
+                year,
+                cashflowPosition,
+                cashflowId,
+                corpusId,
+                value,
+            ) in self._connection.execute(
+                "SELECT year, cashflow_position, cashflow_id, corpus_id, value FROM allocations "
+                "WHERE run_id = ? ORDER BY year, cashflow_position, position",
+                (runId,),
+            ):
+                allocations = simulation[year]["cashflowAllocations"]
+                if lastCashflow != (year, cashflowPosition):
+                    allocations.append({"id": cashflowId, "corpora": []})
+                    lastCashflow = (year, cashflowPosition)
+                allocations[-1]["corpora"].append({"id": corpusId, "value": value})
+            warnings = [
+                message
+                for (message,) in self._connection.execute(
+                    "SELECT message FROM warnings WHERE run_id = ? ORDER BY position",
+                    (runId,),
+                )
+            ]
+            accuracy = self._connection.execute(
+                "SELECT engine, max_error_bound, max_divergence FROM accuracy "
+                "WHERE run_id = ?",
+                (runId,),
+            ).fetchone()
+        response = {"simulation": list(simulation.values()), "warnings": warnings}
+        if accuracy is not None:
+            engine, maxErrorBound, maxDivergence = accuracy
+            response["accuracy"] = {
+                "engine": engine,
+                "maxErrorBound": maxErrorBound,
+                "maxDivergence": maxDivergence,
+            }
+        return response
+
+    def put(self, planHash: str, response: SimulationResponse, variant: str = ""):
+        simulation = response["simulation"]
+        if len(simulation) == 0:
+            raise ValueError(f"Cannot store an empty simulation for plan {planHash}")
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM runs "
+                "WHERE plan_hash = ? AND variant = ? AND engine_version = ?",
+                (planHash, variant, self.engineVersion),
+            )
+            runId = self._connection.execute(
+                "INSERT INTO runs "
+                "(plan_hash, variant, engine_version, start_year, end_year) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    planHash,
+                    variant,
+                    self.engineVersion,
+                    simulation[0]["year"],
+                    simulation[-1]["year"],
+                ),
+            ).lastrowid
+            self._connection.executemany(
+                "INSERT INTO corpus_balances "
+                "(run_id, year, corpus_id, position, amount, inflation_adjusted) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        runId,
+                        annualResult["year"],
+                        corpus["id"],
+                        position,
+                        corpus["value"]["amount"],
+                        corpus["value"]["inflationAdjusted"],
+                    )
+                    for annualResult in simulation
+                    for position, corpus in enumerate(annualResult["corpora"])
+                ),
+            )
+            self._connection.executemany(
+                "INSERT INTO allocations "
+                "(run_id, year, cashflow_position, cashflow_id, position, corpus_id, value) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        runId,
+                        annualResult["year"],
+                        cashflowPosition,
+                        allocation["id"],
+                        position,
+                        corpus["id"],
+                        corpus["value"],
+                    )
+                    for annualResult in simulation
+                    for cashflowPosition, allocation in enumerate(
+                        annualResult["cashflowAllocations"]
+                    )
+                    for position, corpus in enumerate(allocation["corpora"])
+                ),
+            )
+            self._connection.executemany(
+                "INSERT INTO warnings (run_id, position, message) VALUES (?, ?, ?)",
+                (
+                    (runId, position, str(warning))
+                    for position, warning in enumerate(response["warnings"])
+                ),
+            )
+            if "accuracy" in response:
+                accuracy = response["accuracy"]
+                self._connection.execute(
+                    "INSERT INTO accuracy "
+                    "(run_id, engine, max_error_bound, max_divergence) "
+                    "VALUES (?, ?, ?, ?)",
+                    (
+                        runId,
+                        accuracy["engine"],
+                        accuracy["maxErrorBound"],
+                        accuracy["maxDivergence"],
+                    ),
+                )
+
+    def findPlansWithNegativeBalance(
+        self, corpusId: str, beforeYear: int, variant: str = ""
+    ) -> List[Tuple[str, int]]:
+        """
+        (plan hash, first negative year) of every plan stored as variant in
+        which the given corpus goes negative before the given year.
+        """
+        with self._lock:
+            return self._connection.execute(
+                "SELECT runs.plan_hash, MIN(corpus_balances.year) FROM corpus_balances "
+                "JOIN runs ON runs.run_id = corpus_balances.run_id "
+                "WHERE corpus_balances.corpus_id = ? AND corpus_balances.year < ? "
+                "AND corpus_balances.amount < 0 AND runs.variant = ? "
+                "AND runs.engine_version = ? "
+                "GROUP BY runs.plan_hash ORDER BY runs.plan_hash",
+                (corpusId, beforeYear, variant, self.engineVersion),
+            ).fetchall()
+
+    def query(self, sql: str, parameters=()) -> List[tuple]:
+        """Run a read-only SQL query against the store."""
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
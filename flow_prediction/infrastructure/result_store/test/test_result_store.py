@@ -0,0 +1,121 @@
+import sqlite3
+
+from .. import SqliteSimulationResultStore
+
+
+def makeResponse(savingsAmounts):
+    return {
+        "simulation": [
+            {
+                "corpora": [
+                    {
+                        "id": "savings",
+                        "value": {"amount": amount, "inflationAdjusted": amount / 2},
+                        "year": 2025 + i,
+                    },
+                    {
+                        "id": "retirement",
+                        "value": {"amount": 10.5, "inflationAdjusted": 5.25},
+                        "year": 2025 + i,
+                    },
+                ],
+                "year": 2025 + i,
+                "cashflowAllocations": [
+                    {
+                        "id": "salary",
+                        "corpora": [
+                            {"id": "savings", "value": 0.75},
+                            {"id": "retirement", "value": 0.25},
+                        ],
+                    }
+                ],
+            }
+            for i, amount in enumerate(savingsAmounts)
+        ],
+        "warnings": ["first warning", "second warning"],
+    }
+
+
+def test_round_trip(tmp_path):
+    store = SqliteSimulationResultStore(str(tmp_path / "results.sqlite"))
+    response = makeResponse([100.0, 200.125, -3.0])
+    assert store.get("plan-a") is None
+    store.put("plan-a", response)
+    assert store.has("plan-a")
+    assert store.get("plan-a") == response
+    store.close()
+
+    # results survive the process, but only for the same engine version
+    reopened = SqliteSimulationResultStore(str(tmp_path / "results.sqlite"))
+    assert reopened.get("plan-a") == response
+    newerEngine = SqliteSimulationResultStore(
+        str(tmp_path / "results.sqlite"), engineVersion="newer"
+    )
+    assert newerEngine.get("plan-a") is None
+
+
+def test_put_replaces_previous_run(tmp_path):
+    store = SqliteSimulationResultStore(str(tmp_path / "results.sqlite"))
+    store.put("plan-a", makeResponse([1.0]))
+    store.put("plan-a", makeResponse([2.0, 3.0]))
+    assert store.get("plan-a") == makeResponse([2.0, 3.0])
+    assert store.query("SELECT COUNT(*) FROM runs") == [(1,)]
+
+
+def test_find_plans_with_negative_balance(tmp_path):
+    store = SqliteSimulationResultStore(str(tmp_path / "results.sqlite"))
+    store.put("never-negative", makeResponse([1.0, 2.0, 3.0]))
+    store.put("negative-early", makeResponse([1.0, -2.0, -3.0]))
+    store.put("negative-late", makeResponse([1.0, 2.0, -3.0]))
+    assert store.findPlansWithNegativeBalance("savings", 2027) == [
+        ("negative-early", 2026)
+    ]
+    assert store.findPlansWithNegativeBalance("savings", 2028) == [
+        ("negative-early", 2026),
+        ("negative-late", 2027),
+    ]
+    assert store.findPlansWithNegativeBalance("retirement", 2100) == []
+
+
+def test_accuracy_is_stored_with_the_result(tmp_path):
+    store = SqliteSimulationResultStore(str(tmp_path / "results.sqlite"))
+    response = {
+        **makeResponse([1.0]),
+        "accuracy": {"engine": "float", "maxErrorBound": 1e-6, "maxDivergence": None},
+    }
+    store.put("plan-a", response)
+    assert store.get("plan-a") == response
+    store.put("plan-a", makeResponse([1.0]))
+    assert "accuracy" not in store.get("plan-a")
+
+
+def test_variants_of_a_plan_are_stored_apart(tmp_path):
+    store = SqliteSimulationResultStore(str(tmp_path / "results.sqlite"))
+    store.put("plan-a", makeResponse([1.0, -2.0]))
+    store.put("plan-a", makeResponse([1.0, 2.0, -3.0]), variant="engine=float")
+    assert store.get("plan-a") == makeResponse([1.0, -2.0])
+    assert store.get("plan-a", "engine=float") == makeResponse([1.0, 2.0, -3.0])
+    assert not store.has("plan-a", "periods=12")
+    assert store.query("SELECT plan_hash, variant FROM runs ORDER BY run_id") == [
+        ("plan-a", ""),
+        ("plan-a", "engine=float"),
+    ]
+    assert store.findPlansWithNegativeBalance("savings", 2100) == [("plan-a", 2026)]
+    assert store.findPlansWithNegativeBalance(
+        "savings", 2100, variant="engine=float"
+    ) == [("plan-a", 2027)]
+
+
+def test_stores_without_variants_start_over(tmp_path):
+    path = str(tmp_path / "results.sqlite")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE runs (run_id INTEGER PRIMARY KEY, plan_hash TEXT NOT NULL)"
+    )
+    connection.execute("INSERT INTO runs (plan_hash) VALUES ('plan-a/engine=float')")
+    connection.commit()
+    connection.close()
+    store = SqliteSimulationResultStore(path)
+    assert store.query("SELECT COUNT(*) FROM runs") == [(0,)]
+    store.put("plan-a", makeResponse([1.0]), variant="engine=float")
+    assert store.get("plan-a", "engine=float") == makeResponse([1.0])
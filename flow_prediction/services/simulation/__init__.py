@@ -1,14 +1,26 @@
 from abc import ABC
-from typing import List, TypedDict
+from decimal import localcontext
+from typing import Dict, List, NotRequired, Tuple, TypedDict, Union
 
 from flow_prediction.shared.value_objects import Money, Id
+from flow_prediction.shared.value_objects.decimal import DECIMAL_CONTEXT
 from .init_data import CashflowSimulationServiceInitData
+from .schedule import ActivitySchedule, FlowSchedule
+from .succession import SuccessionSchedule
 from ...aggregates import Corpus
+from ...aggregates.tax_regime import CostBasisLots
+
+# bump whenever a change alters the numbers a plan simulates to, persisted
+# results are keyed by it
+ENGINE_VERSION = "1"
 
 
 class CorpusSummary(TypedDict):
     value: float
     id: str
+    # stochastic runs only: the value at every percentile of the paths, by
+    # percentile, e.g. {"p5": {"amount": ..., "inflationAdjusted": ...}}
+    percentiles: NotRequired[Dict[str, Dict[str, float]]]
 
 
 class AllocationCorpusResult:
@@ -25,11 +37,26 @@ class SimulationAnnualResult(TypedDict):
     corpora: List[CorpusSummary]
     year: int
     cashflowAllocations: List[AllocationResult]
+    # stochastic runs only: percentiles of the total of the corpora, and the
+    # share of paths without a shortfall up to and including year
+    totalPercentiles: NotRequired[Dict[str, Dict[str, float]]]
+    successRate: NotRequired[float]
+
+
+class EngineAccuracy(TypedDict):
+    engine: str
+    # bound on how far any balance is from exact arithmetic, in the currency,
+    # None when not tracked
+    maxErrorBound: Union[float, None]
+    # largest difference of any balance to the Decimal engine, when checked
+    maxDivergence: Union[float, None]
 
 
 class SimulationResponse(TypedDict):
     simulation: List[SimulationAnnualResult]
     warnings: List[str]
+    # only from engines that are not exact to the paisa
+    accuracy: NotRequired[EngineAccuracy]
 
 
 class Warning(ABC):
@@ -56,6 +83,31 @@ class CashflowSimulationService:
         self.currency = data["currency"]
         self.fallbackCorpusId = data["fallbackCorpusId"]
         self.baseInflation = data["baseInflation"]
+        self.rebalancingPolicies = data.get("rebalancingPolicies", [])
+        self.successionSchedule = SuccessionSchedule(
+            self.corpora,
+            self.fallbackCorpusId,
+            self.simulation["startYear"],
+            self.simulation["endYear"],
+        )
+        self.activitySchedule = ActivitySchedule(
+            self.cashflows,
+            self.expenses,
+            self.simulation["startYear"],
+            self.simulation["endYear"],
+        )
+        self.flowSchedule = FlowSchedule(
+            self.corpora,
+            self.activitySchedule,
+            self.successionSchedule,
+            self.simulation["startYear"],
+            self.simulation["endYear"],
+            self.rebalancingPolicies,
+        )
+        # the last year each corpus has been appreciated for
+        self._appreciatedThrough = {
+            corpus.id.value: self.simulation["startYear"] - 1 for corpus in self.corpora
+        }
 
     def _getCorpus(self, id: Id):
         for corpus in self.corpora:
@@ -74,25 +126,55 @@ class CashflowSimulationService:
                 return True
         return False
 
-    def simulate(self) -> SimulationResponse:
+    def simulate(self, recordAnnualResults: bool = True) -> SimulationResponse:
+        """
+        With recordAnnualResults=False only the final year is reported, and a
+        corpus is only brought up to date in the years it sees a flow: flow
+        free stretches are compounded in one step.
+        """
         simulationResults: List[SimulationAnnualResult] = []
         warnings: List[Warning] = []
-        for year in range(self.simulation["startYear"], self.simulation["endYear"] + 1):
-            simulationResult = {
-                "corpora": [],
-                "year": year,
-                "cashflowAllocations": [],
-            }
+        endYear = self.simulation["endYear"]
+        for year in range(self.simulation["startYear"], endYear + 1):
+            simulationResult, yearWarnings = self.simulateYear(
+                year, recordAnnualResults or year == endYear
+            )
+            warnings.extend(yearWarnings)
+            if simulationResult is not None:
+                simulationResults.append(simulationResult)
 
+        return {
+            "simulation": simulationResults,
+            "warnings": list(map(lambda x: str(x), warnings)),
+        }
+
+    def simulateYear(
+        self, year: int, recordYear: bool = True
+    ) -> Tuple[Union[SimulationAnnualResult, None], List[Warning]]:
+        """
+        Steps the plan through one year, successions included. Years must be
+        simulated in order. Without recordYear only corpora with a flow are
+        brought up to date and no result is returned.
+        """
+        with localcontext(DECIMAL_CONTEXT):
+            return self._simulateYear(year, recordYear)
+
+    def _simulateYear(self, year: int, recordYear: bool):
+        simulationResult = None
+        if recordYear:
             self.appreciateCorpora(year)
+        else:
+            self.appreciateCorpora(year, self.flowSchedule.getCorpora(year))
+
+        cashflowAllocations = self.allocateCashflows(year)
 
-            simulationResult["cashflowAllocations"].extend(self.allocateCashflows(year))
+        warnings = self.deductExpensesFromCorpora(year)
 
-            warningsFromDeductions = self.deductExpensesFromCorpora(year)
-            warnings.extend(warningsFromDeductions)
+        self.rebalanceCorpora(year)
 
-            for corpus in self.corpora:
-                simulationResult["corpora"].append(
+        if recordYear:
+            simulationResult = {
+                "corpora": [
                     {
                         "id": corpus.id.value,
                         "value": {
@@ -107,33 +189,75 @@ class CashflowSimulationService:
                         },
                         "year": year,
                     }
-                )
-            simulationResults.append(simulationResult)
-            self.succeedCorpora(year)
+                    for corpus in self.corpora
+                ],
+                "year": year,
+                "cashflowAllocations": cashflowAllocations,
+            }
+        self.succeedCorpora(year)
+        return simulationResult, warnings
+
+    def getBalances(self) -> Dict[str, Money]:
+        return {corpus.id.value: corpus.getBalance() for corpus in self.corpora}
+
+    def getCostBases(self) -> Dict[str, Union[Money, CostBasisLots, None]]:
+        return {corpus.id.value: corpus.getCostBasis() for corpus in self.corpora}
 
+    def getWithdrawalStates(self) -> Dict[str, object]:
         return {
-            "simulation": simulationResults,
-            "warnings": list(map(lambda x: str(x), warnings)),
+            expense.id.value: expense.withdrawalStrategy.getState()
+            for expense in self.expenses
         }
 
-    def succeedCorpora(self, year):
-        # move to successor corpus if a particular corpus is ending
+    def restoreBalances(
+        self,
+        balances: Dict[str, Money],
+        throughYear: int,
+        costBases: Union[Dict[str, Union[Money, CostBasisLots, None]], None] = None,
+        withdrawalStates: Union[Dict[str, object], None] = None,
+    ):
+        """
+        Resumes from balances (and cost bases, getCostBases, and withdrawal
+        strategy states, getWithdrawalStates) snapshotted (getBalances) at
+        the end of throughYear off a run of a plan with the same corpora, the
+        next simulateYear call must be for throughYear + 1. Capital gains
+        exemptions are per year, so nothing else carries over.
+        """
         for corpus in self.corpora:
-            if corpus.isEnding(year):
-                successor = self._getCorpus(
-                    corpus.successorCorpusId
-                ) or self._getCorpus(self.fallbackCorpusId)
-                if successor is None:
-                    raise ValueError(
-                        f"Successor corpus {corpus.successorCorpusId} not found for corpus {corpus.id}"
-                    )
-                else:
-                    corpus.transferAllTo(successor, year)
+            corpus.restoreBalance(
+                balances[corpus.id.value],
+                None if costBases is None else costBases[corpus.id.value],
+            )
+            self._appreciatedThrough[corpus.id.value] = throughYear
+        for expense in self.expenses if withdrawalStates is not None else []:
+            if expense.id.value in withdrawalStates:
+                expense.withdrawalStrategy.restoreState(
+                    withdrawalStates[expense.id.value]
+                )
+
+    def rebalanceCorpora(self, year):
+        for policy in self.rebalancingPolicies:
+            rebalances = policy.getRebalances(self.corpora, year)
+            # sell first, so that what is bought is what was sold
+            for rebalance in rebalances:
+                if rebalance["amount"] < Money(0):
+                    rebalance["corpus"].spend(-rebalance["amount"], year)
+            for rebalance in rebalances:
+                if rebalance["amount"] > Money(0):
+                    rebalance["corpus"].deposit(rebalance["amount"], year)
+
+    def succeedCorpora(self, year):
+        # move the balance of every corpus ending this year to its resolved successor
+        for corpus, successor in self.successionSchedule.getTransfers(year):
+            corpus.transferAllTo(successor, year)
 
     def deductExpensesFromCorpora(self, year):
         # now time for expenses which must deduct from corpora
         warningsFromDeductions = []
-        for expense in self.expenses:
+        for expense in self.activitySchedule.getExpenses(year):
+            for refill in expense.getCorporaRefills(self.corpora, year):
+                refill["source"].spend(refill["amount"], year)
+                refill["target"].deposit(refill["amount"], year)
             deductions, violatedCorpus = expense.getCorporaDeductions(
                 self.corpora, year
             )
@@ -148,18 +272,14 @@ class CashflowSimulationService:
                     )
                 )
             for deduction in deductions:
-                deduction["corpus"].withdraw(deduction["deduction"], year)
+                # grossed up by any capital gains tax the withdrawal incurs
+                deduction["corpus"].spend(deduction["deduction"], year)
         return warningsFromDeductions
 
     def allocateCashflows(self, year):
         # allocate cashflows to corpora for the year
         cashflowAllocationResults = []
-        for cashflow in self.cashflows:
-
-            allocation = cashflow.getAllocation(year)
-            if allocation is None:
-                # TODO: Add logging here
-                continue
+        for cashflow, allocation in self.activitySchedule.getAllocations(year):
             cashflowAllocationResult = {"id": cashflow.id.value, "corpora": []}
             for split in allocation.split:
                 corpus = self._getCorpus(split["corpusId"])
@@ -167,7 +287,7 @@ class CashflowSimulationService:
                     raise ValueError(
                         f"Corpus {split['corpusId']} not found for allocation in cashflow {cashflow.id}"
                     )
-                amount = split["ratio"] * cashflow.getAmount(year)
+                amount = split["ratio"] * cashflow.getNetAmount(year)
                 cashflowAllocationResult["corpora"].append(
                     {
                         "id": corpus.id.value,
@@ -179,7 +299,12 @@ class CashflowSimulationService:
             cashflowAllocationResults.append(cashflowAllocationResult)
         return cashflowAllocationResults
 
-    def appreciateCorpora(self, year):
-        # account for appreciation of all corpora
-        for corpus in self.corpora:
-            corpus.conductAnnualAppreciation(year)
+    def appreciateCorpora(self, year, corpora: List[Corpus] = None):
+        # bring corpora (all by default) up to date with this year's appreciation
+        for corpus in self.corpora if corpora is None else corpora:
+            pendingYears = year - self._appreciatedThrough[corpus.id.value]
+            if pendingYears == 1:
+                corpus.conductAnnualAppreciation(year)
+            else:
+                corpus.conductCompoundAppreciation(pendingYears, year)
+            self._appreciatedThrough[corpus.id.value] = year
@@ -0,0 +1,185 @@
+from typing import Dict, List, TypedDict, Union
+
+import numpy as np
+
+from .. import SimulationAnnualResult
+from ..compiled import CompiledPlan
+from ..init_data import CashflowSimulationServiceInitData
+from ..vectorized import VectorizedSimulationEngine
+
+
+class HistoricalReturns(TypedDict):
+    years: List[int]
+    # by series (e.g. "nifty50"), the return of every year as a fraction,
+    # None for the years the series has none
+    series: Dict[str, List[Union[float, None]]]
+
+
+class BacktestWindow(TypedDict):
+    # the historical year replayed as the plan's first one
+    startYear: int
+    # first plan year an expense's last funding corpus couldn't cover, None
+    # if the plan held up
+    shortfallYear: Union[int, None]
+    terminalWealth: float
+    terminalWealthInflationAdjusted: float
+
+
+class BacktestSuccessRate(TypedDict):
+    year: int
+    # share of windows without a shortfall up to and including year
+    successRate: float
+
+
+class BacktestWindowDrillDown(TypedDict):
+    startYear: int
+    # the annual returns replayed, [year][corpus]
+    returns: List[List[float]]
+    simulation: List[SimulationAnnualResult]
+    # every plan year with a shortfall
+    shortfallYears: List[int]
+
+
+class BacktestResult(TypedDict):
+    corpusIds: List[str]
+    windows: List[BacktestWindow]
+    successRate: float
+    successRates: List[BacktestSuccessRate]
+    # the window failing first, else ending with the least inflation
+    # adjusted wealth
+    worstWindow: BacktestWindowDrillDown
+
+
+class RollingWindowBacktestService:
+    """
+    Replays a plan over every rolling window of historical annual returns:
+    the window starting in a historical year gives the plan's first year
+    that year's returns, its second year the next one's, and so on. Corpora
+    mapped to a series (corpusSeries, corpus id to series) earn its returns,
+    the others their growthRate. Only windows with a return for every
+    mapped series in every year are replayed.
+
+    All windows are simulated at once, as paths of the vectorized engine,
+    and an expense its last funding corpus can't cover is a shortfall of
+    the window rather than an error. Inflation adjustment uses the plan's
+    baseInflation.
+    """
+
+    def __init__(
+        self,
+        data: CashflowSimulationServiceInitData,
+        history: HistoricalReturns,
+        corpusSeries: Dict[str, str],
+        periodsPerYear: int = 1,
+    ):
+        self.plan = CompiledPlan(data)
+        self.engine = VectorizedSimulationEngine(self.plan, periodsPerYear)
+        plan = self.plan
+        years = history["years"]
+        returns = np.tile(plan.growthRates, (len(years), 1))
+        for corpusId, series in corpusSeries.items():
+            if corpusId not in plan.corpusIds:
+                raise ValueError(f"Corpus {corpusId} not found for series {series}")
+            if series not in history["series"]:
+                raise ValueError(
+                    f"No historical series {series} for corpus {corpusId}, there are {', '.join(history['series'])}"
+                )
+            returns[:, plan.corpusIds.index(corpusId)] = [
+                np.nan if value is None else value
+                for value in history["series"][series]
+            ]
+        self.startYears: List[int] = []
+        starts = []
+        for start in range(len(years) - plan.yearCount + 1):
+            end = start + plan.yearCount
+            if (
+                years[end - 1] - years[start] == plan.yearCount - 1
+                and not np.isnan(returns[start:end]).any()
+            ):
+                self.startYears.append(years[start])
+                starts.append(start)
+        if not starts:
+            raise ValueError(
+                f"No {plan.yearCount} consecutive years of history for every mapped series, cannot replay the plan"
+            )
+        # (year, window, corpus)
+        self.returns = returns[
+            np.array(starts)[None, :] + np.arange(plan.yearCount)[:, None]
+        ]
+
+    def run(self) -> BacktestResult:
+        plan = self.plan
+        windows = len(self.startYears)
+        balances = np.zeros((plan.yearCount, plan.corpusCount, windows))
+        overshot = np.zeros((plan.yearCount, windows), dtype=bool)
+        for yearIndex, yearBalances, yearOvershot in self.engine.iterate(
+            windows,
+            returns=lambda yearIndex: self.returns[yearIndex],
+            raiseOnOvershoot=False,
+        ):
+            balances[yearIndex] = np.reshape(yearBalances, (plan.corpusCount, -1))
+            overshot[yearIndex] = yearOvershot
+        failed = overshot.any(axis=0)
+        shortfallIndices = np.where(failed, overshot.argmax(axis=0), plan.yearCount)
+        terminalWealth = balances[-1].sum(axis=0)
+        terminalWealthInflationAdjusted = terminalWealth / plan.inflationDivisors[-1]
+        worst = np.lexsort((terminalWealthInflationAdjusted, shortfallIndices))[0]
+        held = 1 - np.logical_or.accumulate(overshot, axis=0).mean(axis=1)
+        return {
+            "corpusIds": list(plan.corpusIds),
+            "windows": [
+                {
+                    "startYear": startYear,
+                    "shortfallYear": (
+                        plan.years[shortfallIndices[window]] if failed[window] else None
+                    ),
+                    "terminalWealth": float(terminalWealth[window]),
+                    "terminalWealthInflationAdjusted": float(
+                        terminalWealthInflationAdjusted[window]
+                    ),
+                }
+                for window, startYear in enumerate(self.startYears)
+            ],
+            "successRate": float(held[-1]),
+            "successRates": [
+                {"year": year, "successRate": float(rate)}
+                for year, rate in zip(plan.years, held)
+            ],
+            "worstWindow": self._drillDown(worst, balances, overshot),
+        }
+
+    def _drillDown(
+        self, window: int, balances: np.ndarray, overshot: np.ndarray
+    ) -> BacktestWindowDrillDown:
+        plan = self.plan
+        return {
+            "startYear": self.startYears[window],
+            "returns": self.returns[:, window].tolist(),
+            "simulation": [
+                {
+                    "corpora": [
+                        {
+                            "id": corpusId,
+                            "value": {
+                                "amount": float(balance),
+                                "inflationAdjusted": float(
+                                    balance / plan.inflationDivisors[yearIndex]
+                                ),
+                            },
+                            "year": year,
+                        }
+                        for corpusId, balance in zip(
+                            plan.corpusIds, balances[yearIndex, :, window]
+                        )
+                    ],
+                    "year": year,
+                    "cashflowAllocations": plan.allocations[yearIndex],
+                }
+                for yearIndex, year in enumerate(plan.years)
+            ],
+            "shortfallYears": [
+                year
+                for yearIndex, year in enumerate(plan.years)
+                if overshot[yearIndex, window]
+            ],
+        }
@@ -0,0 +1,206 @@
+from collections import Counter
+from typing import List, TypedDict, Union
+
+from .. import CashflowSimulationService, SimulationResponse
+from ..init_data import CashflowSimulationServiceInitData
+
+
+class ScenarioComparison(TypedDict):
+    years: List[int]
+    # base plan corpora first, then the ones only the variant has
+    corpusIds: List[str]
+    # first year the plans simulate differently, None if they never do
+    divergentYear: Union[int, None]
+    base: SimulationResponse
+    variant: SimulationResponse
+    # variant minus base, [year][corpus], a corpus missing from a plan is 0
+    amountDeltas: List[List[float]]
+    inflationAdjustedDeltas: List[List[float]]
+    # warnings only the variant raises, and only the base raises
+    addedWarnings: List[str]
+    removedWarnings: List[str]
+
+
+def _getStaticSignature(service: CashflowSimulationService):
+    # everything that shapes the balances before any flow
+    return (
+        tuple(
+            (
+                corpus.id.value,
+                corpus.growthRate,
+                corpus.getBalance(),
+                corpus.startYear,
+                corpus.endYear,
+                corpus.exchangeRate,
+                corpus.costBasis,
+                (
+                    None
+                    if corpus.taxRegime is None
+                    else (
+                        corpus.taxRegime.id.value,
+                        corpus.taxRegime.effectiveRate,
+                        corpus.taxRegime.exemption,
+                        corpus.taxRegime.shortTermEffectiveRate,
+                        corpus.taxRegime.holdingYears,
+                        corpus.taxRegime.lotMethod,
+                    )
+                ),
+            )
+            for corpus in service.corpora
+        ),
+        service.simulation["startYear"],
+        service.baseInflation,
+    )
+
+
+def _getYearSignature(service: CashflowSimulationService, year: int):
+    # the flows of a year, as amounts and corpora they touch
+    return (
+        tuple(
+            (
+                cashflow.id.value,
+                tuple(
+                    (
+                        split["corpusId"].value,
+                        split["ratio"] * cashflow.getNetAmount(year),
+                    )
+                    for split in allocation.split
+                ),
+            )
+            for cashflow, allocation in service.activitySchedule.getAllocations(year)
+        ),
+        tuple(
+            (
+                expense.id.value,
+                expense.getInitialAmountNeeded(year),
+                expense.getRecurringAmountNeeded(year),
+                expense.withdrawalStrategy.getSignature(),
+                tuple(
+                    (
+                        fundingCorpus.id.value,
+                        fundingCorpus.isAllowedToFund(year, "initial"),
+                        fundingCorpus.isAllowedToFund(year, "recurring"),
+                    )
+                    for fundingCorpus in expense.fundingCorpora
+                ),
+            )
+            for expense in service.activitySchedule.getExpenses(year)
+        ),
+        tuple(
+            (source.id.value, target.id.value)
+            for source, target in service.successionSchedule.getTransfers(year)
+        ),
+        tuple(
+            policy.getSignature()
+            for policy in service.rebalancingPolicies
+            if policy.isDue(year)
+        ),
+    )
+
+
+def _difference(warnings: List[str], others: List[str]) -> List[str]:
+    # warnings not matched by one in others, in order, repeats counted
+    remaining = Counter(others)
+    difference = []
+    for warning in warnings:
+        if remaining[warning] > 0:
+            remaining[warning] -= 1
+        else:
+            difference.append(warning)
+    return difference
+
+
+class ScenarioComparisonService:
+    """
+    Simulates a base plan and a variant of it (e.g. one expense disabled)
+    over the same years, and reports how the variant differs.
+
+    Years before the first one in which the two plans have different flows
+    simulate to the same balances, so that shared prefix is only simulated
+    once: the variant resumes from the base plan's balances at the end of it.
+    """
+
+    def __init__(
+        self,
+        base: CashflowSimulationServiceInitData,
+        variant: CashflowSimulationServiceInitData,
+    ):
+        if base["simulation"] != variant["simulation"]:
+            raise ValueError(
+                f"Plans simulate different years, {base['simulation']} and {variant['simulation']}, cannot compare them"
+            )
+        self.base = CashflowSimulationService(base)
+        self.variant = CashflowSimulationService(variant)
+        self.startYear = base["simulation"]["startYear"]
+        self.endYear = base["simulation"]["endYear"]
+
+    def getDivergentYear(self) -> Union[int, None]:
+        if _getStaticSignature(self.base) != _getStaticSignature(self.variant):
+            return self.startYear
+        for year in range(self.startYear, self.endYear + 1):
+            if _getYearSignature(self.base, year) != _getYearSignature(
+                self.variant, year
+            ):
+                return year
+        return None
+
+    def compare(self) -> ScenarioComparison:
+        divergentYear = self.getDivergentYear()
+        sharedThrough = self.endYear if divergentYear is None else divergentYear - 1
+
+        baseResults, baseWarnings = [], []
+        variantResults, variantWarnings = [], []
+        for year in range(self.startYear, self.endYear + 1):
+            simulationResult, warnings = self.base.simulateYear(year)
+            warnings = [str(warning) for warning in warnings]
+            baseResults.append(simulationResult)
+            baseWarnings.extend(warnings)
+            if year <= sharedThrough:
+                variantResults.append(simulationResult)
+                variantWarnings.extend(warnings)
+            if year == sharedThrough and divergentYear is not None:
+                self.variant.restoreBalances(
+                    self.base.getBalances(),
+                    sharedThrough,
+                    self.base.getCostBases(),
+                    self.base.getWithdrawalStates(),
+                )
+        for year in range(sharedThrough + 1, self.endYear + 1):
+            simulationResult, warnings = self.variant.simulateYear(year)
+            variantResults.append(simulationResult)
+            variantWarnings.extend(str(warning) for warning in warnings)
+
+        corpusIds = [corpus.id.value for corpus in self.base.corpora]
+        corpusIds += [
+            corpus.id.value
+            for corpus in self.variant.corpora
+            if corpus.id.value not in corpusIds
+        ]
+        deltas = {"amount": [], "inflationAdjusted": []}
+        for baseResult, variantResult in zip(baseResults, variantResults):
+            baseValues = {
+                corpus["id"]: corpus["value"] for corpus in baseResult["corpora"]
+            }
+            variantValues = {
+                corpus["id"]: corpus["value"] for corpus in variantResult["corpora"]
+            }
+            for key, yearDeltas in deltas.items():
+                yearDeltas.append(
+                    [
+                        variantValues.get(id, {key: 0.0})[key]
+                        - baseValues.get(id, {key: 0.0})[key]
+                        for id in corpusIds
+                    ]
+                )
+
+        return {
+            "years": list(range(self.startYear, self.endYear + 1)),
+            "corpusIds": corpusIds,
+            "divergentYear": divergentYear,
+            "base": {"simulation": baseResults, "warnings": baseWarnings},
+            "variant": {"simulation": variantResults, "warnings": variantWarnings},
+            "amountDeltas": deltas["amount"],
+            "inflationAdjustedDeltas": deltas["inflationAdjusted"],
+            "addedWarnings": _difference(variantWarnings, baseWarnings),
+            "removedWarnings": _difference(baseWarnings, variantWarnings),
+        }
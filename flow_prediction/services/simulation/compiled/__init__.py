@@ -0,0 +1,324 @@
+from typing import List, Tuple, Union
+
+import numpy as np
+
+from ..init_data import CashflowSimulationServiceInitData
+from ..schedule import ActivitySchedule
+from ..succession import SuccessionSchedule
+from ..withdrawal import VectorizedWithdrawal, compileWithdrawal
+
+
+class CompiledExpense:
+    """
+    What an expense asks of the corpora in one year, with funding corpora
+    resolved to positions in CompiledPlan.corpusIds.
+    """
+
+    __slots__ = (
+        "index",
+        "id",
+        "initialAmount",
+        "recurringAmount",
+        "initialFunders",
+        "recurringFunders",
+        "finalFunder",
+        "strategy",
+    )
+
+    def __init__(
+        self,
+        index: int,
+        id: str,
+        initialAmount: float,
+        recurringAmount: float,
+        initialFunders: Tuple[int, ...],
+        recurringFunders: Tuple[int, ...],
+        finalFunder: int,
+        strategy: Union[VectorizedWithdrawal, None] = None,
+    ):
+        self.index = index
+        self.id = id
+        self.initialAmount = initialAmount
+        self.recurringAmount = recurringAmount
+        self.initialFunders = initialFunders
+        self.recurringFunders = recurringFunders
+        self.finalFunder = finalFunder
+        self.strategy = strategy
+
+
+class CompiledRebalancing:
+    """
+    A rebalancing due in one year over the corpora at positions, as the
+    matrix taking their balances to the moves toward their weights:
+    (weights 1^T - I) @ balances. threshold is None unless it only applies
+    when some weight has drifted further than it.
+    """
+
+    __slots__ = ("positions", "weights", "matrix", "threshold")
+
+    def __init__(
+        self,
+        positions: Tuple[int, ...],
+        weights: np.ndarray,
+        threshold: Union[float, None],
+    ):
+        self.positions = positions
+        self.weights = weights
+        self.matrix = np.outer(weights, np.ones(len(weights))) - np.eye(len(weights))
+        self.threshold = threshold
+
+
+class CompiledPlan:
+    """
+    A plan lowered once to plain float arrays indexed by (year, corpus
+    position), for engines that step many periods or many paths at once.
+
+    Amounts are still computed by the aggregates (inflation adjustment,
+    allocations, funding rules) in Decimal and only then converted, so every
+    engine built on a compiled plan shares the plan semantics of
+    CashflowSimulationService:
+      - deposits[y, c]: cashflow allocations into corpus c in year y
+      - expenses[y]: the expenses active in year y, in plan order
+      - transfers[y]: (from, to) successions at the end of year y
+      - exchangeRatios[y, c]: how much the base currency value of corpus c
+        moves with its exchange rate in year y, 1 for base currency corpora
+      - taxRegimes[c]: position of corpus c's capital gains regime in
+        capitalGainsTaxRegimes, -1 if untaxed; deposits are after income tax
+      - lotMethods[c]: how corpus c's purchase lots are consumed, None if
+        its regime doesn't track lots; gains on lots held for less than
+        holdingYears[c] are taxed at shortTermTaxRates[c]
+      - withdrawalStrategies[e]: how expense e draws from its funders, None
+        if sequentially; also on every CompiledExpense as strategy
+      - rebalancing[y]: the rebalancings due at the end of year y, in order
+      - activeCorpora[y, c]: whether corpus c is active in year y
+    Allocations into corpora that are not active fail here, not mid-run.
+    """
+
+    def __init__(self, data: CashflowSimulationServiceInitData):
+        corpora = data["corpora"]
+        self.corpusIds: List[str] = [corpus.id.value for corpus in corpora]
+        self.expenseIds: List[str] = [expense.id.value for expense in data["expenses"]]
+        self.startYear: int = data["simulation"]["startYear"]
+        self.endYear: int = data["simulation"]["endYear"]
+        self.years = range(self.startYear, self.endYear + 1)
+        self.currency = data["currency"]
+        self.baseInflation = float(data["baseInflation"])
+        self.growthRates = np.array(
+            [float(corpus.growthRate) for corpus in corpora], dtype=np.float64
+        )
+        self.initialBalances = np.array(
+            [float(corpus.getBalance()) for corpus in corpora], dtype=np.float64
+        )
+        self.inflationDivisors = (1 + self.baseInflation) ** np.arange(
+            len(self.years), dtype=np.float64
+        )
+        # per corpus: its currency, and the annual volatility of its rate
+        self.corpusCurrencies: List[str] = [
+            (
+                corpus.exchangeRate.currency
+                if corpus.isForeign
+                else str(self.currency).upper()
+            )
+            for corpus in corpora
+        ]
+        self.exchangeRateVolatilities = np.array(
+            [
+                float(corpus.exchangeRate.volatility) if corpus.isForeign else 0.0
+                for corpus in corpora
+            ],
+            dtype=np.float64,
+        )
+        self.hasForeignCorpora = any(corpus.isForeign for corpus in corpora)
+        self.exchangeRatios = np.ones((len(self.years), len(corpora)), dtype=np.float64)
+        for position, corpus in enumerate(corpora):
+            if corpus.isForeign:
+                self.exchangeRatios[:, position] = [
+                    float(corpus.exchangeRate.getRatio(year)) for year in self.years
+                ]
+        self.capitalGainsTaxRegimes = []
+        self.taxRegimes: List[int] = []
+        for corpus in corpora:
+            if corpus.taxRegime is None:
+                self.taxRegimes.append(-1)
+                continue
+            if corpus.taxRegime not in self.capitalGainsTaxRegimes:
+                self.capitalGainsTaxRegimes.append(corpus.taxRegime)
+            self.taxRegimes.append(self.capitalGainsTaxRegimes.index(corpus.taxRegime))
+        self.hasCapitalGainsTax = bool(self.capitalGainsTaxRegimes)
+        self.taxRates = np.array(
+            [
+                (
+                    0.0
+                    if corpus.taxRegime is None
+                    else float(corpus.taxRegime.effectiveRate)
+                )
+                for corpus in corpora
+            ],
+            dtype=np.float64,
+        )
+        self.shortTermTaxRates = np.array(
+            [
+                (
+                    0.0
+                    if corpus.taxRegime is None
+                    else float(corpus.taxRegime.shortTermEffectiveRate)
+                )
+                for corpus in corpora
+            ],
+            dtype=np.float64,
+        )
+        # 0 when every gain is long term
+        self.holdingYears: List[int] = [
+            (
+                corpus.taxRegime.holdingYears
+                if corpus.taxRegime is not None
+                and corpus.taxRegime.shortTermRate is not None
+                else 0
+            )
+            for corpus in corpora
+        ]
+        self.lotMethods: List[Union[str, None]] = [
+            (
+                corpus.taxRegime.lotMethod
+                if corpus.taxRegime is not None and corpus.taxRegime.tracksLots
+                else None
+            )
+            for corpus in corpora
+        ]
+        self.hasLots = any(method is not None for method in self.lotMethods)
+        self.exemptions = np.array(
+            [float(regime.exemption) for regime in self.capitalGainsTaxRegimes],
+            dtype=np.float64,
+        )
+        self.initialCostBases = np.array(
+            [
+                float(
+                    corpus.getBalance()
+                    if corpus.costBasis is None
+                    else corpus.costBasis
+                )
+                for corpus in corpora
+            ],
+            dtype=np.float64,
+        )
+        # the initial balance of a corpus is a lot bought the year before it starts
+        self.corpusStartYears: List[int] = [corpus.startYear for corpus in corpora]
+        positions = {id: position for position, id in enumerate(self.corpusIds)}
+        activitySchedule = ActivitySchedule(
+            data["cashflows"], data["expenses"], self.startYear, self.endYear
+        )
+        expenseIndices = {id: index for index, id in enumerate(self.expenseIds)}
+        self.activeCorpora = np.array(
+            [[corpus.isActive(year) for corpus in corpora] for year in self.years],
+            dtype=bool,
+        ).reshape(len(self.years), len(corpora))
+        self.withdrawalStrategies: List[Union[VectorizedWithdrawal, None]] = [
+            compileWithdrawal(expense, self.corpusIds, self.years, self.activeCorpora)
+            for expense in data["expenses"]
+        ]
+        self.hasWithdrawalStrategies = any(
+            strategy is not None for strategy in self.withdrawalStrategies
+        )
+
+        self.deposits = np.zeros((len(self.years), len(corpora)), dtype=np.float64)
+        self.allocations: List[list] = []
+        for yearIndex, year in enumerate(self.years):
+            allocationResults = []
+            for cashflow, allocation in activitySchedule.getAllocations(year):
+                cashflowAllocationResult = {"id": cashflow.id.value, "corpora": []}
+                for split in allocation.split:
+                    position = positions.get(split["corpusId"].value)
+                    if position is None:
+                        raise ValueError(
+                            f"Corpus {split['corpusId']} not found for allocation in cashflow {cashflow.id}"
+                        )
+                    if not corpora[position].isActive(year):
+                        raise ValueError(
+                            f"Corpus {corpora[position].id} is not active in year {year}, hence cannot deposit, only grow"
+                        )
+                    amount = float(split["ratio"] * cashflow.getNetAmount(year))
+                    self.deposits[yearIndex, position] += amount
+                    cashflowAllocationResult["corpora"].append(
+                        {"id": self.corpusIds[position], "value": amount}
+                    )
+                allocationResults.append(cashflowAllocationResult)
+            self.allocations.append(allocationResults)
+
+        self.expenses: List[List[CompiledExpense]] = []
+        for year in self.years:
+            compiledExpenses = []
+            for expense in activitySchedule.getExpenses(year):
+
+                def position(fundingCorpus):
+                    if fundingCorpus.id.value not in positions:
+                        raise ValueError(
+                            f"Funding Corpus {fundingCorpus.id} not found for {expense}"
+                        )
+                    return positions[fundingCorpus.id.value]
+
+                nonFinal = expense.fundingCorpora[:-1]
+                compiledExpenses.append(
+                    CompiledExpense(
+                        expenseIndices[expense.id.value],
+                        expense.id.value,
+                        float(expense.getInitialAmountNeeded(year).amount),
+                        float(expense.getRecurringAmountNeeded(year).amount),
+                        tuple(
+                            position(fundingCorpus)
+                            for fundingCorpus in nonFinal
+                            if fundingCorpus.isAllowedToFund(year, "initial")
+                        ),
+                        tuple(
+                            position(fundingCorpus)
+                            for fundingCorpus in nonFinal
+                            if fundingCorpus.isAllowedToFund(year, "recurring")
+                        ),
+                        position(expense.fundingCorpora[-1]),
+                        self.withdrawalStrategies[expenseIndices[expense.id.value]],
+                    )
+                )
+            self.expenses.append(compiledExpenses)
+
+        successionSchedule = SuccessionSchedule(
+            corpora, data["fallbackCorpusId"], self.startYear, self.endYear
+        )
+        self.rebalancing: List[List[CompiledRebalancing]] = []
+        for year in self.years:
+            compiledRebalancing = []
+            for policy in data.get("rebalancingPolicies", []):
+                if not policy.isDue(year):
+                    continue
+                weights = policy.getWeights(corpora, year)
+                if len(weights) < 2:
+                    continue
+                compiledRebalancing.append(
+                    CompiledRebalancing(
+                        tuple(positions[corpus.id.value] for corpus, _ in weights),
+                        np.array(
+                            [float(weight) for _, weight in weights], dtype=np.float64
+                        ),
+                        (
+                            float(policy.threshold)
+                            if policy.frequency == "threshold"
+                            else None
+                        ),
+                    )
+                )
+            self.rebalancing.append(compiledRebalancing)
+        self.hasRebalancing = any(self.rebalancing)
+
+        self.transfers: List[List[Tuple[int, int]]] = [
+            [
+                (positions[source.id.value], positions[target.id.value])
+                for source, target in successionSchedule.getTransfers(year)
+            ]
+            for year in self.years
+        ]
+
+    @property
+    def corpusCount(self):
+        return len(self.corpusIds)
+
+    @property
+    def yearCount(self):
+        return len(self.years)
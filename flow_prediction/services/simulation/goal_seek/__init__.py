@@ -0,0 +1,271 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple, TypedDict, Union
+
+import numpy as np
+
+from ..compiled import CompiledPlan
+from ..init_data import CashflowSimulationServiceInitData
+from ..vectorized import VectorizedSimulationEngine
+
+
+class AllocationTarget(TypedDict, total=False):
+    cashflowId: str
+    # allocations of the cashflow overlapping these years, all when not given
+    startYear: int
+    endYear: int
+
+
+class SplitRatio(TypedDict):
+    corpusId: str
+    ratio: float
+
+
+class SplitScheduleEntry(TypedDict):
+    cashflowId: str
+    startYear: int
+    endYear: int
+    split: List[SplitRatio]
+
+
+class GoalSeekIteration(TypedDict):
+    iteration: int
+    bestTerminalWealth: float
+    bestOvershotYears: int
+    eliteTerminalWealth: float
+    feasibleFraction: float
+
+
+class GoalSeekResult(TypedDict):
+    schedule: List[SplitScheduleEntry]
+    terminalWealth: float
+    overshotYears: int
+    trace: List[GoalSeekIteration]
+
+
+class _SplitBlock:
+    """The ratios of one allocation, over the corpora of its split."""
+
+    def __init__(self, cashflowId, startYear, endYear, corpusIds, ratios):
+        self.cashflowId = cashflowId
+        self.startYear = startYear
+        self.endYear = endYear
+        self.corpusIds = corpusIds
+        self.ratios = np.array(ratios, dtype=np.float64)
+
+
+class _SplitEvaluator:
+    """
+    Terminal wealth and years with an overshoot of candidate split schedules,
+    all candidates simulated at once as paths of the vectorized engine.
+    """
+
+    def __init__(self, plan: CompiledPlan, periodsPerYear: int, blocks):
+        self.engine = VectorizedSimulationEngine(plan, periodsPerYear)
+        positions = {id: position for position, id in enumerate(plan.corpusIds)}
+        self.baseDeposits = plan.deposits.copy()
+        # per block: the cashflow's amount per year (0 outside the
+        # allocation) and the corpus positions its ratios scatter to
+        self.amounts = []
+        self.scatters = []
+        for block in blocks:
+            amounts = np.zeros(plan.yearCount, dtype=np.float64)
+            for yearIndex, year in enumerate(plan.years):
+                if not block.startYear <= year <= block.endYear:
+                    continue
+                for allocation in plan.allocations[yearIndex]:
+                    if allocation["id"] != block.cashflowId:
+                        continue
+                    for corpus in allocation["corpora"]:
+                        self.baseDeposits[yearIndex, positions[corpus["id"]]] -= corpus[
+                            "value"
+                        ]
+                        amounts[yearIndex] += corpus["value"]
+            scatter = np.zeros((len(block.corpusIds), plan.corpusCount))
+            for k, corpusId in enumerate(block.corpusIds):
+                scatter[k, positions[corpusId]] = 1.0
+            self.amounts.append(amounts)
+            self.scatters.append(scatter)
+
+    def __call__(self, candidates: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        paths = len(candidates[0])
+        deposits = np.repeat(self.baseDeposits[:, None, :], paths, axis=1)
+        for ratios, amounts, scatter in zip(candidates, self.amounts, self.scatters):
+            deposits += amounts[:, None, None] * (ratios @ scatter)[None]
+        overshotYears = np.zeros(paths, dtype=np.int64)
+        for _, balances, overshot in self.engine.iterate(
+            paths, raiseOnOvershoot=False, deposits=deposits
+        ):
+            overshotYears += overshot
+        return np.atleast_1d(np.sum(balances, axis=0)), overshotYears
+
+
+_workerEvaluator: Union[_SplitEvaluator, None] = None
+
+
+def _initializeWorker(evaluator: _SplitEvaluator):
+    global _workerEvaluator
+    _workerEvaluator = evaluator
+
+
+def _evaluateInWorker(candidates):
+    return _workerEvaluator(candidates)
+
+
+class AllocationGoalSeekService:
+    """
+    Searches the split ratios of selected cashflow allocations for the
+    schedule that never overshoots a corpus and, among those, ends with the
+    most wealth.
+
+    Every allocation's ratios live on a simplex and are sampled from a
+    Dirichlet distribution, refitted to the best candidates every iteration
+    (the cross-entropy method). Candidates are simulated as paths of the
+    vectorized engine, split across worker processes when workers > 1. The
+    plan's own splits are always part of the first population, so the result
+    is never worse than them.
+    """
+
+    def __init__(
+        self,
+        data: CashflowSimulationServiceInitData,
+        targets: List[AllocationTarget],
+        periodsPerYear: int = 1,
+    ):
+        self.plan = CompiledPlan(data)
+        self.blocks: List[_SplitBlock] = []
+        cashflows = {cashflow.id.value: cashflow for cashflow in data["cashflows"]}
+        for target in targets:
+            if target["cashflowId"] not in cashflows:
+                raise ValueError(f"Cashflow {target['cashflowId']} not found")
+            cashflow = cashflows[target["cashflowId"]]
+            for allocation in cashflow.allocations:
+                if allocation.endYear < target.get(
+                    "startYear", allocation.startYear
+                ) or allocation.startYear > target.get("endYear", allocation.endYear):
+                    continue
+                self.blocks.append(
+                    _SplitBlock(
+                        cashflow.id.value,
+                        allocation.startYear,
+                        allocation.endYear,
+                        [split["corpusId"].value for split in allocation.split],
+                        [float(split["ratio"]) for split in allocation.split],
+                    )
+                )
+        if not self.blocks:
+            raise ValueError(f"No allocation matches the targets {targets}")
+        self.evaluator = _SplitEvaluator(self.plan, periodsPerYear, self.blocks)
+
+    def optimize(
+        self,
+        populationSize: int = 64,
+        eliteFraction: float = 0.2,
+        iterations: int = 40,
+        smoothing: float = 0.7,
+        tolerance: float = 1e-4,
+        workers: int = 1,
+        seed: Union[int, None] = None,
+    ) -> GoalSeekResult:
+        """
+        Stops after iterations, or once the elite of every allocation agrees
+        on its ratios to within tolerance.
+        """
+        rng = np.random.default_rng(seed)
+        eliteCount = max(2, int(populationSize * eliteFraction))
+        alphas = [np.ones(len(block.corpusIds)) for block in self.blocks]
+        best = [block.ratios[None, :] for block in self.blocks]
+        bestScore = None
+        trace: List[GoalSeekIteration] = []
+
+        workers = min(workers, populationSize)
+        executor = None
+        if workers > 1:
+            executor = ProcessPoolExecutor(
+                workers, initializer=_initializeWorker, initargs=(self.evaluator,)
+            )
+        try:
+            for iteration in range(iterations):
+                # the best so far competes in every population
+                candidates = [
+                    np.concatenate([ratios, rng.dirichlet(alpha, populationSize - 1)])
+                    for ratios, alpha in zip(best, alphas)
+                ]
+                terminalWealth, overshotYears = self._evaluate(
+                    candidates, executor, workers
+                )
+                # fewest years with an overshoot first, then most wealth
+                order = np.lexsort((-terminalWealth, overshotYears))
+                elite = order[:eliteCount]
+                top = order[0]
+                score = (int(overshotYears[top]), -float(terminalWealth[top]))
+                if bestScore is None or score < bestScore:
+                    bestScore = score
+                    best = [ratios[top : top + 1] for ratios in candidates]
+                trace.append(
+                    {
+                        "iteration": iteration,
+                        "bestTerminalWealth": -bestScore[1],
+                        "bestOvershotYears": bestScore[0],
+                        "eliteTerminalWealth": float(terminalWealth[elite].mean()),
+                        "feasibleFraction": float(np.mean(overshotYears == 0)),
+                    }
+                )
+                spread = 0.0
+                for b, ratios in enumerate(candidates):
+                    alphas[b] = (
+                        smoothing * self._fitDirichlet(ratios[elite])
+                        + (1 - smoothing) * alphas[b]
+                    )
+                    spread = max(spread, float(ratios[elite].std(axis=0).max()))
+                if spread < tolerance:
+                    break
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        return {
+            "schedule": [
+                {
+                    "cashflowId": block.cashflowId,
+                    "startYear": block.startYear,
+                    "endYear": block.endYear,
+                    "split": [
+                        {"corpusId": corpusId, "ratio": float(ratio)}
+                        for corpusId, ratio in zip(block.corpusIds, ratios[0])
+                    ],
+                }
+                for block, ratios in zip(self.blocks, best)
+            ],
+            "terminalWealth": -bestScore[1],
+            "overshotYears": bestScore[0],
+            "trace": trace,
+        }
+
+    def _evaluate(self, candidates, executor, workers):
+        if executor is None:
+            return self.evaluator(candidates)
+        chunks = np.array_split(np.arange(len(candidates[0])), workers)
+        results = list(
+            executor.map(
+                _evaluateInWorker,
+                [[ratios[chunk] for ratios in candidates] for chunk in chunks],
+            )
+        )
+        return (
+            np.concatenate([terminalWealth for terminalWealth, _ in results]),
+            np.concatenate([overshotYears for _, overshotYears in results]),
+        )
+
+    @staticmethod
+    def _fitDirichlet(samples: np.ndarray) -> np.ndarray:
+        # moment matching: the mean fixes the direction, the variance the
+        # concentration
+        mean = samples.mean(axis=0)
+        variance = samples.var(axis=0)
+        if len(mean) == 1:
+            return np.ones(1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            concentration = np.median(mean * (1 - mean) / variance - 1)
+        if not np.isfinite(concentration):
+            concentration = 1e6
+        return np.maximum(mean * np.clip(concentration, 1.0, 1e6), 1e-3)
@@ -1,6 +1,6 @@
-from typing import List, TypedDict
+from typing import List, NotRequired, TypedDict
 
-from flow_prediction.aggregates import Expense, Cashflow, Corpus
+from flow_prediction.aggregates import Expense, Cashflow, Corpus, RebalancingPolicy
 from flow_prediction.shared.value_objects import Id, Decimal
 
 
@@ -17,3 +17,5 @@ class CashflowSimulationServiceInitData(TypedDict):
     currency: str
     fallbackCorpusId: Id
     baseInflation: Decimal
+    # applied in order at the end of every year, after expenses
+    rebalancingPolicies: NotRequired[List[RebalancingPolicy]]
@@ -0,0 +1,242 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Sequence, TypedDict, Union
+
+import numpy as np
+
+from .. import SimulationAnnualResult
+from ..compiled import CompiledPlan
+from ..init_data import CashflowSimulationServiceInitData
+from ..sketch import LogHistogram
+from ..vectorized import VectorizedSimulationEngine, sampleExchangeRatios
+
+
+class MonteCarloResult(TypedDict):
+    paths: int
+    # the entropy of the root SeedSequence, replays the run
+    seed: int
+    chunkSize: int
+    successRate: float
+    # balances and totals beyond the histograms' range, counted at its edge,
+    # so percentiles reaching them are understated
+    clampedValues: int
+    # the median of every corpus as its value, with its percentiles, those
+    # of the total and the successRate of every year
+    simulation: List[SimulationAnnualResult]
+
+
+class _ChunkResult:
+    """What a chunk of paths leaves behind, merged into the run's."""
+
+    def __init__(self, balances: LogHistogram, totals: LogHistogram, years: int):
+        self.balances = balances
+        self.totals = totals
+        # paths with a shortfall up to and including every year
+        self.failed = np.zeros(years, dtype=np.int64)
+
+    def merge(self, other: "_ChunkResult"):
+        self.balances.merge(other.balances)
+        self.totals.merge(other.totals)
+        self.failed += other.failed
+
+
+class _ChunkSimulator:
+    """
+    Simulates one chunk of paths from its own SeedSequence: lognormal
+    returns with the expected growth of every corpus and its volatility,
+    and the plan's exchange rates with their volatilities. Only the
+    histograms of the chunk's balances leave it.
+    """
+
+    def __init__(
+        self,
+        plan: CompiledPlan,
+        periodsPerYear: int,
+        volatilities: np.ndarray,
+        relativeAccuracy: float,
+    ):
+        self.plan = plan
+        self.engine = VectorizedSimulationEngine(plan, periodsPerYear)
+        self.volatilities = volatilities
+        self.relativeAccuracy = relativeAccuracy
+        # drift of the log returns, so that 1 + growthRate is their mean
+        self.drifts = np.log1p(plan.growthRates) - volatilities**2 / 2
+        self.hasStochasticExchangeRates = bool(plan.exchangeRateVolatilities.any())
+
+    def newResult(self) -> _ChunkResult:
+        plan = self.plan
+        return _ChunkResult(
+            LogHistogram((plan.yearCount, plan.corpusCount), self.relativeAccuracy),
+            LogHistogram((plan.yearCount,), self.relativeAccuracy),
+            plan.yearCount,
+        )
+
+    def __call__(self, paths: int, seedSequence: np.random.SeedSequence):
+        plan = self.plan
+        rng = np.random.default_rng(seedSequence)
+        exchangeRatios = (
+            sampleExchangeRatios(plan, paths, rng)
+            if self.hasStochasticExchangeRates
+            else None
+        )
+        result = self.newResult()
+        failed = np.zeros(paths, dtype=bool)
+
+        def returns(yearIndex):
+            shocks = rng.standard_normal((paths, plan.corpusCount))
+            return np.expm1(self.drifts + self.volatilities * shocks)
+
+        for yearIndex, balances, overshot in self.engine.iterate(
+            paths,
+            returns=returns,
+            raiseOnOvershoot=False,
+            exchangeRatios=exchangeRatios,
+        ):
+            # (paths, corpora), also for a single path
+            balances = np.reshape(balances, (plan.corpusCount, -1)).T
+            result.balances.add((yearIndex,), balances)
+            result.totals.add((yearIndex,), balances.sum(axis=1)[:, None])
+            failed |= overshot
+            result.failed[yearIndex] = np.count_nonzero(failed)
+        return result
+
+
+_workerSimulator: Union[_ChunkSimulator, None] = None
+
+
+def _initializeWorker(simulator: _ChunkSimulator):
+    global _workerSimulator
+    _workerSimulator = simulator
+
+
+def _simulateInWorker(chunk):
+    return _workerSimulator(*chunk)
+
+
+class MonteCarloSimulationService:
+    """
+    Simulates a plan over many paths of random returns, lognormal around
+    every corpus's growthRate with its annual volatility (corpus id to
+    volatility, 0 when not given), and reports the percentiles of every
+    corpus's balance and of their total as fields of the annual results,
+    with how many paths never fell short.
+
+    Paths are simulated in chunks of chunkSize as paths of the vectorized
+    engine, on a process pool when workers > 1. Every chunk draws from its
+    own stream, spawned from the root SeedSequence by its position, and
+    leaves only histograms (see LogHistogram) that are merged as chunks
+    complete. Neither the draws nor the merged counts depend on which
+    worker simulated a chunk or in which order they complete, so results
+    are bit-identical for any number of workers; memory is bounded by a
+    chunk, not by the paths.
+    """
+
+    def __init__(
+        self,
+        data: CashflowSimulationServiceInitData,
+        volatilities: Dict[str, float],
+        periodsPerYear: int = 1,
+    ):
+        self.plan = CompiledPlan(data)
+        self.periodsPerYear = periodsPerYear
+        for corpusId in volatilities:
+            if corpusId not in self.plan.corpusIds:
+                raise ValueError(f"Corpus {corpusId} not found for its volatility")
+        self.volatilities = np.array(
+            [float(volatilities.get(id, 0.0)) for id in self.plan.corpusIds],
+            dtype=np.float64,
+        )
+        if (self.volatilities < 0).any():
+            raise ValueError("Volatilities should not be negative")
+
+    def run(
+        self,
+        paths: int,
+        seed: Union[int, None] = None,
+        chunkSize: int = 1000,
+        workers: int = 1,
+        percentiles: Sequence[float] = (5, 50, 95),
+        relativeAccuracy: float = 0.02,
+    ) -> MonteCarloResult:
+        """
+        Percentiles are within relativeAccuracy of the exact ones. Without
+        a seed, fresh entropy is drawn and reported as the result's seed.
+        """
+        if paths < 1 or chunkSize < 1:
+            raise ValueError(
+                f"Paths {paths} and chunk size {chunkSize} should be at least 1"
+            )
+        for percentile in percentiles:
+            if not 0 <= percentile <= 100:
+                raise ValueError(f"Percentile {percentile} should be between 0 and 100")
+        plan = self.plan
+        root = np.random.SeedSequence(seed)
+        sizes = [chunkSize] * (paths // chunkSize)
+        if paths % chunkSize:
+            sizes.append(paths % chunkSize)
+        chunks = list(zip(sizes, root.spawn(len(sizes))))
+        simulator = _ChunkSimulator(
+            plan, self.periodsPerYear, self.volatilities, relativeAccuracy
+        )
+        result = simulator.newResult()
+        workers = min(workers, len(chunks))
+        if workers > 1:
+            with ProcessPoolExecutor(
+                workers, initializer=_initializeWorker, initargs=(simulator,)
+            ) as executor:
+                futures = [
+                    executor.submit(_simulateInWorker, chunk) for chunk in chunks
+                ]
+                for future in as_completed(futures):
+                    result.merge(future.result())
+        else:
+            for chunk in chunks:
+                result.merge(simulator(*chunk))
+
+        # the median is every corpus's value, whichever percentiles are asked
+        percentiles = sorted({*percentiles, 50})
+        names = [f"p{percentile:g}" for percentile in percentiles]
+        quantiles = np.asarray(percentiles, dtype=np.float64) / 100
+        balances = result.balances.getQuantiles(quantiles)
+        totals = result.totals.getQuantiles(quantiles)
+        successRates = (1 - result.failed / paths).tolist()
+
+        def values(amounts: np.ndarray, yearIndex: int) -> Dict[str, Dict[str, float]]:
+            divisor = plan.inflationDivisors[yearIndex]
+            return {
+                name: {
+                    "amount": float(amount),
+                    "inflationAdjusted": float(amount / divisor),
+                }
+                for name, amount in zip(names, amounts)
+            }
+
+        simulation = []
+        for yearIndex, year in enumerate(plan.years):
+            corpora = []
+            for corpusId, amounts in zip(plan.corpusIds, balances[yearIndex]):
+                corpusPercentiles = values(amounts, yearIndex)
+                corpora.append(
+                    {
+                        "id": corpusId,
+                        "value": corpusPercentiles["p50"],
+                        "year": year,
+                        "percentiles": corpusPercentiles,
+                    }
+                )
+            simulation.append(
+                {
+                    "corpora": corpora,
+                    "year": year,
+                    "cashflowAllocations": plan.allocations[yearIndex],
+                    "totalPercentiles": values(totals[yearIndex], yearIndex),
+                    "successRate": successRates[yearIndex],
+                }
+            )
+        return {
+            "paths": paths,
+            "seed": root.entropy,
+            "chunkSize": chunkSize,
+            "successRate": successRates[-1],
+            "clampedValues": result.balances.clampedCount + result.totals.clampedCount,
+            "simulation": simulation,
+        }
@@ -0,0 +1,140 @@
+import heapq
+from bisect import bisect_right
+from typing import Dict, List, Tuple
+
+from ....aggregates import Corpus, Cashflow, Expense, RebalancingPolicy
+from ..succession import SuccessionSchedule
+
+ActiveAllocation = Tuple[Cashflow, Cashflow.Allocation]
+
+_EXPENSE = 0
+_ALLOCATION = 1
+
+
+class ActivitySchedule:
+    """
+    The expenses and cashflow allocations active in every simulated year.
+
+    Built from an event queue of the years entities start and stop being
+    active (an expense's startYear/endYear, a cashflow's window intersected
+    with each of its allocations), so the active sets only change at events
+    and a year costs as much as the entities active in it, not all of them.
+    Disabled entities never become active. Active sets keep plan order.
+    """
+
+    def __init__(
+        self,
+        cashflows: List[Cashflow],
+        expenses: List[Expense],
+        startYear: int,
+        endYear: int,
+    ):
+        # (year, starts, kind, position, entity), ends sort before starts
+        events = []
+
+        def push(kind, position, entity, fromYear, toYear):
+            fromYear, toYear = max(fromYear, startYear), min(toYear, endYear)
+            if fromYear > toYear:
+                return
+            events.append((fromYear, True, kind, position, entity))
+            events.append((toYear + 1, False, kind, position, entity))
+
+        for index, expense in enumerate(expenses):
+            if expense.enabled:
+                push(_EXPENSE, index, expense, expense.startYear, expense.endYear)
+        for index, cashflow in enumerate(cashflows):
+            if not cashflow.enabled:
+                continue
+            for allocationIndex, allocation in enumerate(cashflow.allocations):
+                push(
+                    _ALLOCATION,
+                    (index, allocationIndex),
+                    (cashflow, allocation),
+                    max(cashflow.startYear, allocation.startYear),
+                    min(cashflow.endYear, allocation.endYear),
+                )
+        heapq.heapify(events)
+
+        # the active sets from each change year on, shared until the next one
+        self._changeYears: List[int] = []
+        self._expenses: List[List[Expense]] = []
+        self._allocations: List[List[ActiveAllocation]] = []
+        active = {_EXPENSE: {}, _ALLOCATION: {}}
+        while events:
+            year = events[0][0]
+            while events and events[0][0] == year:
+                _, starts, kind, position, entity = heapq.heappop(events)
+                if starts:
+                    active[kind][position] = entity
+                else:
+                    del active[kind][position]
+            self._changeYears.append(year)
+            self._expenses.append(
+                [active[_EXPENSE][position] for position in sorted(active[_EXPENSE])]
+            )
+            self._allocations.append(
+                [
+                    active[_ALLOCATION][position]
+                    for position in sorted(active[_ALLOCATION])
+                ]
+            )
+
+    def _find(self, year: int) -> int:
+        return bisect_right(self._changeYears, year) - 1
+
+    def getExpenses(self, year: int) -> List[Expense]:
+        """Expenses active in the given year, in plan order."""
+        index = self._find(year)
+        return self._expenses[index] if index >= 0 else []
+
+    def getAllocations(self, year: int) -> List[ActiveAllocation]:
+        """(cashflow, allocation) pairs in effect in the given year, in plan order."""
+        index = self._find(year)
+        return self._allocations[index] if index >= 0 else []
+
+
+class FlowSchedule:
+    """
+    For every simulated year, the corpora that see a flow in it: a cashflow
+    allocation, an expense that may draw from them, a succession, or a
+    rebalancing that may be due.
+
+    Between two such years a corpus only compounds, so its balance can be
+    carried forward with a single power instead of year by year.
+    """
+
+    def __init__(
+        self,
+        corpora: List[Corpus],
+        activitySchedule: ActivitySchedule,
+        successionSchedule: SuccessionSchedule,
+        startYear: int,
+        endYear: int,
+        rebalancingPolicies: List[RebalancingPolicy] = (),
+    ):
+        self._corpora: Dict[int, List[Corpus]] = {}
+        for year in range(startYear, endYear + 1):
+            ids = set()
+            for _, allocation in activitySchedule.getAllocations(year):
+                ids.update(split["corpusId"].value for split in allocation.split)
+            for expense in activitySchedule.getExpenses(year):
+                ids.update(
+                    fundingCorpus.id.value for fundingCorpus in expense.fundingCorpora
+                )
+            for source, target in successionSchedule.getTransfers(year):
+                ids.update((source.id.value, target.id.value))
+            for policy in rebalancingPolicies:
+                if policy.isDue(year):
+                    ids.update(policy.targetWeights)
+            if ids:
+                # keep plan order, unknown ids are reported by whoever uses them
+                self._corpora[year] = [
+                    corpus for corpus in corpora if corpus.id.value in ids
+                ]
+
+    def getCorpora(self, year: int) -> List[Corpus]:
+        """Corpora with a flow in the given year, in plan order."""
+        return self._corpora.get(year, [])
+
+    def getFlowYears(self, corpus: Corpus) -> List[int]:
+        return [year for year, corpora in self._corpora.items() if corpus in corpora]
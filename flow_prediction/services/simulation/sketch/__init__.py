@@ -0,0 +1,135 @@
+import math
+from typing import Sequence, Tuple
+
+import numpy as np
+
+
+class LogHistogram:
+    """
+    Counts of values per cell (e.g. per year and corpus) in logarithmic
+    bins, so that any quantile is known to within relativeAccuracy of its
+    value without keeping the values: a bin holds the values between
+    gamma^(k-1) and gamma^k, gamma = (1 + relativeAccuracy) / (1 -
+    relativeAccuracy), mirrored for negative values. Values under
+    minValue in magnitude count as 0, those over maxValue as maxValue and
+    in clampedCount.
+
+    Only the bins values fell into are kept, as sorted (cell, bin) keys
+    with their counts, so a histogram is as large as the spread of its
+    values rather than the range of its bins. Merging adds the counts, so
+    histograms of disjoint parts of the values merge, in any order, to
+    exactly the histogram of all of them.
+    """
+
+    def __init__(
+        self,
+        shape: Tuple[int, ...],
+        relativeAccuracy: float = 0.02,
+        minValue: float = 1.0,
+        maxValue: float = 1e18,
+    ):
+        if not 0 < relativeAccuracy < 1:
+            raise ValueError(
+                f"Relative accuracy {relativeAccuracy} should be between 0 and 1"
+            )
+        self.shape = shape
+        self.relativeAccuracy = relativeAccuracy
+        self.minValue = minValue
+        self.maxValue = maxValue
+        self.gamma = (1 + relativeAccuracy) / (1 - relativeAccuracy)
+        self._logGamma = math.log(self.gamma)
+        self._offset = math.ceil(math.log(minValue) / self._logGamma)
+        # bins of positive values, 0 is the bin of small values in between
+        self.binsPerSign = (
+            math.ceil(math.log(maxValue) / self._logGamma) - self._offset + 1
+        )
+        self.cellCount = math.prod(shape)
+        # cell * binCount + bin of every bin with values, sorted
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.clampedCount = 0
+
+    @property
+    def binCount(self):
+        return 2 * self.binsPerSign + 1
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.counts.nbytes
+
+    def _bins(self, values: np.ndarray) -> np.ndarray:
+        magnitudes = np.clip(np.abs(values), self.minValue, self.maxValue)
+        keys = np.ceil(np.log(magnitudes) / self._logGamma) - self._offset + 1
+        keys = np.clip(keys, 1, self.binsPerSign).astype(np.int64)
+        keys[np.abs(values) < self.minValue] = 0
+        return np.where(values < 0, -keys, keys) + self.binsPerSign
+
+    def _addCounts(self, keys: np.ndarray, counts: np.ndarray):
+        counts = np.concatenate((self.counts, counts))
+        self.keys, positions = np.unique(
+            np.concatenate((self.keys, keys)), return_inverse=True
+        )
+        self.counts = np.zeros(len(self.keys), dtype=np.int64)
+        np.add.at(self.counts, positions, counts)
+
+    def add(self, index: Tuple[int, ...], values: np.ndarray):
+        """
+        values of the cells under index, e.g. (year,) with values of shape
+        (paths, corpora), the last axes being the cells.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        cells = math.prod(self.shape[len(index) :])
+        first = (
+            int(np.ravel_multi_index(index, self.shape[: len(index)])) * cells
+            if index
+            else 0
+        )
+        flat = self._bins(values).reshape(-1, cells) + (
+            (first + np.arange(cells)) * self.binCount
+        )
+        keys, counts = np.unique(flat, return_counts=True)
+        self._addCounts(keys, counts.astype(np.int64))
+        self.clampedCount += int(np.count_nonzero(np.abs(values) > self.maxValue))
+
+    def merge(self, other: "LogHistogram"):
+        if (other.shape, other.gamma, other.minValue, other.maxValue) != (
+            self.shape,
+            self.gamma,
+            self.minValue,
+            self.maxValue,
+        ):
+            raise ValueError("Only histograms with the same cells and bins merge")
+        self._addCounts(other.keys, other.counts)
+        self.clampedCount += other.clampedCount
+
+    def _binValue(self, bins: np.ndarray) -> np.ndarray:
+        keys = bins - self.binsPerSign
+        # the value of a bin within relativeAccuracy of all of its values
+        magnitudes = (
+            2 * self.gamma ** (np.abs(keys) + self._offset - 1) / (self.gamma + 1)
+        )
+        return np.where(keys == 0, 0.0, np.sign(keys) * magnitudes)
+
+    def getQuantiles(self, quantiles: Sequence[float]) -> np.ndarray:
+        """Shape (*shape, len(quantiles)), nan for cells without values."""
+        quantiles = np.asarray(quantiles, dtype=np.float64)
+        if ((quantiles < 0) | (quantiles > 1)).any():
+            raise ValueError(f"Quantiles {quantiles} should be between 0 and 1")
+        if len(self.keys) == 0:
+            return np.full((*self.shape, len(quantiles)), np.nan)
+        cells = self.keys // self.binCount
+        totals = np.zeros(self.cellCount, dtype=np.int64)
+        np.add.at(totals, cells, self.counts)
+        # the keys are sorted by cell, so the rank within a cell is the one
+        # past the counts of the cells before it
+        cumulative = np.cumsum(self.counts)
+        before = np.cumsum(totals) - totals
+        ranks = np.floor(quantiles * (totals[:, None] - 1)).astype(np.int64)
+        positions = np.searchsorted(cumulative, before[:, None] + ranks, side="right")
+        positions = np.minimum(positions, len(self.keys) - 1)
+        values = np.where(
+            totals[:, None] > 0,
+            self._binValue(self.keys[positions] % self.binCount),
+            np.nan,
+        )
+        return values.reshape(*self.shape, len(quantiles))
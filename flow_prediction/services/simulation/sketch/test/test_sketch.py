@@ -0,0 +1,35 @@
+import numpy as np
+
+from .. import LogHistogram
+
+
+def test_quantiles_are_within_relative_accuracy():
+    values = np.random.default_rng(0).lognormal(10, 1, (5000, 2)) - 30000
+    histogram = LogHistogram((2,), relativeAccuracy=0.01)
+    histogram.add((), values)
+    quantiles = histogram.getQuantiles([0.05, 0.5, 0.95])
+    exact = np.quantile(values, [0.05, 0.5, 0.95], axis=0).T
+    assert (np.abs(quantiles - exact) <= 0.011 * np.abs(exact)).all()
+
+
+def test_merged_histograms_are_the_histogram_of_all_values():
+    values = np.random.default_rng(1).normal(0, 1e6, (300, 3))
+    whole, first, second = (LogHistogram((4, 3)) for _ in range(3))
+    whole.add((2,), values)
+    first.add((2,), values[:100])
+    second.add((2,), values[100:])
+    second.merge(first)
+    assert np.array_equal(second.keys, whole.keys)
+    assert np.array_equal(second.counts, whole.counts)
+    assert np.isnan(whole.getQuantiles([0.5])[0]).all()
+
+
+def test_only_the_bins_with_values_are_kept():
+    values = np.random.default_rng(2).lognormal(12, 0.5, (1000, 24))
+    histogram = LogHistogram((75, 24))
+    for year in range(75):
+        histogram.add((year,), values)
+    assert histogram.nbytes < 75 * values.nbytes / 2
+    assert histogram.clampedCount == 0
+    histogram.add((0,), [[1e19] * 24])
+    assert histogram.clampedCount == 24
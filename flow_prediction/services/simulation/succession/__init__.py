@@ -0,0 +1,104 @@
+from typing import Dict, List, Tuple, Union
+
+from flow_prediction.shared.value_objects import Id
+from ....aggregates import Corpus
+
+Transfer = Tuple[Corpus, Corpus]
+
+
+class SuccessionSchedule:
+    """
+    The successor graph of a plan, resolved and validated once.
+
+    Every corpus that ends inside the simulated range is mapped to the corpus
+    that finally receives its balance in that year:
+      - the explicit successorCorpusId, otherwise the fallback corpus
+      - chained successions are followed, e.g. A -> B -> C where B ends in the
+        same year as A (or has already ended) resolves to A -> C
+      - cycles and successors that have not started yet are rejected here
+        instead of half way through a simulation
+    """
+
+    def __init__(
+        self,
+        corpora: List[Corpus],
+        fallbackCorpusId: Id,
+        startYear: int,
+        endYear: int,
+    ):
+        self._corpora = {corpus.id.value: corpus for corpus in corpora}
+        self._fallbackCorpusId = fallbackCorpusId
+        self._transfers: Dict[int, List[Transfer]] = {}
+        self._validateAcyclic()
+        for corpus in corpora:
+            if not startYear <= corpus.endYear <= endYear:
+                continue
+            successor = self._resolve(corpus, corpus.endYear)
+            if successor is not None:
+                self._transfers.setdefault(corpus.endYear, []).append(
+                    (corpus, successor)
+                )
+
+    def getTransfers(self, year: int) -> List[Transfer]:
+        return self._transfers.get(year, [])
+
+    @property
+    def years(self):
+        return sorted(self._transfers)
+
+    def _getCorpus(self, id: Id) -> Union[Corpus, None]:
+        return self._corpora.get(id.value)
+
+    def _getNext(self, corpus: Corpus) -> Corpus:
+        if corpus.successorCorpusId is not None:
+            successor = self._getCorpus(corpus.successorCorpusId)
+            if successor is None:
+                raise ValueError(
+                    f"Successor corpus {corpus.successorCorpusId} not found for corpus {corpus.id}"
+                )
+            return successor
+        fallback = self._getCorpus(self._fallbackCorpusId)
+        if fallback is None:
+            raise ValueError(
+                f"Fallback corpus {self._fallbackCorpusId} not found for corpus {corpus.id}"
+            )
+        return fallback
+
+    def _resolve(self, corpus: Corpus, year: int) -> Union[Corpus, None]:
+        target = self._getNext(corpus)
+        if target is corpus:
+            # the fallback corpus itself ending, there is nowhere else to go
+            return None
+        visited = [corpus.id.value]
+        while target.startYear > year or target.endYear <= year:
+            if target.startYear > year:
+                raise ValueError(
+                    f"Successor corpus {target.id} of {corpus.id} only starts in {target.startYear}, "
+                    f"cannot receive the balance in {year}"
+                )
+            visited.append(target.id.value)
+            target = self._getNext(target)
+            if target.id.value in visited:
+                raise ValueError(
+                    f"Succession of corpus {corpus.id} in {year} has no active corpus to end in: "
+                    + " -> ".join(visited + [target.id.value])
+                )
+        return target
+
+    def _validateAcyclic(self):
+        # explicit successorCorpusId edges must form chains, never loops
+        done = set()
+        for corpus in self._corpora.values():
+            path = []
+            current = corpus
+            while current is not None and current.id.value not in done:
+                if current.id.value in path:
+                    cycle = path[path.index(current.id.value) :] + [current.id.value]
+                    raise ValueError(
+                        f"Corpus successors form a cycle: {' -> '.join(cycle)}"
+                    )
+                path.append(current.id.value)
+                if current.successorCorpusId is None:
+                    break
+                current = self._getCorpus(current.successorCorpusId)
+            done.update(path)
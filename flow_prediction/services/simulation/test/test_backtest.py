@@ -0,0 +1,55 @@
+import contextlib
+import copy
+import io
+
+import pytest
+
+from flow_prediction.app.use_cases.simulation import CashflowSimulationUseCase
+from flow_prediction.app.use_cases.simulation.samples import bachelor_for_life
+from ..backtest import RollingWindowBacktestService
+
+
+def test_flat_history_replays_the_plan():
+    # every window of a history at the corpora's own growth rates is the plan
+    plan = copy.deepcopy(bachelor_for_life)
+    plan["simulation"]["endYear"] = 2040
+    data = CashflowSimulationUseCase(plan).buildServiceData()
+    history = {
+        "years": list(range(1990, 2010)),
+        "series": {
+            corpus["id"]: [corpus["growthRate"]] * 20 for corpus in plan["corpora"]
+        },
+    }
+    result = RollingWindowBacktestService(
+        data, history, {corpus["id"]: corpus["id"] for corpus in plan["corpora"]}
+    ).run()
+    with contextlib.redirect_stdout(io.StringIO()):
+        exact = CashflowSimulationUseCase(plan).execute()
+    total = sum(
+        corpus["value"]["amount"] for corpus in exact["simulation"][-1]["corpora"]
+    )
+    assert len(result["windows"]) == 5
+    assert result["successRate"] == 1
+    for window in result["windows"]:
+        assert window["terminalWealth"] == pytest.approx(total, rel=1e-12)
+    for corpus, expected in zip(
+        result["worstWindow"]["simulation"][-1]["corpora"],
+        exact["simulation"][-1]["corpora"],
+    ):
+        assert corpus["value"]["amount"] == pytest.approx(
+            expected["value"]["amount"], rel=1e-9, abs=1e-6
+        )
+
+
+def test_series_gaps_leave_windows_out():
+    plan = copy.deepcopy(bachelor_for_life)
+    plan["simulation"]["endYear"] = 2027
+    data = CashflowSimulationUseCase(plan).buildServiceData()
+    history = {
+        "years": [2000, 2001, 2002, 2003, 2004, 2006, 2007, 2008],
+        "series": {"stocks": [0.1, 0.1, None, 0.1, 0.1, 0.1, 0.1, 0.1]},
+    }
+    service = RollingWindowBacktestService(data, history, {"microsoft-stock": "stocks"})
+    assert service.startYears == [2006]
+    with pytest.raises(ValueError, match="No historical series"):
+        RollingWindowBacktestService(data, history, {"microsoft-stock": "gilt"})
@@ -0,0 +1,122 @@
+import contextlib
+import copy
+import io
+
+import numpy as np
+import pytest
+
+from flow_prediction.app.use_cases.simulation import CashflowSimulationUseCase
+from flow_prediction.app.use_cases.simulation.samples import bachelor_for_life
+from ..compiled import CompiledPlan
+from ..vectorized import VectorizedSimulationEngine, sampleExchangeRatios
+
+
+def dollarPlan():
+    plan = copy.deepcopy(bachelor_for_life)
+    for corpus in plan["corpora"]:
+        if corpus["id"] == "microsoft-stock":
+            corpus["currency"] = "usd"
+            corpus["initialAmount"] = 20000
+    plan["exchangeRates"] = {
+        "USD": {
+            "rate": 85.0,
+            "referenceTime": 2025,
+            "growthRate": 0.03,
+            "volatility": 0.08,
+        }
+    }
+    return plan
+
+
+def execute(plan, **options):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return CashflowSimulationUseCase(plan, **options).execute()
+
+
+def balances(response, year):
+    annualResult = next(
+        annualResult
+        for annualResult in response["simulation"]
+        if annualResult["year"] == year
+    )
+    return {
+        corpus["id"]: corpus["value"]["amount"] for corpus in annualResult["corpora"]
+    }
+
+
+def test_foreign_corpus_appreciates_with_its_exchange_rate():
+    plan = {
+        "expenses": [],
+        "cashflows": [],
+        "corpora": [
+            {
+                "id": "savings",
+                "growthRate": 0.0,
+                "startYear": 2025,
+                "endYear": 2100,
+                "initialAmount": 0,
+            },
+            {
+                "id": "stock",
+                "growthRate": 0.1,
+                "startYear": 2025,
+                "endYear": 2026,
+                "initialAmount": 100,
+                "currency": "USD",
+            },
+        ],
+        "simulation": {"startYear": 2025, "endYear": 2027},
+        "currency": "INR",
+        "fallbackCorpusId": "savings",
+        "baseInflation": 0.05,
+        "exchangeRates": {
+            "USD": {
+                "rate": 80.0,
+                "referenceTime": 2024,
+                "growthRate": 0.05,
+                "rates": {"2026": 88.0},
+            }
+        },
+    }
+    response = execute(plan)
+    # valued at 2024's rate, then revalued at 2025's and 2026's
+    assert balances(response, 2025)["stock"] == pytest.approx(100 * 1.1 * 84, rel=1e-9)
+    assert balances(response, 2026)["stock"] == pytest.approx(100 * 1.21 * 88, rel=1e-9)
+    # and succeeded by an INR corpus in INR
+    assert balances(response, 2027)["savings"] == pytest.approx(
+        100 * 1.21 * 88, rel=1e-9
+    )
+
+
+def test_engines_agree_on_a_multi_currency_plan():
+    plan = dollarPlan()
+    exact = execute(plan)
+    fast = execute(plan, engine="float", shadowCheck=True)
+    assert fast["accuracy"]["maxDivergence"] <= fast["accuracy"]["maxErrorBound"]
+    finalOnly = execute(plan, recordAnnualResults=False)
+    for corpusId, amount in balances(exact, 2091).items():
+        assert balances(finalOnly, 2091)[corpusId] == pytest.approx(amount, rel=1e-12)
+
+
+def test_missing_exchange_rate_is_rejected():
+    plan = dollarPlan()
+    del plan["exchangeRates"]
+    with pytest.raises(ValueError, match="No exchange rate of USD"):
+        CashflowSimulationUseCase(plan).buildServiceData()
+
+
+def test_stochastic_exchange_rates_average_to_the_plan():
+    plan = CompiledPlan(CashflowSimulationUseCase(dollarPlan()).buildServiceData())
+    ratios = sampleExchangeRatios(plan, 20000, np.random.default_rng(7))
+    position = plan.corpusIds.index("microsoft-stock")
+    assert ratios[:, :, position].mean(axis=1) == pytest.approx(
+        plan.exchangeRatios[:, position], rel=5e-3
+    )
+    # base currency corpora never move with a rate
+    assert np.all(np.delete(ratios, position, axis=2) == 1)
+    engine = VectorizedSimulationEngine(plan)
+    for _, paths, _ in engine.iterate(
+        1000, raiseOnOvershoot=False, exchangeRatios=ratios[:, :1000]
+    ):
+        pass
+    assert np.ptp(paths[position]) > 0
@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+
+# worker processes and CLI invocations import the engine through the use case
+MODULE = "flow_prediction.app.use_cases.simulation"
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), *[os.pardir] * 4))
+
+# cumulative import time budget in milliseconds, slow CI machines can raise it
+BUDGET_MS = float(os.environ.get("FLOW_PREDICTION_IMPORT_BUDGET_MS", "150"))
+
+HEAVY_MODULES = ["streamlit", "pandas", "altair", "jinja2", "babel", "moneyed", "numpy"]
+
+
+def importModule(*options):
+    return subprocess.run(
+        [
+            sys.executable,
+            *options,
+            "-c",
+            f"import sys, {MODULE}\n"
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=ROOT,
+    )
+
+
+def test_core_does_not_import_heavy_dependencies():
+    assert importModule().stdout.strip() == ""
+
+
+def test_core_import_time_budget():
+    """
+    python -X importtime reports the cumulative import time of every module in
+    microseconds on stderr: "import time: self | cumulative | name".
+    """
+    cumulative = min(
+        next(
+            int(line.split("|")[1])
+            for line in importModule("-X", "importtime").stderr.splitlines()
+            if line.split("|")[-1].strip() == MODULE
+        )
+        for _ in range(3)
+    )
+    assert cumulative / 1000 < BUDGET_MS
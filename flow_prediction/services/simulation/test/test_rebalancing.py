@@ -0,0 +1,71 @@
+import contextlib
+import copy
+import io
+
+import numpy as np
+import pytest
+
+from flow_prediction.app.use_cases.simulation import CashflowSimulationUseCase
+from flow_prediction.app.use_cases.simulation.samples import bachelor_for_life
+from ..compiled import CompiledPlan
+from ..vectorized import VectorizedSimulationEngine
+
+FREQUENCIES = {
+    "annual": {},
+    "threshold": {"threshold": 0.1},
+    "calendar": {"everyYears": 3},
+}
+
+
+def rebalancedPlan(frequency):
+    plan = copy.deepcopy(bachelor_for_life)
+    plan["simulation"]["endYear"] = 2050
+    plan["rebalancingPolicies"] = [
+        {
+            "id": "stock-epf",
+            "startYear": 2025,
+            "endYear": 2050,
+            "targetWeights": {"microsoft-stock": 0.6, "retirement-epf": 0.4},
+            "frequency": frequency,
+            **FREQUENCIES[frequency],
+        }
+    ]
+    return plan
+
+
+def execute(plan, **options):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return CashflowSimulationUseCase(plan, **options).execute()
+
+
+def test_balances_end_the_year_at_their_weights():
+    result = execute(rebalancedPlan("annual"))
+    for annualResult in result["simulation"][:-1]:
+        amounts = {
+            corpus["id"]: corpus["value"]["amount"]
+            for corpus in annualResult["corpora"]
+        }
+        stock, epf = amounts["microsoft-stock"], amounts["retirement-epf"]
+        assert stock / (stock + epf) == pytest.approx(0.6)
+
+
+@pytest.mark.parametrize("frequency", FREQUENCIES)
+def test_engines_agree_on_rebalancing(frequency):
+    plan = rebalancedPlan(frequency)
+    fast = execute(plan, engine="float", shadowCheck=True)
+    assert fast["accuracy"]["maxErrorBound"] is None
+    assert fast["accuracy"]["maxDivergence"] < 0.01
+    exact, finalOnly = execute(plan), execute(plan, recordAnnualResults=False)
+    assert finalOnly["simulation"] == exact["simulation"][-1:]
+
+
+@pytest.mark.parametrize("frequency", FREQUENCIES)
+def test_paths_rebalance_like_a_single_path(frequency):
+    plan = CompiledPlan(
+        CashflowSimulationUseCase(rebalancedPlan(frequency)).buildServiceData()
+    )
+    engine = VectorizedSimulationEngine(plan)
+    single = [list(balances) for _, balances, _ in engine.iterate()]
+    for (_, balances, _), expected in zip(engine.iterate(paths=3), single):
+        for column, balance in zip(balances, expected):
+            assert np.allclose(column, balance, rtol=1e-12)
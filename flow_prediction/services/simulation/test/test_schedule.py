@@ -0,0 +1,21 @@
+from flow_prediction.app.use_cases.simulation import CashflowSimulationUseCase
+from flow_prediction.app.use_cases.simulation.samples import bachelor_for_life
+from ..schedule import ActivitySchedule
+
+
+def test_active_sets_match_per_year_scan():
+    data = CashflowSimulationUseCase(bachelor_for_life).buildServiceData()
+    startYear, endYear = data["simulation"]["startYear"], data["simulation"]["endYear"]
+    schedule = ActivitySchedule(data["cashflows"], data["expenses"], startYear, endYear)
+    for year in range(startYear - 1, endYear + 2):
+        inRange = startYear <= year <= endYear
+        assert schedule.getExpenses(year) == [
+            expense
+            for expense in data["expenses"]
+            if inRange and expense.isActive(year)
+        ]
+        assert schedule.getAllocations(year) == [
+            (cashflow, cashflow.getAllocation(year))
+            for cashflow in data["cashflows"]
+            if inRange and cashflow.getAllocation(year) is not None
+        ]
@@ -0,0 +1,42 @@
+import contextlib
+import decimal
+import io
+
+import pytest
+
+from flow_prediction.app.use_cases.simulation import CashflowSimulationUseCase
+from flow_prediction.app.use_cases.simulation.samples import bachelor_for_life
+from .. import CashflowSimulationService
+
+
+def simulate(plan=bachelor_for_life, **options):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return CashflowSimulationService(
+            CashflowSimulationUseCase(plan).buildServiceData()
+        ).simulate(**options)
+
+
+def test_final_year_only_matches_full_simulation():
+    full = simulate()
+    finalOnly = simulate(recordAnnualResults=False)
+    assert len(finalOnly["simulation"]) == 1
+    assert finalOnly["warnings"] == full["warnings"]
+    for expected, actual in zip(
+        full["simulation"][-1]["corpora"],
+        finalOnly["simulation"][0]["corpora"],
+        strict=True,
+    ):
+        assert actual["id"] == expected["id"]
+        assert actual["value"]["amount"] == pytest.approx(
+            expected["value"]["amount"], rel=1e-12
+        )
+
+
+def test_years_run_in_their_own_decimal_context():
+    expected = simulate()
+    with decimal.localcontext(prec=6, rounding=decimal.ROUND_DOWN) as context:
+        # the caller's context neither leaks into the simulation ...
+        assert simulate() == expected
+        # ... nor is changed by it
+        assert decimal.getcontext() is context
+        assert (context.prec, context.rounding) == (6, decimal.ROUND_DOWN)
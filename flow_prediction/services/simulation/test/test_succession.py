@@ -0,0 +1,88 @@
+import pytest
+
+from flow_prediction.aggregates import Corpus
+from flow_prediction.shared.value_objects import Id, Decimal, Money
+from ..succession import SuccessionSchedule
+
+
+def makeCorpus(id: str, startYear: int, endYear: int, successor: str = None):
+    return Corpus(
+        Id(id),
+        Decimal("0.1"),
+        Money(100),
+        startYear,
+        endYear,
+        Id(successor) if successor is not None else None,
+    )
+
+
+def test_transfers_to_explicit_successor_or_fallback():
+    fallback = makeCorpus("fallback", 2025, 2100)
+    withSuccessor = makeCorpus("a", 2025, 2030, "b")
+    successor = makeCorpus("b", 2025, 2100)
+    withoutSuccessor = makeCorpus("c", 2025, 2040)
+    schedule = SuccessionSchedule(
+        [fallback, withSuccessor, successor, withoutSuccessor],
+        Id("fallback"),
+        2025,
+        2090,
+    )
+    assert schedule.getTransfers(2030) == [(withSuccessor, successor)]
+    assert schedule.getTransfers(2040) == [(withoutSuccessor, fallback)]
+    assert schedule.getTransfers(2035) == []
+    # corpora ending after the simulation never transfer
+    assert schedule.years == [2030, 2040]
+
+
+def test_same_year_chain_resolves_to_final_corpus():
+    """
+    a and b both end in 2052, a's balance must not get stuck in b.
+    """
+    a = makeCorpus("a", 2025, 2052, "b")
+    b = makeCorpus("b", 2025, 2052, "c")
+    c = makeCorpus("c", 2052, 2100)
+    schedule = SuccessionSchedule([a, b, c], Id("c"), 2025, 2100)
+    assert schedule.getTransfers(2052) == [(a, c), (b, c)]
+
+
+def test_chain_through_already_ended_corpus():
+    a = makeCorpus("a", 2025, 2060, "b")
+    b = makeCorpus("b", 2025, 2050, "c")
+    c = makeCorpus("c", 2025, 2100)
+    schedule = SuccessionSchedule([a, b, c], Id("c"), 2025, 2100)
+    assert schedule.getTransfers(2050) == [(b, c)]
+    assert schedule.getTransfers(2060) == [(a, c)]
+
+
+def test_fallback_corpus_ending_is_a_no_op():
+    fallback = makeCorpus("fallback", 2025, 2050)
+    schedule = SuccessionSchedule([fallback], Id("fallback"), 2025, 2100)
+    assert schedule.getTransfers(2050) == []
+
+
+def test_cycle_is_rejected():
+    a = makeCorpus("a", 2025, 2030, "b")
+    b = makeCorpus("b", 2025, 2040, "a")
+    with pytest.raises(ValueError, match="cycle"):
+        SuccessionSchedule([a, b], Id("a"), 2025, 2100)
+
+
+def test_successor_not_started_is_rejected():
+    a = makeCorpus("a", 2025, 2030, "b")
+    b = makeCorpus("b", 2035, 2100)
+    with pytest.raises(ValueError, match="only starts in 2035"):
+        SuccessionSchedule([a, b], Id("b"), 2025, 2100)
+
+
+def test_unknown_successor_is_rejected():
+    a = makeCorpus("a", 2025, 2030, "missing")
+    b = makeCorpus("b", 2025, 2100)
+    with pytest.raises(ValueError, match="missing"):
+        SuccessionSchedule([a, b], Id("b"), 2025, 2100)
+
+
+def test_no_active_corpus_left():
+    a = makeCorpus("a", 2025, 2030)
+    fallback = makeCorpus("fallback", 2025, 2030)
+    with pytest.raises(ValueError, match="no active corpus"):
+        SuccessionSchedule([a, fallback], Id("fallback"), 2025, 2100)
@@ -0,0 +1,99 @@
+import contextlib
+import copy
+import io
+
+import numpy as np
+import pytest
+
+from flow_prediction.app.use_cases.simulation import CashflowSimulationUseCase
+from flow_prediction.app.use_cases.simulation.samples import bachelor_for_life
+from ..compiled import CompiledPlan
+from ..vectorized import VectorizedSimulationEngine
+
+
+def taxedPlan():
+    plan = copy.deepcopy(bachelor_for_life)
+    plan["taxRegimes"] = {
+        # slabs keeping up with the salary's growth
+        "salary": {"preset": "india-new-regime-2025", "indexation": 0.1},
+        "equity": {"preset": "india-equity-ltcg-2024"},
+    }
+    for cashflow in plan["cashflows"]:
+        if cashflow["id"] == "my-salary":
+            # the sample's salary is take home, tax a gross one instead
+            cashflow["taxRegime"] = "salary"
+            cashflow["recurringValue"]["amount"] *= 1.25
+    for corpus in plan["corpora"]:
+        if corpus["id"] == "microsoft-stock":
+            corpus["taxRegime"] = "equity"
+            corpus["costBasis"] = corpus["initialAmount"] / 2
+    return plan
+
+
+def execute(plan, **options):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return CashflowSimulationUseCase(plan, **options).execute()
+
+
+def total(response):
+    return sum(
+        corpus["value"]["amount"] for corpus in response["simulation"][-1]["corpora"]
+    )
+
+
+def test_taxes_lower_terminal_wealth():
+    untaxed = taxedPlan()
+    del untaxed["taxRegimes"]
+    for entity in untaxed["cashflows"] + untaxed["corpora"]:
+        entity.pop("taxRegime", None)
+    assert total(execute(taxedPlan())) < total(execute(untaxed))
+
+
+def test_engines_agree_with_taxes():
+    plan = taxedPlan()
+    exact = execute(plan)
+    fast = execute(plan, engine="float", shadowCheck=True)
+    assert fast["accuracy"]["maxErrorBound"] is None
+    assert fast["accuracy"]["maxDivergence"] < 0.01
+    finalOnly = execute(plan, recordAnnualResults=False)
+    assert total(finalOnly) == pytest.approx(total(exact), rel=1e-12)
+
+
+def test_paths_pay_the_same_tax_as_a_single_path():
+    plan = CompiledPlan(CashflowSimulationUseCase(taxedPlan()).buildServiceData())
+    engine = VectorizedSimulationEngine(plan)
+    single = [list(balances) for _, balances, _ in engine.iterate()]
+    for (_, balances, _), expected in zip(engine.iterate(paths=3), single):
+        for column, balance in zip(balances, expected):
+            assert np.allclose(column, balance, rtol=1e-12)
+
+
+def lotPlan(lotMethod):
+    # stock and both retirement funds, the small cap one's lots going to the
+    # SWP fund when it ends
+    plan = taxedPlan()
+    plan["taxRegimes"]["equity"] = {
+        "preset": "india-equity-2024",
+        "lotMethod": lotMethod,
+    }
+    for corpus in plan["corpora"]:
+        if corpus["id"] in ("retirement-small-cap-mutual-fund", "retirement-swp-fund"):
+            corpus["taxRegime"] = "equity"
+    return plan
+
+
+@pytest.mark.parametrize("lotMethod", ["fifo", "average"])
+def test_engines_agree_on_lots(lotMethod):
+    plan = lotPlan(lotMethod)
+    fast = execute(plan, engine="float", shadowCheck=True)
+    assert fast["accuracy"]["maxDivergence"] < 0.01
+    compiled = CompiledPlan(CashflowSimulationUseCase(plan).buildServiceData())
+    engine = VectorizedSimulationEngine(compiled)
+    single = [list(balances) for _, balances, _ in engine.iterate()]
+    for (_, balances, _), expected in zip(engine.iterate(paths=3), single):
+        for column, balance in zip(balances, expected):
+            assert np.allclose(column, balance, rtol=1e-12)
+
+
+def test_oldest_lots_carry_the_most_gain():
+    assert total(execute(lotPlan("fifo"))) < total(execute(lotPlan("average")))
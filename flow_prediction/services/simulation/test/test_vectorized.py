@@ -0,0 +1,109 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from flow_prediction.app.use_cases.simulation import CashflowSimulationUseCase
+from flow_prediction.app.use_cases.simulation.samples import bachelor_for_life
+from flow_prediction.infrastructure.result_store import SqliteSimulationResultStore
+from .. import CashflowSimulationService
+from ..compiled import CompiledPlan
+from ..vectorized import PeriodicSimulationService, VectorizedSimulationEngine
+
+
+def buildServiceData(plan=bachelor_for_life):
+    return CashflowSimulationUseCase(plan).buildServiceData()
+
+
+def assertSameBalances(actual, expected, relativeTolerance):
+    for actualYear, expectedYear in zip(
+        actual["simulation"], expected["simulation"], strict=True
+    ):
+        assert actualYear["year"] == expectedYear["year"]
+        for actualCorpus, expectedCorpus in zip(
+            actualYear["corpora"], expectedYear["corpora"], strict=True
+        ):
+            assert actualCorpus["id"] == expectedCorpus["id"]
+            for key in ("amount", "inflationAdjusted"):
+                assert actualCorpus["value"][key] == pytest.approx(
+                    expectedCorpus["value"][key], rel=relativeTolerance, abs=1e-4
+                )
+
+
+def test_annual_periods_match_decimal_engine():
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = CashflowSimulationService(buildServiceData()).simulate()
+    actual = PeriodicSimulationService(buildServiceData(), periodsPerYear=1).simulate()
+    assertSameBalances(actual, expected, 1e-9)
+    assert [year["cashflowAllocations"] for year in actual["simulation"]] == [
+        year["cashflowAllocations"] for year in expected["simulation"]
+    ]
+
+
+def test_monthly_compounding_of_a_corpus_without_flows():
+    plan = {
+        "expenses": [],
+        "cashflows": [],
+        "corpora": [
+            {
+                "id": "fixed-deposit",
+                "growthRate": 0.07,
+                "startYear": 2025,
+                "endYear": 2100,
+                "initialAmount": 100000,
+            }
+        ],
+        "simulation": {"startYear": 2025, "endYear": 2099},
+        "currency": "INR",
+        "fallbackCorpusId": "fixed-deposit",
+        "baseInflation": 0.05,
+    }
+    result = PeriodicSimulationService(buildServiceData(plan), 12).simulate()
+    # twelve monthly steps compound to exactly one annual step
+    assert result["simulation"][-1]["corpora"][0]["value"]["amount"] == pytest.approx(
+        100000 * 1.07**75, rel=1e-12
+    )
+
+
+def test_monthly_is_annual_roll_up_of_the_sample():
+    result = CashflowSimulationUseCase(bachelor_for_life, periodsPerYear=12).execute()
+    assert [year["year"] for year in result["simulation"]] == list(range(2025, 2092))
+    assert len(result["simulation"][0]["corpora"]) == len(bachelor_for_life["corpora"])
+
+
+def test_paths_are_vectorized_independently():
+    plan = CompiledPlan(buildServiceData())
+    engine = VectorizedSimulationEngine(plan, periodsPerYear=12)
+    single = [list(balances) for _, balances, _ in engine.iterate()]
+    batched = [
+        [column.copy() for column in balances]
+        for _, balances, _ in engine.iterate(paths=3)
+    ]
+    for singleYear, batchedYear in zip(single, batched, strict=True):
+        for balance, column in zip(singleYear, batchedYear):
+            np.testing.assert_allclose(column, balance, rtol=1e-12)
+
+
+def test_float_engine_stays_within_its_error_bound():
+    with contextlib.redirect_stdout(io.StringIO()):
+        response = CashflowSimulationUseCase(
+            bachelor_for_life, engine="float", shadowCheck=True
+        ).execute()
+    accuracy = response["accuracy"]
+    assert accuracy["engine"] == "float"
+    assert accuracy["maxDivergence"] <= accuracy["maxErrorBound"] < 0.01
+
+
+def test_cached_float_results_keep_their_accuracy(tmp_path):
+    store = SqliteSimulationResultStore(str(tmp_path / "results.sqlite"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        fast = CashflowSimulationUseCase(bachelor_for_life, store, engine="float")
+        assert fast.execute()["accuracy"]["maxDivergence"] is None
+        checked = CashflowSimulationUseCase(
+            bachelor_for_life, store, engine="float", shadowCheck=True
+        )
+        expected = checked.execute()
+    assert expected["accuracy"]["maxDivergence"] is not None
+    assert checked.execute() == expected
+    assert fast.execute()["accuracy"]["maxDivergence"] is None
@@ -0,0 +1,76 @@
+import contextlib
+import copy
+import io
+
+import numpy as np
+import pytest
+
+from flow_prediction.app.use_cases.simulation import CashflowSimulationUseCase
+from flow_prediction.app.use_cases.simulation.samples import bachelor_for_life
+from ..compiled import CompiledPlan
+from ..vectorized import VectorizedSimulationEngine
+
+STRATEGIES = {
+    "proportional": {"kind": "proportional"},
+    "glidePath": {
+        "kind": "glidePath",
+        "startWeights": {
+            "savings-bank": 0.2,
+            "retirement-swp-fund": 0.3,
+            "microsoft-stock": 0.5,
+        },
+        "endWeights": {
+            "savings-bank": 0.5,
+            "retirement-swp-fund": 0.5,
+            "microsoft-stock": 0.0,
+        },
+    },
+    "guardrails": {"kind": "guardrails"},
+    "bucket": {"kind": "bucket", "refillYears": 3},
+}
+
+
+def strategyPlan(kind):
+    # rent drawn by the strategy, until spending it up would run the sample dry
+    plan = copy.deepcopy(bachelor_for_life)
+    plan["simulation"]["endYear"] = 2036
+    for expense in plan["expenses"]:
+        if expense["id"] == "cheaper-house-rent":
+            expense["withdrawalStrategy"] = STRATEGIES[kind]
+    return plan
+
+
+def execute(plan, **options):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return CashflowSimulationUseCase(plan, **options).execute()
+
+
+@pytest.mark.parametrize("kind", STRATEGIES)
+def test_engines_agree_on_withdrawal_strategies(kind):
+    fast = execute(strategyPlan(kind), engine="float", shadowCheck=True)
+    assert fast["accuracy"]["maxErrorBound"] is None
+    assert fast["accuracy"]["maxDivergence"] < 0.01
+
+
+@pytest.mark.parametrize("kind", STRATEGIES)
+def test_paths_draw_like_a_single_path(kind):
+    plan = CompiledPlan(
+        CashflowSimulationUseCase(strategyPlan(kind)).buildServiceData()
+    )
+    engine = VectorizedSimulationEngine(plan)
+    single = [list(balances) for _, balances, _ in engine.iterate()]
+    for (_, balances, _), expected in zip(engine.iterate(paths=3), single):
+        for column, balance in zip(balances, expected):
+            assert np.allclose(column, balance, rtol=1e-12)
+
+
+def test_buckets_only_refill_active_corpora():
+    # health insurance is paid from a fund ending in 2052, then from the
+    # retirement fund starting that year
+    plan = copy.deepcopy(bachelor_for_life)
+    plan["simulation"]["endYear"] = 2056
+    for expense in plan["expenses"]:
+        if expense["id"] == "health-insurance":
+            expense["withdrawalStrategy"] = STRATEGIES["bucket"]
+    fast = execute(plan, engine="float", shadowCheck=True)
+    assert fast["accuracy"]["maxDivergence"] < 0.01
@@ -0,0 +1,925 @@
+from typing import Callable, Iterator, List, Tuple, Union
+
+import numpy as np
+
+from flow_prediction.shared.value_objects import Money
+from .. import SimulationResponse
+from ..compiled import CompiledPlan, CompiledExpense, CompiledRebalancing
+from ..init_data import CashflowSimulationServiceInitData
+
+# a float per corpus for a single path, an array of paths per corpus otherwise
+Balances = List[Union[float, np.ndarray]]
+
+# annual return of every corpus for a year index, shape (corpora,) or
+# (paths, corpora); the plan's growthRates when not given
+ReturnsForYear = Callable[[int], np.ndarray]
+
+# cashflow allocations into every corpus per year index, shape
+# (years, corpora) or (years, paths, corpora); the plan's deposits when not
+# given
+Deposits = np.ndarray
+
+# the move of every corpus's exchange rate per year index, shape
+# (years, corpora) or (years, paths, corpora); the plan's exchangeRatios
+# when not given
+ExchangeRatios = np.ndarray
+
+# relative rounding error of one float64 operation
+UNIT_ROUNDOFF = 2.0**-53
+# CashflowSimulationService skips appreciations that round to 0 paise
+_SKIPPED_APPRECIATION = 0.005
+
+
+class _Lots:
+    """
+    The CostBasisLots of one corpus on every path, in parallel arrays: the
+    year each lot was bought, shape (lots,), its principal and its units,
+    shape (lots, paths). Lots before first are used up on every path.
+    """
+
+    def __init__(self, capacity: int, paths: int):
+        self.years = np.zeros(capacity, dtype=np.int64)
+        self.principals = np.zeros((capacity, paths))
+        self.units = np.zeros((capacity, paths))
+        self.first = 0
+        self.count = 0
+
+    def _resize(self, years, principals, units, capacity):
+        self.years = np.zeros(capacity, dtype=np.int64)
+        self.principals = np.zeros((capacity, principals.shape[1]))
+        self.units = np.zeros_like(self.principals)
+        self.count = len(years)
+        self.first = 0
+        self.years[: self.count] = years
+        self.principals[: self.count] = principals
+        self.units[: self.count] = units
+
+    def _held(self):
+        return slice(self.first, self.count)
+
+    def getPrincipal(self):
+        return self.principals[self._held()].sum(axis=0)
+
+    def _unitValues(self, balance):
+        # lots worth nothing on a path are dropped there, and start over
+        units = self.units[self._held()].sum(axis=0)
+        worthless = (balance <= 0) | (units <= 0)
+        if worthless.any():
+            self.principals[self._held(), worthless] = 0.0
+            self.units[self._held(), worthless] = 0.0
+        return np.where(worthless, 1.0, balance / np.where(worthless, 1.0, units))
+
+    def add(self, year: int, principal, value, balance):
+        unitValues = self._unitValues(balance)
+        if self.count == self.first or self.years[self.count - 1] != year:
+            if self.count == len(self.years):
+                held = self._held()
+                self._resize(
+                    self.years[held],
+                    self.principals[held],
+                    self.units[held],
+                    2 * (self.count - self.first) + 1,
+                )
+            self.years[self.count] = year
+            self.count += 1
+        self.principals[self.count - 1] += principal
+        self.units[self.count - 1] += value / unitValues
+
+    def merge(self, lots: "_Lots", value, balance):
+        sourceUnits = lots.units[lots._held()].sum(axis=0)
+        unitValues = self._unitValues(balance)
+        merged = (sourceUnits > 0) & (value > 0)
+        scale = np.divide(
+            value,
+            sourceUnits * unitValues,
+            out=np.zeros_like(unitValues),
+            where=merged,
+        )
+        held = self._held()
+        years = np.concatenate((self.years[held], lots.years[lots._held()]))
+        # oldest first, for fifo, in the order of CostBasisLots.merge
+        order = np.argsort(years, kind="stable")
+        self._resize(
+            years[order],
+            np.concatenate(
+                (self.principals[held], lots.principals[lots._held()] * merged)
+            )[order],
+            np.concatenate((self.units[held], lots.units[lots._held()] * scale))[order],
+            2 * len(years) + 1,
+        )
+
+    def _gains(self, unitValues, rows: slice, year: int, holdingYears: int):
+        values = self.units[rows] * unitValues
+        gains = np.maximum(values - self.principals[rows], 0.0)
+        shortTerm = year - self.years[rows] < holdingYears
+        return values, gains, shortTerm
+
+    def getSpendable(self, balance, year, holdingYears, shortTermRate, rate, exemption):
+        _, gains, shortTerm = self._gains(
+            self._unitValues(balance), self._held(), year, holdingYears
+        )
+        return (
+            balance
+            - shortTermRate * gains[shortTerm].sum(axis=0)
+            - rate * np.maximum(gains[~shortTerm].sum(axis=0) - exemption, 0.0)
+        )
+
+    def spend(
+        self, balance, net, year, holdingYears, shortTermRate, rate, exemption, fifo
+    ):
+        """
+        The withdrawal that leaves net after tax and the long term gain it
+        realizes, with the lots consumed, like CostBasisLots.spend.
+        """
+        rows = self._held()
+        values, gains, shortTerm = self._gains(
+            self._unitValues(balance), rows, year, holdingYears
+        )
+        grossUp = self._grossOldestFirst if fifo else self._grossInProportion
+        gross, taken = grossUp(
+            values, gains, shortTerm, net, shortTermRate, rate, exemption
+        )
+        left = np.divide(
+            values - taken, values, out=np.zeros_like(values), where=values > 0
+        )
+        if not fifo:
+            left[values <= 0] = 1.0
+        longTermGain = (gains[~shortTerm] * (1 - left[~shortTerm])).sum(axis=0)
+        self.principals[rows] *= left
+        self.units[rows] *= left
+        while self.first < self.count and not self.units[self.first].any():
+            self.first += 1
+        return gross, longTermGain
+
+    @staticmethod
+    def _grossOldestFirst(
+        values, gains, shortTerm, net, shortTermRate, rate, exemption
+    ):
+        if not len(values):
+            return net, values
+        # what taking every lot up to and including each one leaves after
+        # tax, nondecreasing; the withdrawal ends in the first lot leaving net
+        cumulativeValues = values.cumsum(axis=0)
+        cumulativeLongTerm = gains.cumsum(axis=0)
+        if shortTerm.any():
+            shortTermGains = gains * shortTerm[:, None]
+            cumulativeShortTerm = shortTermGains.cumsum(axis=0)
+            cumulativeLongTerm -= cumulativeShortTerm
+        else:
+            shortTermGains = cumulativeShortTerm = np.zeros_like(values)
+        leaves = cumulativeValues - rate * np.maximum(
+            cumulativeLongTerm - exemption, 0.0
+        )
+        if shortTermRate:
+            leaves -= shortTermRate * cumulativeShortTerm
+        ends = (leaves < net).sum(axis=0)
+        beyond = ends == len(values)
+        lot = np.minimum(ends, len(values) - 1)
+        paths = np.arange(len(lot))
+        value = values[lot, paths]
+        gain = gains[lot, paths]
+        shortTermGain = shortTermGains[lot, paths]
+        before = cumulativeValues[lot, paths] - value
+        longTermBefore = cumulativeLongTerm[lot, paths] - (gain - shortTermGain)
+        leftToNet = net - (
+            before
+            - shortTermRate * (cumulativeShortTerm[lot, paths] - shortTermGain)
+            - rate * np.maximum(longTermBefore - exemption, 0.0)
+        )
+        gainFraction = np.divide(gain, value, out=np.zeros_like(value), where=value > 0)
+        untaxed = np.divide(
+            np.maximum(exemption - longTermBefore, 0.0),
+            gainFraction,
+            out=np.full_like(value, np.inf),
+            where=gainFraction > 0,
+        )
+        taken = np.where(
+            shortTerm[lot],
+            leftToNet / (1 - shortTermRate * gainFraction),
+            np.minimum(leftToNet, untaxed)
+            + np.maximum(leftToNet - untaxed, 0.0) / (1 - rate * gainFraction),
+        )
+        gross = np.where(
+            beyond,
+            cumulativeValues[-1] + net - leaves[-1],
+            before + taken,
+        )
+        return gross, np.clip(gross - (cumulativeValues - values), 0.0, values)
+
+    @staticmethod
+    def _grossInProportion(
+        values, gains, shortTerm, net, shortTermRate, rate, exemption
+    ):
+        value = values.sum(axis=0)
+        shortTermShare, longTermShare = (
+            np.divide(
+                part.sum(axis=0), value, out=np.zeros_like(value), where=value > 0
+            )
+            for part in (gains[shortTerm], gains[~shortTerm])
+        )
+        gross = net / (1 - shortTermRate * shortTermShare)
+        gross = np.where(
+            gross * longTermShare > exemption,
+            (net - rate * exemption)
+            / (1 - shortTermRate * shortTermShare - rate * longTermShare),
+            gross,
+        )
+        gross = np.where(value > 0, gross, net)
+        taken = values * np.minimum(
+            np.divide(gross, value, out=np.zeros_like(value), where=value > 0), 1.0
+        )
+        return gross, taken
+
+
+class _CapitalGains:
+    """
+    Cost bases, purchase lots, and the exemptions left in the current year,
+    of a plan with capital gains tax, with the arithmetic of Corpus.spend
+    and CapitalGainsTaxRegime on floats or arrays of paths. Only corpora
+    whose regime tracks lots keep _Lots.
+    """
+
+    def __init__(self, plan: CompiledPlan, paths: int, columns):
+        self.paths = paths
+        self.vectorized = paths != 1
+        self.regimes = plan.taxRegimes
+        self.rates = plan.taxRates.tolist()
+        self.shortTermRates = plan.shortTermTaxRates.tolist()
+        self.holdingYears = plan.holdingYears
+        self.lotMethods = plan.lotMethods
+        self.exemptions = plan.exemptions
+        self.taxed = [c for c, regime in enumerate(self.regimes) if regime >= 0]
+        self.costBases = columns(plan.initialCostBases, paths)
+        self.exemptionsLeft = []
+        self.year = plan.startYear
+        self.lots = {}
+        for c, method in enumerate(plan.lotMethods):
+            if method is not None:
+                self.lots[c] = _Lots(plan.yearCount + 1, paths)
+                self.lots[c].add(
+                    plan.corpusStartYears[c] - 1,
+                    plan.initialCostBases[c],
+                    plan.initialBalances[c],
+                    np.zeros(paths),
+                )
+
+    def _paths(self, value):
+        return np.broadcast_to(np.asarray(value, dtype=np.float64), (self.paths,))
+
+    def _result(self, value):
+        return value if self.vectorized else float(value[0])
+
+    def startYear(self, year: int):
+        self.year = year
+        self.exemptionsLeft = (
+            [np.full(self.paths, exemption) for exemption in self.exemptions]
+            if self.vectorized
+            else self.exemptions.tolist()
+        )
+
+    def getCostBasis(self, c: int):
+        if c in self.lots:
+            return self._result(self.lots[c].getPrincipal())
+        return self.costBases[c]
+
+    def deposit(self, c: int, amount, balance):
+        """amount has just been added to balance."""
+        if c in self.lots:
+            if np.any(amount):
+                self.lots[c].add(
+                    self.year,
+                    amount,
+                    self._paths(amount),
+                    self._paths(balance - amount),
+                )
+            return
+        self.costBases[c] = self.costBases[c] + amount
+
+    def transfer(self, source: int, target: int, balance, targetBalance):
+        # successions carry the cost basis along, and the lots' years
+        if source in self.lots and target in self.lots:
+            self.lots[target].merge(
+                self.lots[source], self._paths(balance), self._paths(targetBalance)
+            )
+        elif self.regimes[target] >= 0:
+            costBasis = (
+                self.getCostBasis(source) if self.regimes[source] >= 0 else balance
+            )
+            if target in self.lots:
+                self.lots[target].add(
+                    self.year,
+                    costBasis,
+                    self._paths(balance),
+                    self._paths(targetBalance),
+                )
+            else:
+                self.costBases[target] = self.costBases[target] + costBasis
+        if source in self.lots:
+            self.lots[source] = _Lots(len(self.lots[source].years), self.paths)
+        elif self.regimes[source] >= 0:
+            self.costBases[source] = self.costBases[source] * 0.0
+
+    def _gainFraction(self, c: int, balance):
+        if self.vectorized:
+            ratio = np.divide(
+                self.costBases[c],
+                balance,
+                out=np.ones_like(balance),
+                where=balance > 0,
+            )
+            return np.maximum(1 - ratio, 0.0)
+        return max(1 - self.costBases[c] / balance, 0.0) if balance > 0 else 0.0
+
+    def getSpendable(self, c: int, balance):
+        exemptionLeft = self.exemptionsLeft[self.regimes[c]]
+        if c in self.lots:
+            return self._result(
+                self.lots[c].getSpendable(
+                    self._paths(balance),
+                    self.year,
+                    self.holdingYears[c],
+                    self.shortTermRates[c],
+                    self.rates[c],
+                    self._paths(exemptionLeft),
+                )
+            )
+        maximum = np.maximum if self.vectorized else max
+        gain = balance * self._gainFraction(c, balance)
+        return balance - self.rates[c] * maximum(gain - exemptionLeft, 0.0)
+
+    def spend(self, c: int, balance, net):
+        """The withdrawal that leaves net after tax, bookkept."""
+        rate = self.rates[c]
+        regime = self.regimes[c]
+        exemptionLeft = self.exemptionsLeft[regime]
+        if c in self.lots:
+            if not np.any(net):
+                return net
+            gross, gain = self.lots[c].spend(
+                self._paths(balance),
+                self._paths(net),
+                self.year,
+                self.holdingYears[c],
+                self.shortTermRates[c],
+                rate,
+                self._paths(exemptionLeft),
+                self.lotMethods[c] == "fifo",
+            )
+            self.exemptionsLeft[regime] = self._result(
+                exemptionLeft - np.minimum(gain, exemptionLeft)
+            )
+            return self._result(gross)
+        gainFraction = self._gainFraction(c, balance)
+        grossedUp = (net - rate * exemptionLeft) / (1 - rate * gainFraction)
+        if self.vectorized:
+            gross = np.where(net * gainFraction <= exemptionLeft, net, grossedUp)
+            gain = np.maximum(gross * gainFraction, 0.0)
+            self.exemptionsLeft[regime] = exemptionLeft - np.minimum(
+                gain, exemptionLeft
+            )
+            remaining = np.divide(
+                np.maximum(balance - gross, 0.0),
+                balance,
+                out=np.ones_like(balance),
+                where=balance > 0,
+            )
+        else:
+            gross = net if net * gainFraction <= exemptionLeft else grossedUp
+            gain = max(gross * gainFraction, 0.0)
+            self.exemptionsLeft[regime] = exemptionLeft - min(gain, exemptionLeft)
+            remaining = max(balance - gross, 0.0) / balance if balance > 0 else 1.0
+        self.costBases[c] = self.costBases[c] * remaining
+        return gross
+
+
+class VectorizedSimulationEngine:
+    """
+    Steps a CompiledPlan through periodsPerYear periods a year, for one path or
+    for many paths at once (e.g. Monte Carlo returns, rolling windows).
+
+    Per period every corpus first grows by its per-period factor
+    ((1 + growthRate) * exchangeRatio) ** (1 / periodsPerYear), then receives its share of the
+    year's cashflow allocations, then the active expenses are deducted in plan
+    order. Initial (lumpsum) amounts are deducted in the first period of their
+    year, recurring amounts are spread evenly over the periods. Successions
+    happen after the last period of a year. With periodsPerYear=1 this is the
+    annual schedule of CashflowSimulationService.
+
+    Balances are kept as one column per corpus: a float for a single path, so
+    that it runs as plain Python arithmetic, or an array over paths, so that
+    every operation is vectorized across paths.
+    """
+
+    def __init__(self, plan: CompiledPlan, periodsPerYear: int = 1):
+        if periodsPerYear < 1:
+            raise ValueError(
+                f"periodsPerYear should be at least 1, got {periodsPerYear}"
+            )
+        self.plan = plan
+        self.periodsPerYear = periodsPerYear
+        self._periodDeposits = (plan.deposits / periodsPerYear).tolist()
+
+    def _columns(self, values: np.ndarray, paths: int):
+        # (corpora,) or (paths, corpora) values as one column per corpus
+        if paths == 1:
+            return values.reshape(-1).tolist()
+        values = np.broadcast_to(values, (paths, self.plan.corpusCount))
+        return [np.ascontiguousarray(values[:, c]) for c in range(values.shape[1])]
+
+    def _periodFactors(
+        self,
+        annualReturns: np.ndarray,
+        paths: int,
+        exchangeRatios: Union[np.ndarray, None] = None,
+    ):
+        growth = 1 + annualReturns
+        if exchangeRatios is not None:
+            growth = growth * exchangeRatios
+        return self._columns(growth ** (1 / self.periodsPerYear), paths)
+
+    def iterate(
+        self,
+        paths: int = 1,
+        returns: Union[ReturnsForYear, None] = None,
+        raiseOnOvershoot: bool = True,
+        deposits: Union[Deposits, None] = None,
+        errorBounds: Union[List[float], None] = None,
+        exchangeRatios: Union[ExchangeRatios, None] = None,
+    ) -> Iterator[Tuple[int, Balances, Union[bool, np.ndarray]]]:
+        """
+        Yields (year index, balances, overshot) at the end of every year, before
+        successions. The balances are live, copy them to keep them. overshot
+        tells (per path) whether an expense's last funding corpus could not
+        cover its remainder during that year; unless raiseOnOvershoot, in
+        which case a ValueError is raised like CashflowSimulationService does.
+
+        With a single path, errorBounds (one 0.0 per corpus) is kept up to
+        date alongside the balances with a first order bound on how far each
+        balance is from the exact arithmetic of the same plan: the rounding
+        of every float operation and input conversion, deductions judged on
+        balances that are off by their own bound, and the appreciations
+        under half a paisa that CashflowSimulationService skips.
+
+        exchangeRatios replaces the plan's own exchange rate moves, e.g. with
+        sampleExchangeRatios for stochastic rates.
+
+        Capital gains tax is paid like CashflowSimulationService does, at the
+        cost of some bookkeeping per taxed corpus; error bounds are not
+        tracked for such plans, nor for plans with an expense drawing by a
+        withdrawal strategy other than sequentially, or with rebalancing.
+
+        Rebalancing happens after the last period's expenses of a year, as
+        a matrix product over the balances of the corpora it links.
+        """
+        plan = self.plan
+        capitalGains = (
+            _CapitalGains(plan, paths, self._columns)
+            if plan.hasCapitalGainsTax
+            else None
+        )
+        if errorBounds is not None:
+            if paths != 1:
+                raise ValueError("Error bounds are only tracked for a single path")
+            if capitalGains is not None:
+                raise ValueError(
+                    "Error bounds are not tracked for plans with capital gains tax"
+                )
+            if plan.hasWithdrawalStrategies or plan.hasRebalancing:
+                raise ValueError(
+                    "Error bounds are not tracked for plans with withdrawal strategies or rebalancing"
+                )
+            for c, balance in enumerate(plan.initialBalances.tolist()):
+                errorBounds[c] = UNIT_ROUNDOFF * abs(balance)
+        # the state of every expense's withdrawal strategy over this run
+        states = [
+            None if strategy is None else strategy.start(paths)
+            for strategy in plan.withdrawalStrategies
+        ]
+        if paths == 1:
+            balances: Balances = plan.initialBalances.tolist()
+        else:
+            balances = [
+                np.full(paths, balance, dtype=np.float64)
+                for balance in plan.initialBalances
+            ]
+        if exchangeRatios is None and plan.hasForeignCorpora:
+            exchangeRatios = plan.exchangeRatios
+        constantFactors = (
+            self._periodFactors(plan.growthRates, paths)
+            if returns is None and exchangeRatios is None
+            else None
+        )
+        for yearIndex in range(plan.yearCount):
+            factors = (
+                constantFactors
+                if constantFactors is not None
+                else self._periodFactors(
+                    (
+                        plan.growthRates
+                        if returns is None
+                        else np.asarray(returns(yearIndex))
+                    ),
+                    paths,
+                    None if exchangeRatios is None else exchangeRatios[yearIndex],
+                )
+            )
+            periodDeposits = (
+                self._periodDeposits[yearIndex]
+                if deposits is None
+                else self._columns(deposits[yearIndex] / self.periodsPerYear, paths)
+            )
+            expenses = plan.expenses[yearIndex]
+            overshot = False
+            if capitalGains is not None:
+                capitalGains.startYear(plan.years[yearIndex])
+            for period in range(self.periodsPerYear):
+                if errorBounds is None:
+                    for c in range(len(balances)):
+                        balances[c] = balances[c] * factors[c] + periodDeposits[c]
+                else:
+                    self._growTracked(balances, errorBounds, factors, periodDeposits)
+                if capitalGains is not None:
+                    for c in capitalGains.taxed:
+                        capitalGains.deposit(c, periodDeposits[c], balances[c])
+                for expense in expenses:
+                    if expense.strategy is not None:
+                        overshot |= self._draw(
+                            balances,
+                            expense,
+                            states[expense.index],
+                            period,
+                            yearIndex,
+                            raiseOnOvershoot,
+                            capitalGains,
+                        )
+                        continue
+                    overshot |= self._deduct(
+                        balances,
+                        expense,
+                        expense.initialAmount if period == 0 else 0.0,
+                        expense.recurringAmount / self.periodsPerYear,
+                        yearIndex,
+                        raiseOnOvershoot,
+                        errorBounds,
+                        capitalGains,
+                    )
+            for rebalancing in plan.rebalancing[yearIndex]:
+                self._rebalance(balances, rebalancing, capitalGains)
+            yield yearIndex, balances, overshot
+            for source, target in plan.transfers[yearIndex]:
+                if capitalGains is not None:
+                    capitalGains.transfer(
+                        source, target, balances[source], balances[target]
+                    )
+                balances[target] = balances[target] + balances[source]
+                balances[source] = balances[source] - balances[source]
+                if errorBounds is not None:
+                    errorBounds[target] += errorBounds[source] + UNIT_ROUNDOFF * abs(
+                        balances[target]
+                    )
+                    errorBounds[source] = 0.0
+
+    @staticmethod
+    def _growTracked(balances, errorBounds, factors, periodDeposits):
+        for c in range(len(balances)):
+            grown = balances[c] * factors[c]
+            appreciation = abs(grown - balances[c])
+            balances[c] = grown + periodDeposits[c]
+            # factors (exchange ratios included) and deposits are a few
+            # roundings off their Decimal values, then the multiplication and
+            # the addition round once more
+            errorBounds[c] = (
+                errorBounds[c] * factors[c]
+                + 8 * UNIT_ROUNDOFF * abs(grown)
+                + 4 * UNIT_ROUNDOFF * abs(periodDeposits[c])
+                + UNIT_ROUNDOFF * abs(balances[c])
+            )
+            if appreciation < _SKIPPED_APPRECIATION + errorBounds[c]:
+                errorBounds[c] += min(appreciation, _SKIPPED_APPRECIATION)
+
+    def _deduct(
+        self,
+        balances: Balances,
+        expense: CompiledExpense,
+        initialAmount: float,
+        recurringAmount: float,
+        yearIndex: int,
+        raiseOnOvershoot: bool,
+        errorBounds: Union[List[float], None] = None,
+        capitalGains: Union[_CapitalGains, None] = None,
+    ):
+        # every funding corpus is judged on its balance before this expense,
+        # exactly like Expense.getCorporaDeductions, net of the tax on
+        # withdrawing all of it
+        vectorized = not isinstance(balances[0], float)
+        minimum = np.minimum if vectorized else min
+        available = balances
+        # what taxed corpora pay out, in the order Corpus.spend is called
+        taxedDeductions = []
+        if capitalGains is not None:
+            available = list(balances)
+            for c in {
+                *expense.initialFunders,
+                *expense.recurringFunders,
+                expense.finalFunder,
+            }:
+                if capitalGains.regimes[c] >= 0:
+                    available[c] = capitalGains.getSpendable(c, balances[c])
+        deductions = {}
+        remainder = 0.0
+        # bounds on the error of the above, when tracked. A deduction that
+        # takes a corpus's whole balance cancels that balance's own error,
+        # which the branches below only rely on when the rounding can't flip
+        # the comparison
+        deductionErrors = {}
+        remainderError = 0.0
+        emptied = set()
+        for funders, amount in (
+            (expense.initialFunders, initialAmount),
+            (expense.recurringFunders, recurringAmount),
+        ):
+            amountError = 2 * UNIT_ROUNDOFF * abs(amount)
+            for c in funders:
+                deduction = minimum(available[c], amount)
+                if capitalGains is not None and capitalGains.regimes[c] >= 0:
+                    taxedDeductions.append((c, deduction))
+                else:
+                    deductions[c] = deductions.get(c, 0.0) + deduction
+                if errorBounds is not None:
+                    margin = errorBounds[c] + amountError
+                    if balances[c] >= amount + margin:
+                        deductionError = amountError
+                        amountError = 0.0
+                    else:
+                        if balances[c] > amount - margin:
+                            deductionError = max(errorBounds[c], amountError)
+                        elif c in emptied:
+                            deductionError = errorBounds[c]
+                        else:
+                            emptied.add(c)
+                            deductionError = 0.0
+                        amountError += errorBounds[c] + UNIT_ROUNDOFF * abs(
+                            amount - deduction
+                        )
+                    deductionErrors[c] = (
+                        deductionErrors.get(c, 0.0)
+                        + deductionError
+                        + UNIT_ROUNDOFF * abs(deductions[c])
+                    )
+                amount = amount - deduction
+            remainder = remainder + amount
+            remainderError += amountError + UNIT_ROUNDOFF * abs(remainder)
+        overshot = self._checkOvershoot(
+            expense, remainder, available, yearIndex, raiseOnOvershoot
+        )
+        if capitalGains is not None and capitalGains.regimes[expense.finalFunder] >= 0:
+            taxedDeductions.append((expense.finalFunder, remainder))
+        else:
+            deductions[expense.finalFunder] = (
+                deductions.get(expense.finalFunder, 0.0) + remainder
+            )
+        for c, net in taxedDeductions:
+            balances[c] = balances[c] - capitalGains.spend(c, balances[c], net)
+        deductionErrors[expense.finalFunder] = (
+            deductionErrors.get(expense.finalFunder, 0.0) + remainderError
+        )
+        for c, deduction in deductions.items():
+            balances[c] = balances[c] - deduction
+            if errorBounds is not None:
+                errorBounds[c] = (
+                    (0.0 if c in emptied else errorBounds[c])
+                    + deductionErrors[c]
+                    + UNIT_ROUNDOFF * abs(deduction)
+                    + UNIT_ROUNDOFF * abs(balances[c])
+                )
+        return overshot
+
+    def _checkOvershoot(
+        self,
+        expense: CompiledExpense,
+        remainder,
+        available: Balances,
+        yearIndex: int,
+        raiseOnOvershoot: bool,
+    ):
+        # whatever is left falls on the last funding corpus, even if it
+        # doesn't have enough
+        overshot = remainder > available[expense.finalFunder]
+        vectorized = isinstance(overshot, np.ndarray)
+        if raiseOnOvershoot and (overshot.any() if vectorized else overshot):
+            year = self.plan.years[yearIndex]
+            finalId = self.plan.corpusIds[expense.finalFunder]
+            amount = remainder if not vectorized else remainder[np.argmax(overshot)]
+            raise ValueError(
+                f"Corpus {finalId} doesn't have {Money(float(amount)).format()} to fund {expense.id} in {year}"
+            )
+        return overshot
+
+    def _getAvailable(
+        self,
+        balances: Balances,
+        expense: CompiledExpense,
+        capitalGains: Union[_CapitalGains, None],
+    ) -> Balances:
+        available = list(balances)
+        if capitalGains is not None:
+            for c in {
+                *expense.initialFunders,
+                *expense.recurringFunders,
+                expense.finalFunder,
+            }:
+                if capitalGains.regimes[c] >= 0:
+                    available[c] = capitalGains.getSpendable(c, balances[c])
+        return available
+
+    @staticmethod
+    def _spend(balances, c, net, capitalGains):
+        if capitalGains is not None and capitalGains.regimes[c] >= 0:
+            net = capitalGains.spend(c, balances[c], net)
+        balances[c] = balances[c] - net
+
+    def _draw(
+        self,
+        balances: Balances,
+        expense: CompiledExpense,
+        state,
+        period: int,
+        yearIndex: int,
+        raiseOnOvershoot: bool,
+        capitalGains: Union[_CapitalGains, None] = None,
+    ):
+        # _deduct for an expense with a withdrawal strategy: refills in the
+        # first period, then its draws in the order of
+        # Expense.getCorporaDeductions, every funder judged on its balance
+        # before the draws
+        strategy = expense.strategy
+        available = self._getAvailable(balances, expense, capitalGains)
+        if period == 0:
+            refills = strategy.getRefills(state, expense, available, yearIndex)
+            for source, target, amount in refills:
+                self._spend(balances, source, amount, capitalGains)
+                self._buy(balances, target, amount, capitalGains)
+            if refills:
+                available = self._getAvailable(balances, expense, capitalGains)
+        initialAmount, recurringAmount = strategy.getAmounts(
+            state,
+            expense,
+            balances,
+            expense.initialAmount if period == 0 else 0.0,
+            expense.recurringAmount / self.periodsPerYear,
+            period,
+        )
+        deductions = []
+        remainder = 0.0
+        for funders, amount in (
+            (expense.initialFunders, initialAmount),
+            (expense.recurringFunders, recurringAmount),
+        ):
+            drawn, amount = strategy.draw(
+                expense, funders, available, amount, yearIndex
+            )
+            deductions.extend(drawn)
+            remainder = remainder + amount
+        overshot = self._checkOvershoot(
+            expense, remainder, available, yearIndex, raiseOnOvershoot
+        )
+        deductions.append((expense.finalFunder, remainder))
+        for c, net in deductions:
+            self._spend(balances, c, net, capitalGains)
+        return overshot
+
+    def _rebalance(
+        self,
+        balances: Balances,
+        rebalancing: CompiledRebalancing,
+        capitalGains: Union[_CapitalGains, None] = None,
+    ):
+        # like RebalancingPolicy.getRebalances, for every path at once: sales
+        # first, then purchases
+        held = np.array([balances[c] for c in rebalancing.positions])
+        total = held.sum(axis=0)
+        due = total > 0
+        if rebalancing.threshold is not None:
+            weights = (
+                rebalancing.weights if held.ndim == 1 else rebalancing.weights[:, None]
+            )
+            drift = np.abs(held / np.where(due, total, 1.0) - weights).max(axis=0)
+            due &= drift > rebalancing.threshold
+        if not np.any(due):
+            return
+        moves = (rebalancing.matrix @ held) * due
+        if held.ndim == 1:
+            for c, move in zip(rebalancing.positions, moves.tolist()):
+                if move < 0:
+                    self._spend(balances, c, -move, capitalGains)
+            for c, move in zip(rebalancing.positions, moves.tolist()):
+                if move > 0:
+                    self._buy(balances, c, move, capitalGains)
+            return
+        for c, move in zip(rebalancing.positions, moves):
+            self._spend(balances, c, np.maximum(-move, 0.0), capitalGains)
+        for c, move in zip(rebalancing.positions, moves):
+            self._buy(balances, c, np.maximum(move, 0.0), capitalGains)
+
+    @staticmethod
+    def _buy(balances, c, amount, capitalGains):
+        balances[c] = balances[c] + amount
+        if capitalGains is not None and capitalGains.regimes[c] >= 0:
+            capitalGains.deposit(c, amount, balances[c])
+
+
+def sampleExchangeRatios(
+    plan: CompiledPlan, paths: int, rng: np.random.Generator
+) -> ExchangeRatios:
+    """
+    Lognormal exchange rate moves around the plan's own, shape (years, paths,
+    corpora), with the annual volatility of every currency. Corpora of the
+    same currency share its moves, and a path's expected move is the plan's.
+    """
+    currencies = sorted(set(plan.corpusCurrencies))
+    shocks = rng.standard_normal((plan.yearCount, paths, len(currencies)))
+    columns = [currencies.index(currency) for currency in plan.corpusCurrencies]
+    volatilities = plan.exchangeRateVolatilities
+    return plan.exchangeRatios[:, None, :] * np.exp(
+        volatilities * shocks[:, :, columns] - volatilities**2 / 2
+    )
+
+
+class PeriodicSimulationService:
+    """
+    Simulates a plan in float64, at a finer resolution than a year (e.g.
+    monthly with periodsPerYear=12) or annually as a fast stand in for
+    CashflowSimulationService, and rolls the result up to its
+    SimulationResponse shape: year end balances and the year's allocations.
+    The response's accuracy reports the largest error bound of any balance,
+    see VectorizedSimulationEngine.iterate, None when it isn't tracked.
+    """
+
+    def __init__(self, data: CashflowSimulationServiceInitData, periodsPerYear=12):
+        self.plan = CompiledPlan(data)
+        self.engine = VectorizedSimulationEngine(self.plan, periodsPerYear)
+
+    def simulate(self, recordAnnualResults: bool = True) -> SimulationResponse:
+        plan = self.plan
+        simulationResults = []
+        # not tracked with capital gains tax, withdrawal strategies or
+        # rebalancing
+        errorBounds = (
+            None
+            if plan.hasCapitalGainsTax
+            or plan.hasWithdrawalStrategies
+            or plan.hasRebalancing
+            else [0.0] * plan.corpusCount
+        )
+        maxErrorBound = None if errorBounds is None else 0.0
+        for yearIndex, balances, _ in self.engine.iterate(errorBounds=errorBounds):
+            if errorBounds is not None:
+                maxErrorBound = max(maxErrorBound, *errorBounds)
+            if not recordAnnualResults and yearIndex != plan.yearCount - 1:
+                continue
+            year = plan.years[yearIndex]
+            divisor = plan.inflationDivisors[yearIndex]
+            simulationResults.append(
+                {
+                    "corpora": [
+                        {
+                            "id": corpusId,
+                            "value": {
+                                "amount": balance,
+                                "inflationAdjusted": float(balance / divisor),
+                            },
+                            "year": year,
+                        }
+                        for corpusId, balance in zip(plan.corpusIds, balances)
+                    ],
+                    "year": year,
+                    "cashflowAllocations": plan.allocations[yearIndex],
+                }
+            )
+        return {
+            "simulation": simulationResults,
+            "warnings": [],
+            "accuracy": {
+                "engine": "float",
+                "maxErrorBound": maxErrorBound,
+                "maxDivergence": None,
+            },
+        }
+
+
+def getMaxDivergence(
+    response: SimulationResponse, reference: SimulationResponse
+) -> float:
+    """Largest difference of any recorded balance between two responses."""
+    return max(
+        (
+            abs(corpus["value"]["amount"] - referenceCorpus["value"]["amount"])
+            for annualResult, referenceResult in zip(
+                response["simulation"], reference["simulation"], strict=True
+            )
+            for corpus, referenceCorpus in zip(
+                annualResult["corpora"], referenceResult["corpora"], strict=True
+            )
+        ),
+        default=0.0,
+    )
@@ -0,0 +1,261 @@
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Dict, List, Tuple, Type
+
+import numpy as np
+
+from flow_prediction.shared.value_objects import Decimal
+from ....aggregates import Expense
+from ....aggregates.withdrawal_strategy import (
+    BucketWithdrawal,
+    GlidePathWithdrawal,
+    GuardrailsWithdrawal,
+    ProportionalWithdrawal,
+    WithdrawalStrategy,
+)
+
+if TYPE_CHECKING:
+    from ..compiled import CompiledExpense
+
+
+class VectorizedWithdrawal:
+    """
+    A WithdrawalStrategy on floats (one path) or arrays of paths, for
+    VectorizedSimulationEngine, built once per expense by CompiledPlan.
+
+    Same calls as the strategy's, with corpora as positions: available holds
+    the spendable balance of every funder before the expense, amounts are
+    those of the current period. Sequential plans never get one, the engine
+    draws them itself (tracking error bounds).
+    """
+
+    def __init__(
+        self,
+        strategy: WithdrawalStrategy,
+        expense: Expense,
+        years: range,
+        corpusIds: List[str],
+        activeCorpora: np.ndarray,
+    ):
+        self.strategy = strategy
+
+    def start(self, paths: int):
+        """The state of one run, e.g. a multiplier per path."""
+        return None
+
+    def getAmounts(
+        self,
+        state,
+        expense: "CompiledExpense",
+        balances,
+        initialAmount,
+        recurringAmount,
+        period: int,
+    ):
+        return initialAmount, recurringAmount
+
+    def getRefills(
+        self, state, expense: "CompiledExpense", available, yearIndex: int
+    ) -> list:
+        """(source, target, amount) moves made before the first period's draw."""
+        return []
+
+    def draw(
+        self,
+        expense: "CompiledExpense",
+        funders: Tuple[int, ...],
+        available,
+        amount,
+        yearIndex: int,
+    ) -> Tuple[list, object]:
+        minimum = (
+            np.minimum
+            if isinstance(available[expense.finalFunder], np.ndarray)
+            else min
+        )
+        deductions = []
+        for c in funders:
+            deduction = minimum(available[c], amount)
+            deductions.append((c, deduction))
+            amount = amount - deduction
+        return deductions, amount
+
+
+class VectorizedWeightedWithdrawal(VectorizedWithdrawal, ABC):
+    @abstractmethod
+    def getWeights(self, expense: "CompiledExpense", corpora, available, yearIndex):
+        pass
+
+    def draw(self, expense, funders, available, amount, yearIndex):
+        corpora = (*funders, expense.finalFunder)
+        weights = self.getWeights(expense, corpora, available, yearIndex)
+        total = sum(weights)
+        vectorized = isinstance(available[expense.finalFunder], np.ndarray)
+        if not vectorized and total <= 0:
+            return [], amount
+        minimum = np.minimum if vectorized else min
+        maximum = np.maximum if vectorized else max
+        left = [maximum(available[c], 0.0) for c in corpora]
+        if vectorized:
+            shares = [
+                amount
+                * np.divide(
+                    weight,
+                    total,
+                    out=np.zeros(np.shape(total)),
+                    where=np.asarray(total > 0),
+                )
+                for weight in weights
+            ]
+        else:
+            shares = [amount * (weight / total) for weight in weights]
+        taken = [minimum(share, limit) for share, limit in zip(shares, left)]
+        leftover = amount - sum(taken)
+        for k in range(len(funders)):
+            extra = minimum(left[k] - taken[k], leftover)
+            taken[k] = taken[k] + extra
+            leftover = leftover - extra
+        return list(zip(funders, taken)), taken[-1] + leftover
+
+
+class VectorizedProportionalWithdrawal(VectorizedWeightedWithdrawal):
+    def getWeights(self, expense, corpora, available, yearIndex):
+        maximum = np.maximum if isinstance(available[corpora[0]], np.ndarray) else max
+        return [maximum(available[c], 0.0) for c in corpora]
+
+
+class VectorizedGlidePathWithdrawal(VectorizedWeightedWithdrawal):
+    def __init__(
+        self, strategy: GlidePathWithdrawal, expense, years, corpusIds, activeCorpora
+    ):
+        super().__init__(strategy, expense, years, corpusIds, activeCorpora)
+        self.corpusIds = corpusIds
+        span = expense.endYear - expense.startYear
+        # the weights of every funding corpus id, per year index
+        self.weights: List[Dict[str, float]] = [
+            {
+                id: float(
+                    start
+                    + (strategy.endWeights[id] - start)
+                    * (
+                        Decimal(year - expense.startYear) / span
+                        if span > 0
+                        else Decimal(0)
+                    )
+                )
+                for id, start in strategy.startWeights.items()
+            }
+            for year in years
+        ]
+
+    def getWeights(self, expense, corpora, available, yearIndex):
+        weights = self.weights[yearIndex]
+        return [weights.get(self.corpusIds[c], 0.0) for c in corpora]
+
+
+class VectorizedGuardrailsWithdrawal(VectorizedWithdrawal):
+    def start(self, paths):
+        # initial withdrawal rate, not set yet, and spending multiplier
+        if paths == 1:
+            return [None, 1.0]
+        return [np.full(paths, np.nan), np.ones(paths)]
+
+    def getAmounts(
+        self, state, expense, balances, initialAmount, recurringAmount, period
+    ):
+        if period == 0:
+            self._adjust(state, expense, balances)
+        return initialAmount, recurringAmount * state[1]
+
+    def _adjust(self, state, expense, balances):
+        guardrail = float(self.strategy.guardrail)
+        adjustment = float(self.strategy.adjustment)
+        amount = expense.recurringAmount
+        balance = sum(
+            balances[c]
+            for c in sorted({*expense.recurringFunders, expense.finalFunder})
+        )
+        initialRate, multiplier = state
+        if not isinstance(balance, np.ndarray):
+            if balance > 0 and amount > 0:
+                rate = amount * multiplier / balance
+                if initialRate is None:
+                    state[0] = rate
+                elif rate > initialRate * (1 + guardrail):
+                    state[1] = multiplier * (1 - adjustment)
+                elif rate < initialRate * (1 - guardrail):
+                    state[1] = multiplier * (1 + adjustment)
+            return
+        if amount <= 0:
+            return
+        funded = balance > 0
+        rate = np.divide(
+            amount * multiplier, balance, out=np.zeros_like(balance), where=funded
+        )
+        unset = np.isnan(initialRate)
+        above = funded & ~unset & (rate > initialRate * (1 + guardrail))
+        below = funded & ~unset & ~above & (rate < initialRate * (1 - guardrail))
+        state[0] = np.where(funded & unset, rate, initialRate)
+        state[1] = np.where(
+            above,
+            multiplier * (1 - adjustment),
+            np.where(below, multiplier * (1 + adjustment), multiplier),
+        )
+
+
+class VectorizedBucketWithdrawal(VectorizedWithdrawal):
+    def __init__(
+        self, strategy: BucketWithdrawal, expense, years, corpusIds, activeCorpora
+    ):
+        super().__init__(strategy, expense, years, corpusIds, activeCorpora)
+        self.activeCorpora = activeCorpora
+
+    def getRefills(self, state, expense, available, yearIndex):
+        # a corpus that has ended or not yet started takes no refill
+        active = self.activeCorpora[yearIndex]
+        buckets = tuple(
+            c for c in (*expense.recurringFunders, expense.finalFunder) if active[c]
+        )
+        if len(buckets) < 2:
+            return []
+        bucket = buckets[0]
+        need = expense.recurringAmount * float(self.strategy.refillYears) - (
+            available[bucket]
+        )
+        refills = []
+        if isinstance(need, np.ndarray):
+            for source in buckets[1:]:
+                amount = np.maximum(np.minimum(available[source], need), 0.0)
+                refills.append((source, bucket, amount))
+                need = need - amount
+            return refills
+        for source in buckets[1:]:
+            if need <= 0:
+                break
+            amount = min(available[source], need)
+            if amount > 0:
+                refills.append((source, bucket, amount))
+                need -= amount
+        return refills
+
+
+VECTORIZED_WITHDRAWALS: Dict[Type[WithdrawalStrategy], Type[VectorizedWithdrawal]] = {
+    ProportionalWithdrawal: VectorizedProportionalWithdrawal,
+    GlidePathWithdrawal: VectorizedGlidePathWithdrawal,
+    GuardrailsWithdrawal: VectorizedGuardrailsWithdrawal,
+    BucketWithdrawal: VectorizedBucketWithdrawal,
+}
+
+
+def compileWithdrawal(
+    expense: Expense, corpusIds: List[str], years: range, activeCorpora: np.ndarray
+) -> "VectorizedWithdrawal | None":
+    """
+    The expense's strategy for the engine, None when it draws sequentially;
+    activeCorpora[y, c] tells whether corpus c is active in year y.
+    """
+    vectorized = VECTORIZED_WITHDRAWALS.get(type(expense.withdrawalStrategy))
+    if vectorized is None:
+        return None
+    return vectorized(
+        expense.withdrawalStrategy, expense, years, corpusIds, activeCorpora
+    )
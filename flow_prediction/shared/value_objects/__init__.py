@@ -2,5 +2,6 @@ from .inflation_adjustable_value import InflationAdjustableValue
 from .id import Id
 from .money import Money
 from .decimal import Decimal
+from .exchange_rate import ExchangeRate
 
-__all__ = ["InflationAdjustableValue", "Id", "Money", "Decimal"]
+__all__ = ["InflationAdjustableValue", "Id", "Money", "Decimal", "ExchangeRate"]
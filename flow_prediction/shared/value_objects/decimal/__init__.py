@@ -1,42 +1,42 @@
-from decimal import Decimal as BaseDecimal, getcontext, ROUND_HALF_UP
+import functools
+from decimal import Context, Decimal as BaseDecimal, ROUND_HALF_UP
 
-getcontext().prec = 28  # sets precision to 6 significant digits
-# target_precision = BaseDecimal('1.000000000000')  # This pattern represents 12 decimal places
+# the arithmetic context of every simulation, entered with
+# decimal.localcontext(DECIMAL_CONTEXT) instead of changing the thread's
+# context for whoever else uses decimal
+DECIMAL_CONTEXT = Context(prec=28)
+
+
+@functools.lru_cache(maxsize=256)
+def _quantized(value: BaseDecimal, quantum: BaseDecimal) -> BaseDecimal:
+    # the right hand side of a comparison is mostly a constant, e.g. 0 or 1
+    return value.quantize(quantum, rounding=ROUND_HALF_UP)
 
 
 class Decimal(BaseDecimal):
+    """
+    decimal.Decimal with the helpers of this domain. Arithmetic is inherited
+    as is, so every operator returns a plain decimal.Decimal whatever the
+    operands; results are never re-wrapped. The helpers work on any
+    decimal.Decimal when called on the class, e.g.
+    Decimal.isQuantizedEqual(sum(ratios), 1).
+    """
+
     # Define a default target precision (here, two decimal places).
     default_precision = BaseDecimal("0.01")
 
     def isQuantizedEqual(self, other, target_precision=None):
         """
-        Compare self and other after quantizing both to a target precision.
-
-        :param other: The other value to compare (can be a Decimal or a value convertible to Decimal)
-        :param target_precision: A Decimal representing the quantization target, e.g., Decimal('0.01')
-                                 If None, the class's default_precision is used.
-        :return: True if the quantized values are equal, False otherwise.
+        Compare self and other after quantizing both (half up) to a target
+        precision, Decimal.default_precision when None.
         """
-        # Use default precision if none is provided.
         if target_precision is None:
-            target_precision = self.default_precision
-
-        # Quantize self using the given target precision.
-        quantized_self = self.quantize(target_precision, rounding=ROUND_HALF_UP)
-
-        # Ensure 'other' is a Decimal. If not, convert it.
+            target_precision = Decimal.default_precision
         if not isinstance(other, BaseDecimal):
-            other = Decimal(other)
-        quantized_other = other.quantize(target_precision, rounding=ROUND_HALF_UP)
-        return quantized_self == quantized_other
-
-    def __add__(self, other):
-        result = super().__add__(other)
-        return self.__class__(result)
-
-    def __radd__(self, other):
-        result = super().__radd__(other)
-        return self.__class__(result)
+            other = BaseDecimal(other)
+        return self.quantize(target_precision, rounding=ROUND_HALF_UP) == _quantized(
+            other, target_precision
+        )
 
 
 #
@@ -0,0 +1,58 @@
+import operator
+from decimal import Decimal as BaseDecimal, localcontext
+
+import pytest
+
+from .. import Decimal
+
+
+@pytest.mark.parametrize(
+    "operation",
+    [operator.add, operator.sub, operator.mul, operator.truediv, operator.pow],
+)
+@pytest.mark.parametrize(
+    "left, right",
+    [
+        (Decimal("1.5"), Decimal("2")),
+        (Decimal("1.5"), 2),
+        (2, Decimal("1.5")),
+        (BaseDecimal("1.5"), Decimal("2")),
+    ],
+)
+def test_operators_return_plain_decimals(operation, left, right):
+    assert type(operation(left, right)) is BaseDecimal
+
+
+def test_unary_operators_and_sum_return_plain_decimals():
+    value = Decimal("-1.5")
+    for result in (-value, +value, abs(value), sum([value, value])):
+        assert type(result) is BaseDecimal
+
+
+@pytest.mark.parametrize(
+    "value, other, equal",
+    [
+        ("0.005", "0.01", True),
+        ("0.0049999", 0, True),
+        ("0.005", 0, False),
+        ("-0.005", "-0.01", True),
+        ("-0.0049999", 0, True),
+        ("-0.005", 0, False),
+        ("1.234", "1.23", True),
+    ],
+)
+def test_quantized_equality_rounds_half_up(value, other, equal):
+    assert Decimal(value).isQuantizedEqual(other) is equal
+    # on the class, for any decimal.Decimal
+    assert Decimal.isQuantizedEqual(BaseDecimal(value), other) is equal
+
+
+def test_quantized_equality_to_another_precision():
+    assert Decimal("1.04").isQuantizedEqual(1, BaseDecimal("0.1"))
+    assert not Decimal("1.05").isQuantizedEqual(1, BaseDecimal("0.1"))
+
+
+def test_arithmetic_follows_the_callers_context():
+    with localcontext(prec=5):
+        assert Decimal(1) / Decimal(3) == BaseDecimal("0.33333")
+    assert Decimal(1) / Decimal(3) == BaseDecimal(1) / BaseDecimal(3)
@@ -0,0 +1,77 @@
+from typing import Dict, Union
+
+from ..decimal import Decimal
+from ..money import Money
+
+
+class ExchangeRate:
+    """
+    The price of one unit of a currency in the plan's base currency, per year:
+    rate at referenceTime, drifting by growthRate a year (e.g. 0.03 when the
+    base currency loses 3% a year against it), unless the year has an
+    explicit rate. volatility is the annual standard deviation of the log
+    rate, only used by engines that sample stochastic paths.
+    """
+
+    def __init__(
+        self,
+        currency: str,
+        rate: Decimal,
+        referenceTime: int,
+        growthRate: Decimal,
+        volatility: Decimal = Decimal(0),
+        rates: Union[Dict[int, Decimal], None] = None,
+    ):
+        self.currency = currency.upper()
+        self.rate = rate
+        self.referenceTime = referenceTime
+        self.growthRate = growthRate
+        self.volatility = volatility
+        self.rates: Dict[int, Decimal] = dict(rates or {})
+        # explicit rates, then computed ones as years are asked for
+        self._rates: Dict[int, Decimal] = dict(self.rates)
+        self.validate()
+
+    def validate(self):
+        if self.rate <= 0 or any(rate <= 0 for rate in self.rates.values()):
+            raise ValueError(f"Exchange rates of {self.currency} should be positive")
+        if self.volatility < 0:
+            raise ValueError(
+                f"Volatility {self.volatility} of {self.currency} should not be negative"
+            )
+
+    def getRate(self, year: int) -> Decimal:
+        rate = self._rates.get(year)
+        if rate is None:
+            # computed once per year, every engine asks for the same years
+            rate = self._rates[year] = self.rate * (
+                (1 + self.growthRate) ** (year - self.referenceTime)
+            )
+        return rate
+
+    def getRatio(self, year: int, years: int = 1) -> Decimal:
+        """How much a holding's base value moves from year - years to year."""
+        return self.getRate(year) / self.getRate(year - years)
+
+    def convert(self, amount: Union[int, float, Decimal], year: int) -> Money:
+        """An amount of this currency, in the base currency at the year's rate."""
+        return Money(amount) * self.getRate(year)
+
+    def _key(self):
+        return (
+            self.currency,
+            self.rate,
+            self.referenceTime,
+            self.growthRate,
+            self.volatility,
+            tuple(sorted(self.rates.items())),
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, ExchangeRate) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"<ExchangeRate {self.currency}: {self.rate} in {self.referenceTime}>"
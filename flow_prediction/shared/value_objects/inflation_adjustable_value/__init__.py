@@ -14,9 +14,7 @@ class InflationAdjustableValue:
 
     def validate(self):
         if self.growthRate < 0 or self.growthRate > 1:
-            raise ValueError(
-                f"Growth rate {self.growthRate} should be between 0 and 1"
-            )
+            raise ValueError(f"Growth rate {self.growthRate} should be between 0 and 1")
 
     def getAmount(self, year: int):
         """
@@ -27,6 +25,4 @@ class InflationAdjustableValue:
                 f"Year {year} for amount calculation is before the reference"
                 f"time {self.referenceTime}"
             )
-        return self._amount * (
-            (1 + self.growthRate) ** (year - self.referenceTime)
-        )
+        return self._amount * ((1 + self.growthRate) ** (year - self.referenceTime))
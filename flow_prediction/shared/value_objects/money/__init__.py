@@ -1,25 +1,162 @@
+import functools
+from decimal import ROUND_HALF_EVEN, Decimal as BaseDecimal
 from typing import Union
 
-from moneyed import Money as MoneyedMoney, format_money
-
 from ..decimal import Decimal
+from .currencies import CURRENCY_CODES
+
+_PAISA = BaseDecimal("0.01")
+_HALF_PAISA = BaseDecimal("0.005")
+
+
+@functools.lru_cache(maxsize=4096)
+def _formatInr(amount: BaseDecimal, signed: bool) -> str:
+    """
+    babel's en_IN standard format of an INR amount, ¤#,##,##0.00: rounded
+    half even to paise, the last three rupee digits grouped, then lakhs,
+    crores and on in groups of two. The sign follows the amount even when it
+    rounds to zero, e.g. -₹0.00. Cached per (amount, sign) since -0 == 0.
+    """
+    rupees, paise = f"{abs(amount).quantize(_PAISA, rounding=ROUND_HALF_EVEN):f}".split(
+        "."
+    )
+    groups = [rupees[-3:]]
+    rupees = rupees[:-3]
+    while rupees:
+        groups.append(rupees[-2:])
+        rupees = rupees[:-2]
+    return f"{'-' if signed else ''}₹{','.join(reversed(groups))}.{paise}"
+
 
+class Money:
+    """
+    An amount in a currency, with the operator semantics of py-moneyed's Money.
+
+    INR amounts are formatted without babel (see _formatInr), other
+    currencies import py-moneyed (and babel with it) when first formatted, so
+    the simulation engine can be imported and run without loading locale
+    data.
+    """
+
+    __slots__ = ("amount", "currency")
+
+    def __init__(self, amount: Union[int, float, Decimal] = 0, currency="INR"):
+        self.amount = (
+            amount if isinstance(amount, BaseDecimal) else BaseDecimal(str(amount))
+        )
+        self.currency = str(currency).upper()
+        if self.currency not in CURRENCY_CODES:
+            raise ValueError(f"Unknown currency {currency}")
 
-class Money(MoneyedMoney):
-    def __init__(
-        self, amount: Union[int, float, Decimal, MoneyedMoney], currency="INR"
-    ):
-        super().__init__(amount, currency)
+    def _new(self, amount):
+        money = Money.__new__(self.__class__)
+        money.amount = amount
+        money.currency = self.currency
+        return money
+
+    def _checkCurrency(self, other: "Money", operation: str):
+        if self.currency != other.currency:
+            raise TypeError(
+                f"Cannot {operation} Money instances with different currencies."
+            )
 
     def format(self):
+        if self.currency == "INR" and self.amount.is_finite():
+            return _formatInr(self.amount, self.amount.is_signed())
+        from moneyed import Money as MoneyedMoney, format_money
+
         return format_money(
-            self,
+            MoneyedMoney(self.amount, self.currency),
             locale="en_IN",
             format_type="standard",
         )
 
     def isQuantizedEqual(self, other: "Money"):
-        return Decimal(self.amount).isQuantizedEqual(Decimal(other.amount))
+        return Decimal.isQuantizedEqual(self.amount, other.amount)
+
+    def isQuantizedZero(self):
+        """isQuantizedEqual(Money(0)), without quantizing: rounds to 0 paise."""
+        return abs(self.amount) < _HALF_PAISA
+
+    def __add__(self, other):
+        if other == 0:
+            # lets sum() work on a list of Money, just like a list of Decimal
+            return self
+        if not isinstance(other, Money):
+            return NotImplemented
+        self._checkCurrency(other, "add or subtract")
+        return self._new(self.amount + other.amount)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self.__add__(-other)
+
+    def __rsub__(self, other):
+        return (-self).__add__(other)
+
+    def __mul__(self, other):
+        if isinstance(other, Money):
+            raise TypeError("Cannot multiply two Money instances.")
+        if not isinstance(other, BaseDecimal):
+            other = BaseDecimal(str(other))
+        return self._new(self.amount * other)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, Money):
+            self._checkCurrency(other, "divide")
+            return self.amount / other.amount
+        if not isinstance(other, BaseDecimal):
+            other = BaseDecimal(str(other))
+        return self._new(self.amount / other)
+
+    def __rtruediv__(self, other):
+        raise TypeError("Cannot divide non-Money by a Money instance.")
+
+    def __pos__(self):
+        return self._new(self.amount)
+
+    def __neg__(self):
+        return self._new(-self.amount)
+
+    def __abs__(self):
+        return self._new(abs(self.amount))
+
+    def __bool__(self):
+        return bool(self.amount)
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, Money)
+            and self.amount == other.amount
+            and self.currency == other.currency
+        )
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((self.amount, self.currency))
+
+    def __lt__(self, other):
+        if not isinstance(other, Money):
+            raise TypeError(f"Cannot compare instances of Money and {type(other)}")
+        self._checkCurrency(other, "compare")
+        return self.amount < other.amount
+
+    def __gt__(self, other):
+        if not isinstance(other, Money):
+            raise TypeError(f"Cannot compare instances of Money and {type(other)}")
+        self._checkCurrency(other, "compare")
+        return self.amount > other.amount
+
+    def __le__(self, other):
+        return self < other or self == other
+
+    def __ge__(self, other):
+        return self > other or self == other
 
     def __float__(self):
         return float(self.amount)
@@ -29,9 +166,3 @@ class Money(MoneyedMoney):
 
     def __repr__(self):
         return f"Money({self.format()})"
-
-
-# if isinstance(amount, MoneyedMoney):
-#     self._data = amount
-# else:
-#     self._data = MoneyedMoney(amount, currency)
@@ -0,0 +1,53 @@
+import random
+from decimal import Decimal
+
+import pytest
+
+from .. import Money
+from ..currencies import CURRENCY_CODES
+
+moneyed = pytest.importorskip("moneyed")
+
+
+def formatWithBabel(amount):
+    return moneyed.format_money(
+        moneyed.Money(amount, "INR"), locale="en_IN", format_type="standard"
+    )
+
+
+@pytest.mark.parametrize(
+    "amount",
+    ["0", "-0", "-0.001", "0.005", "0.015", "0.025", "999.995", "-1234.5", "1e20"],
+)
+def test_inr_format_matches_babel(amount):
+    assert Money(Decimal(amount)).format() == formatWithBabel(Decimal(amount))
+
+
+def test_inr_format_matches_babel_on_random_amounts():
+    rng = random.Random(0)
+    for _ in range(2000):
+        amount = Decimal(rng.uniform(-1, 1) * 10 ** rng.randint(0, 15))
+        assert Money(amount).format() == formatWithBabel(amount)
+
+
+@pytest.mark.parametrize(
+    "amount", ["0", "-0", "0.0049999", "-0.0049999", "0.005", "-0.005", "0.01"]
+)
+def test_quantized_zero_is_quantized_equality_to_zero(amount):
+    money = Money(Decimal(amount))
+    assert money.isQuantizedZero() == money.isQuantizedEqual(Money(0))
+    assert money.isQuantizedZero() == (abs(Decimal(amount)) < Decimal("0.005"))
+
+
+def test_currency_codes_are_those_of_moneyed():
+    assert CURRENCY_CODES == set(moneyed.CURRENCIES)
+
+
+@pytest.mark.parametrize("currency", ["XYZ", "RS", "INRR", ""])
+def test_unknown_currencies_are_rejected(currency):
+    with pytest.raises(ValueError, match="Unknown currency"):
+        Money(1, currency)
+
+
+def test_currency_codes_are_case_insensitive():
+    assert Money(1, "usd") == Money(1, "USD")
@@ -1,24 +1,60 @@
 import json
+import os
 
 import altair as alt
 import pandas as pd
 import streamlit as st
 
-from flow_prediction.app.use_cases.simulation import CashflowSimulationUseCase
+from flow_prediction.app.background import BackgroundSimulation
+from flow_prediction.app.plan_state import PlanState
+from flow_prediction.app.use_cases.comparison import ScenarioComparisonUseCase
+from flow_prediction.app.use_cases.simulation import (
+    CashflowSimulationUseCase,
+    getPlanHash,
+)
 from flow_prediction.app.use_cases.simulation.samples import bachelor_for_life
+from flow_prediction.infrastructure.registry import ContentRegistry, estimateSize
+from flow_prediction.infrastructure.result_store import SqliteSimulationResultStore
+
+RESULT_STORE_PATH = os.environ.get(
+    "FLOW_PREDICTION_RESULT_STORE", "simulation_results.sqlite"
+)
+# memory kept for finished simulations no session is looking at
+RUN_REGISTRY_MAX_BYTES = int(
+    os.environ.get("FLOW_PREDICTION_RUN_REGISTRY_MAX_BYTES", 256 * 1024 * 1024)
+)
+
+
+def getPlanState() -> PlanState:
+    if "plan" not in st.session_state:
+        # plans are never edited in place, every session can start from the
+        # same sample
+        st.session_state["plan"] = PlanState(bachelor_for_life)
+    return st.session_state["plan"]
 
 
 def getSessionData():
-    if "data" not in st.session_state:
-        st.session_state["data"] = bachelor_for_life
-    return st.session_state["data"]
+    return getPlanState().plan
 
 
-def mutateSessionData(data: dict):
-    st.session_state["data"] = {
-        **getSessionData(),
-        **data,
-    }
+def patchSessionData(*patches):
+    getPlanState().apply(*patches)
+
+
+def upsertPatch(collection: str, items: list, item: dict):
+    """Patch replacing the item with the same id in the collection, or adding it."""
+    for i, existing in enumerate(items):
+        if existing["id"] == item["id"]:
+            return {"op": "set", "path": [collection, i], "value": item}, True
+    return {"op": "append", "path": [collection], "value": item}, False
+
+
+def getBaseline():
+    return st.session_state.get("baseline")
+
+
+def setBaseline(data):
+    st.session_state["baseline"] = data
 
 
 # ------------------------------------------------------------------------------
@@ -37,10 +73,80 @@ def get_remaining_money(simulation):
     return remaining, inflation_adjusted
 
 
-def run_simulation(data):
-    """Run the cashflow simulation use case using the provided data."""
-    result = CashflowSimulationUseCase(data).execute()
-    return result
+@st.cache_resource
+def get_result_store():
+    """One on-disk result store shared by every session of this server."""
+    return SqliteSimulationResultStore(RESULT_STORE_PATH)
+
+
+@st.cache_resource
+def get_run_registry():
+    """
+    Simulation runs by plan hash, shared by every session of this server: a
+    plan open in many sessions is simulated once and held in memory once.
+    """
+    return ContentRegistry(
+        maxBytes=RUN_REGISTRY_MAX_BYTES,
+        sizeOf=lambda run: estimateSize(run.getProgress()),
+        # a run nobody waits for anymore is stopped, finished ones are reused
+        keepIdle=lambda run: run.done and not run.cancelled,
+        dispose=lambda run: run.cancel(),
+    )
+
+
+def get_background_simulation(plan_state: PlanState):
+    """
+    The background run of the current plan. The run of an older version of
+    the plan is released, and cancelled unless another session still shows
+    it, so its results never reach this page.
+    """
+    plan_hash = plan_state.hash
+    lease = st.session_state.get("run_lease")
+    if lease is None or lease.key != plan_hash:
+        if lease is not None:
+            lease.release()
+        lease = get_run_registry().lease(
+            plan_hash,
+            lambda: BackgroundSimulation(
+                CashflowSimulationUseCase(
+                    plan_state.plan, resultStore=get_result_store()
+                )
+            ).start(),
+        )
+        st.session_state["run_lease"] = lease
+        st.session_state["run_plan_hash"] = plan_hash
+    return lease.value
+
+
+def corpus_area_chart(simulation, corpus_df=None):
+    """Stacked area chart of every corpus over the years simulated."""
+    return (
+        alt.Chart(corpus_df if corpus_df is not None else prepare_corpus_df(simulation))
+        .mark_area()
+        .encode(
+            x=alt.X("year:O", title="Year"),
+            y=alt.Y("value:Q", title="Value", stack="zero"),
+            color=alt.Color("id:N", title="Corpus"),
+        )
+        .properties(width=700, height=400, title="Investment Stacked Area Chart")
+    )
+
+
+@st.fragment(run_every=0.5)
+def show_progress(run, data):
+    """Redraws the years simulated so far until the run is done."""
+    if run.done:
+        # render the whole page from the complete result
+        st.rerun()
+    simulation = run.getProgress()["simulation"]
+    start_year = data["simulation"]["startYear"]
+    end_year = data["simulation"]["endYear"]
+    st.progress(
+        len(simulation) / (end_year - start_year + 1),
+        text=f"Simulating {simulation[-1]['year'] if simulation else start_year}...",
+    )
+    if simulation:
+        st.altair_chart(corpus_area_chart(simulation), use_container_width=True)
 
 
 def prepare_corpus_df(simulation):
@@ -54,11 +160,199 @@ def prepare_corpus_df(simulation):
                     "id": corpus["id"],
                     "year": year,
                     "value": corpus["value"]["amount"],
+                    "inflationAdjusted": corpus["value"]["inflationAdjusted"],
                 }
             )
     return pd.DataFrame(corpus_info)
 
 
+def prepare_allocation_df(simulation):
+    """Flatten every year's cashflow allocations into a DataFrame for charting."""
+    return pd.DataFrame(
+        [
+            {
+                "id": f"{allocation.get('id', 'split')}-{corpus.get('id', '')}",
+                "year": year_data["year"],
+                "value": corpus.get("value", 0),
+            }
+            for year_data in simulation
+            for allocation in year_data.get("cashflowAllocations", [])
+            for corpus in allocation.get("corpora", [])
+        ],
+        columns=["id", "year", "value"],
+    )
+
+
+def year_param(name, label, start_year, end_year, value):
+    """A year picked in the browser, for charts to filter on."""
+    return alt.param(
+        name=name,
+        value=value,
+        bind=alt.binding_range(min=start_year, max=end_year, step=1, name=label),
+    )
+
+
+@st.cache_resource(max_entries=16)
+def get_result_view(result_hash, _simulation, start_year, end_year):
+    """
+    Frames and chart specs of a result, keyed by its hash and shared by every
+    session showing it. Read only: they are the same objects on every call.
+    """
+    corpus_df = prepare_corpus_df(_simulation)
+    allocation_df = prepare_allocation_df(_simulation)
+
+    allocation_year = year_param(
+        "allocation_year", "Allocation Year ", start_year, end_year, start_year
+    )
+    pie_chart = (
+        alt.Chart(allocation_df)
+        .mark_arc()
+        .encode(
+            theta=alt.Theta(field="value", type="quantitative"),
+            color=alt.Color(field="id", type="nominal", title="Corpus"),
+            tooltip=["id", "value"],
+        )
+        .add_params(allocation_year)
+        .transform_filter(alt.datum.year == allocation_year)
+        .properties(width=400, height=400, title="Allocation for the Selected Year")
+    )
+
+    corpus_year = year_param(
+        "corpus_year", "Corpus Year ", start_year, end_year, end_year
+    )
+    bar_chart = (
+        alt.Chart(
+            corpus_df.rename(
+                columns={
+                    "id": "Corpus",
+                    "value": "Amount",
+                    "inflationAdjusted": "Inflation Adjusted",
+                }
+            )
+        )
+        .mark_bar()
+        .encode(
+            y=alt.Y("Corpus:N", sort="-x"),
+            x=alt.X("Amount:Q", title="Corpus Amount"),
+            tooltip=["Corpus", "Amount", "Inflation Adjusted"],
+        )
+        .add_params(corpus_year)
+        .transform_filter(alt.datum.year == corpus_year)
+        .properties(width=450, height=300, title="Corpora for the Selected Year")
+    )
+    return {
+        "corpus_df": corpus_df,
+        "allocation_df": allocation_df,
+        "area_chart": corpus_area_chart(_simulation, corpus_df),
+        "pie_chart": pie_chart,
+        "bar_chart": bar_chart,
+    }
+
+
+@st.fragment
+def show_corpus_table(corpus_df, data):
+    """Picking a year only reruns this table, not the page."""
+    applicable_years = list(
+        range(
+            data["simulation"]["startYear"],
+            data["simulation"]["endYear"] + 1,
+        )
+    )
+    year_under_corpus_analysis = st.selectbox(
+        "Select Year for Corpus Analysis",
+        options=applicable_years,
+        index=len(applicable_years) - 1,
+    )
+    df_corpus = corpus_df[corpus_df["year"] == year_under_corpus_analysis].rename(
+        columns={
+            "id": "Corpus",
+            "value": "Amount",
+            "inflationAdjusted": "Inflation Adjusted",
+        }
+    )[["Corpus", "Amount", "Inflation Adjusted"]]
+
+    # Display a nice table of corpora
+    st.write("### Corpus Table")
+    if not df_corpus.empty:
+        st.dataframe(
+            df_corpus.style.format(
+                {"Amount": "{:,.2f}", "Inflation Adjusted": "{:,.2f}"}
+            ),
+            hide_index=True,
+        )
+    else:
+        st.info("No corpus data found for this year.")
+
+
+def prepare_delta_df(comparison):
+    """Flatten per-year, per-corpus deltas of a comparison for charting."""
+    return pd.DataFrame(
+        [
+            {"id": corpus_id, "year": year, "delta": delta}
+            for year, deltas in zip(comparison["years"], comparison["amountDeltas"])
+            for corpus_id, delta in zip(comparison["corpusIds"], deltas)
+        ]
+    )
+
+
+@st.cache_resource(max_entries=16)
+def get_comparison(baseline_hash, plan_hash, _baseline, _data):
+    """
+    Comparison of a plan with a baseline, keyed by both hashes and shared by
+    every session comparing them, so reruns don't simulate both again.
+    Read only: it is the same object on every call.
+    """
+    return ScenarioComparisonUseCase(_baseline, _data).execute()
+
+
+def show_comparison(data):
+    """Compare the current plan with the baseline, if one is set."""
+    st.header("What Changed")
+    col_set, col_clear = st.columns(2)
+    col_set.button(
+        "Set Current Plan as Baseline",
+        on_click=lambda: setBaseline(getSessionData()),
+    )
+    baseline = getBaseline()
+    if baseline is None:
+        st.info("Set a baseline to see how later edits change the plan.")
+        return
+    col_clear.button("Clear Baseline", on_click=lambda: setBaseline(None))
+    try:
+        comparison = get_comparison(
+            getPlanHash(baseline), getPlanState().hash, baseline, data
+        )
+    except ValueError as e:
+        st.error(f"Cannot compare with the baseline: {e}")
+        return
+    if comparison["divergentYear"] is None:
+        st.success("No change from the baseline.")
+        return
+
+    final_delta = sum(comparison["amountDeltas"][-1])
+    st.write(
+        f"Diverges from the baseline in {comparison['divergentYear']}, "
+        f"finishing with {final_delta:,.2f} "
+        f"{'more' if final_delta >= 0 else 'less'} than the baseline."
+    )
+    delta_chart = (
+        alt.Chart(prepare_delta_df(comparison))
+        .mark_bar()
+        .encode(
+            x=alt.X("year:O", title="Year"),
+            y=alt.Y("delta:Q", title="Change from Baseline", stack="zero"),
+            color=alt.Color("id:N", title="Corpus"),
+            tooltip=["id", "year", "delta"],
+        )
+        .properties(height=300, title="Change in Corpora from Baseline")
+    )
+    st.altair_chart(delta_chart, use_container_width=True)
+    for warning in comparison["addedWarnings"]:
+        st.error(f"New: {warning}", icon="🚨")
+    for warning in comparison["removedWarnings"]:
+        st.success(f"Resolved: {warning}")
+
+
 def expense_editor(expenses, corpora):
     """
     Display a form where the user can select an expense (or add a new one)
@@ -115,16 +409,12 @@ def expense_editor(expenses, corpora):
             "fundingCorpora": list(map(lambda x: {"id": x}, funding_corpora)),
         }
         # Update the selected expense
-        for i, exp in enumerate(expenses):
-            if exp["id"] == expense_id:
-                expenses[i] = updated_expense
-                st.toast(f"Updated expense '{expense_id}'.")
-                break
+        patch, updated = upsertPatch("expenses", expenses, updated_expense)
+        patchSessionData(patch)
+        if updated:
+            st.toast(f"Updated expense '{expense_id}'.")
         else:
-            expenses.append(updated_expense)
             st.toast(f"Added new expense '{expense_id}'.")
-
-        mutateSessionData({"expenses": expenses})
     # return expenses
 
 
@@ -166,6 +456,11 @@ def corpora_editor(corpora):
             "Initial Amount",
             step=1000,
         )
+        currency = st.text_input(
+            "Currency",
+            value="INR",
+            help="other currencies need an exchange rate in the plan",
+        )
         submitted = st.form_submit_button("Save Corpus")
     if submitted:
         updated_corpus = {
@@ -175,15 +470,14 @@ def corpora_editor(corpora):
             "endYear": int(end_year),
             "initialAmount": initial_amount,
         }
-        for i, corp in enumerate(corpora):
-            if corp["id"] == corpus_id:
-                corpora[i] = updated_corpus
-                st.success(f"Updated corpus '{corpus_id}'.")
-                break
+        if currency.strip().upper() != "INR":
+            updated_corpus["currency"] = currency.strip().upper()
+        patch, updated = upsertPatch("corpora", corpora, updated_corpus)
+        patchSessionData(patch)
+        if updated:
+            st.success(f"Updated corpus '{corpus_id}'.")
         else:
-            corpora.append(updated_corpus)
             st.success(f"Added new corpus '{corpus_id}'.")
-        mutateSessionData({"corpora": corpora})
 
 
 def cashFlowEditor(cashflows):
@@ -210,15 +504,12 @@ def cashFlowEditor(cashflows):
         submitted = st.form_submit_button("Save Allocations")
     if submitted:
         updated_cashflow = json.loads(cashflowSetting)
-        for i, cf in enumerate(cashflows):
-            if cf["id"] == updated_cashflow["id"]:
-                cashflows[i] = updated_cashflow
-                st.toast(f"Updated cashflow '{updated_cashflow['id']}'.")
-                break
+        patch, updated = upsertPatch("cashflows", cashflows, updated_cashflow)
+        patchSessionData(patch)
+        if updated:
+            st.toast(f"Updated cashflow '{updated_cashflow['id']}'.")
         else:
-            cashflows.append(updated_cashflow)
             st.toast(f"Added new cashflow '{updated_cashflow['id']}'.")
-        mutateSessionData({"cashflows": cashflows})
 
 
 # ------------------------------------------------------------------------------
@@ -244,26 +535,28 @@ def main():
         cashFlowEditor(
             data.get("cashflows", []),
         )
-    # Run the simulation with the current (possibly modified) sample data.
-    simulation_result = run_simulation(data)
+    # Run the simulation with the current (possibly modified) sample data off
+    # the script thread, streaming years into the chart until it is done.
+    run = get_background_simulation(getPlanState())
+    if not run.wait(timeout=0.25):
+        show_progress(run, data)
+        return
+    simulation_result = run.getResult()
     simulation = simulation_result.get("simulation", [])
     warnings = simulation_result.get("warnings", [])
 
-    # Prepare and display the main investment stacked area chart.
-    corpus_df = prepare_corpus_df(simulation)
-    area_chart = (
-        alt.Chart(corpus_df)
-        .mark_area()
-        .encode(
-            x=alt.X("year:O", title="Year"),
-            y=alt.Y("value:Q", title="Value", stack="zero"),
-            color=alt.Color("id:N", title="Corpus"),
-        )
-        .properties(width=700, height=400, title="Investment Stacked Area Chart")
+    # Frames and charts are built once per result; the years shown are
+    # picked in the browser, so the chart data is only sent once.
+    result_view = get_result_view(
+        st.session_state["run_plan_hash"],
+        simulation,
+        data["simulation"]["startYear"],
+        data["simulation"]["endYear"],
     )
 
+    # Display the main investment stacked area chart.
     col_left, col_right = st.columns([2, 1])
-    col_left.altair_chart(area_chart, use_container_width=True)
+    col_left.altair_chart(result_view["area_chart"], use_container_width=True)
 
     # Display warnings (only first 3 by default; option to show all).
     show_all = col_right.checkbox(f"Show All Warnings ({len(warnings)})", value=False)
@@ -277,6 +570,8 @@ def main():
         f"You finished with {remaining} extra, ({inflation_adjusted} in {data['simulation']['startYear']} terms)"
     )
 
+    show_comparison(data)
+
     # ------------------------------------------------------------------------------
     # Additional Panels: Expenses, Allocation Pie, and Corpus Analysis
     # ------------------------------------------------------------------------------
@@ -285,119 +580,42 @@ def main():
     with col_expenses:
         showExpenses(data)
 
-    # Allocation Pie Chart.
-    applicable_years = list(
-        range(
-            data["simulation"]["startYear"],
-            data["simulation"]["endYear"] + 1,
-        )
-    )
-    analysis_year = col_allocations.selectbox(
-        "Select Year for Allocation", options=applicable_years, index=0
-    )
-    year_data = next(item for item in simulation if item["year"] == analysis_year)
-    allocations = year_data.get("cashflowAllocations", [])
-
-    # Build pie chart data.
-    pie_data = [
-        {
-            "id": f"{allocation.get('id', 'split')}-{corpus.get('id', '')}",
-            "value": corpus.get("value", 0),
-        }
-        for allocation in allocations
-        for corpus in allocation.get("corpora", [])
-    ]
-    allocation_df = pd.DataFrame(pie_data)
     col_allocations.write("## Allocation Pie Chart")
-    if allocation_df.empty:
-        col_allocations.warning(
-            "No cashflow allocation for this year, are you retired?"
-        )
-    else:
-        pie_chart = (
-            alt.Chart(allocation_df)
-            .mark_arc()
-            .encode(
-                theta=alt.Theta(field="value", type="quantitative"),
-                color=alt.Color(field="id", type="nominal", title="Corpus"),
-                tooltip=["id", "value"],
-            )
-            .properties(width=400, height=400, title=f"Allocation for {analysis_year}")
-        )
-        col_allocations.altair_chart(pie_chart, use_container_width=True)
-    col_corpus.write("## Corpus Bird's Eye")
-
-    year_under_corpus_analysis = col_corpus.selectbox(
-        "Select Year for Corpus Analysis",
-        options=applicable_years,
-        index=len(applicable_years) - 1,
-    )
-
-    # Get the data for that year
-    corpus_data_of_year = next(
-        (d for d in simulation if d["year"] == year_under_corpus_analysis), {}
-    ).get("corpora", [])
-
-    # Convert to a DataFrame
-    df_corpus = pd.DataFrame(
-        [
-            {
-                "Corpus": corpus["id"],
-                "Amount": corpus["value"].get("amount", 0),
-                "Inflation Adjusted": corpus["value"].get("inflationAdjusted", 0),
-            }
-            for corpus in corpus_data_of_year
-        ]
-    )
-
-    # Display a nice table of corpora
-    col_corpus.write("### Corpus Table")
-    if not df_corpus.empty:
-        col_corpus.dataframe(
-            df_corpus.style.format(
-                {"Amount": "{:,.2f}", "Inflation Adjusted": "{:,.2f}"}
-            )
-        )
+    if result_view["allocation_df"].empty:
+        col_allocations.warning("No cashflow allocation in any year, are you retired?")
     else:
-        col_corpus.info("No corpus data found for this year.")
+        col_allocations.altair_chart(result_view["pie_chart"], use_container_width=True)
 
-    # Display a bar chart (horizontal) of amounts
-    if not df_corpus.empty:
-        chart = (
-            alt.Chart(df_corpus)
-            .mark_bar()
-            .encode(
-                y=alt.Y("Corpus:N", sort="-x"),
-                x=alt.X("Amount:Q", title="Corpus Amount"),
-                tooltip=["Corpus", "Amount", "Inflation Adjusted"],
-            )
-            .properties(
-                width=450,
-                height=300,
-                title=f"Corpora for Year {year_under_corpus_analysis}",
-            )
-        )
-        col_corpus.altair_chart(chart, use_container_width=True)
+    col_corpus.write("## Corpus Bird's Eye")
+    with col_corpus:
+        show_corpus_table(result_view["corpus_df"], data)
+    col_corpus.altair_chart(result_view["bar_chart"], use_container_width=True)
 
     # ------------------------------------------------------------------------------
-    # Display the current sample data in one collapsed expander.
+    # The plan as JSON, only serialized when asked for.
     # ------------------------------------------------------------------------------
-    with st.expander("Current Sample Data", expanded=False):
+    if st.toggle("Show Current Sample Data"):
         st.json(getSessionData())
-    with st.form("override-data"):
-        st.write("## Override Sample Data")
-        data_json = st.text_area(
-            "Data JSON",
-            value=json.dumps(getSessionData(), indent=2),
-            height=400,
-        )
-        if st.form_submit_button("Update Sample Data"):
-            try:
-                new_data = json.loads(data_json)
-                mutateSessionData(new_data)
-                st.success("Sample data updated successfully.")
-            except json.JSONDecodeError as e:
-                st.error(f"Invalid JSON: {e}")
+    if st.toggle("Override Sample Data"):
+        with st.form("override-data"):
+            st.write("## Override Sample Data")
+            data_json = st.text_area(
+                "Data JSON",
+                value=json.dumps(getSessionData(), indent=2),
+                height=400,
+            )
+            if st.form_submit_button("Update Sample Data"):
+                try:
+                    new_data = json.loads(data_json)
+                    patchSessionData(
+                        *(
+                            {"op": "set", "path": [key], "value": value}
+                            for key, value in new_data.items()
+                        )
+                    )
+                    st.success("Sample data updated successfully.")
+                except json.JSONDecodeError as e:
+                    st.error(f"Invalid JSON: {e}")
 
 
 def showExpenses(data):
@@ -435,9 +653,9 @@ Funding: {", ".join(corp["id"] for corp in expense["fundingCorpora"])}
 
 
 def setExpenseEnabled(expenseIdx, enabled):
-    data = getSessionData()
-    data["expenses"][expenseIdx]["enabled"] = enabled
-    mutateSessionData({"expenses": data["expenses"]})
+    patchSessionData(
+        {"op": "set", "path": ["expenses", expenseIdx, "enabled"], "value": enabled}
+    )
 
 
 if __name__ == "__main__":
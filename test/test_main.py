@@ -0,0 +1,89 @@
+import pytest
+
+for module in ("streamlit", "pandas", "altair"):
+    pytest.importorskip(module)
+
+import main  # noqa: E402
+
+simulation = [
+    {
+        "year": 2025 + i,
+        "corpora": [
+            {
+                "id": "savings",
+                "value": {"amount": 100.0 + i, "inflationAdjusted": 90.0},
+            },
+            {
+                "id": "equity",
+                "value": {"amount": 200.0, "inflationAdjusted": 180.0 - i},
+            },
+        ],
+        "cashflowAllocations": (
+            [
+                {
+                    "id": "salary",
+                    "corpora": [
+                        {"id": "savings", "value": 10.0},
+                        {"id": "equity", "value": 5.0},
+                    ],
+                }
+            ]
+            if i == 0
+            else []
+        ),
+    }
+    for i in range(2)
+]
+
+
+def test_remaining_money_is_the_last_year():
+    assert main.get_remaining_money(simulation) == (301.0, 269.0)
+
+
+def test_corpus_frame_has_a_row_per_year_and_corpus():
+    corpus_df = main.prepare_corpus_df(simulation)
+    assert corpus_df.to_dict("records") == [
+        {"id": "savings", "year": 2025, "value": 100.0, "inflationAdjusted": 90.0},
+        {"id": "equity", "year": 2025, "value": 200.0, "inflationAdjusted": 180.0},
+        {"id": "savings", "year": 2026, "value": 101.0, "inflationAdjusted": 90.0},
+        {"id": "equity", "year": 2026, "value": 200.0, "inflationAdjusted": 179.0},
+    ]
+
+
+def test_allocation_frame_keeps_its_columns_without_allocations():
+    allocation_df = main.prepare_allocation_df(simulation)
+    assert allocation_df.to_dict("records") == [
+        {"id": "salary-savings", "year": 2025, "value": 10.0},
+        {"id": "salary-equity", "year": 2025, "value": 5.0},
+    ]
+    assert list(main.prepare_allocation_df(simulation[1:]).columns) == [
+        "id",
+        "year",
+        "value",
+    ]
+
+
+def test_delta_frame_flattens_the_comparison():
+    delta_df = main.prepare_delta_df(
+        {
+            "years": [2025, 2026],
+            "corpusIds": ["savings", "equity"],
+            "amountDeltas": [[0.0, 0.0], [1.5, -2.0]],
+        }
+    )
+    assert delta_df.to_dict("records")[2:] == [
+        {"id": "savings", "year": 2026, "delta": 1.5},
+        {"id": "equity", "year": 2026, "delta": -2.0},
+    ]
+
+
+def test_upsert_patch_replaces_by_id_or_appends():
+    items = [{"id": "a", "value": 1}, {"id": "b", "value": 2}]
+    assert main.upsertPatch("corpora", items, {"id": "b", "value": 3}) == (
+        {"op": "set", "path": ["corpora", 1], "value": {"id": "b", "value": 3}},
+        True,
+    )
+    assert main.upsertPatch("corpora", items, {"id": "c"}) == (
+        {"op": "append", "path": ["corpora"], "value": {"id": "c"}},
+        False,
+    )